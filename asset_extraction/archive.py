@@ -0,0 +1,369 @@
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future
+from collections import deque
+from typing import BinaryIO, Iterator
+
+import bz2
+import logging
+import lzma
+import os
+import struct
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# zip writer for the asset archive
+# - members are compressed on a thread pool (zlib, bz2 and lzma release the GIL)
+# - large deflate members are split into chunks that are compressed in parallel and concatenated (like pigz):
+#   every chunk is primed with the last 32 KiB of the previous chunk and ends with a sync flush, so the chunks form one deflate stream
+# - bzip2 and lzma streams can not be concatenated, these members are compressed as a whole, several members in parallel
+# - the archive is written strictly sequential (data descriptors, no seek), so it can be written to a pipe (stdout)
+
+COMPRESSION_STORED = 'stored'
+COMPRESSION_DEFLATE = 'deflate'
+COMPRESSION_BZIP2 = 'bzip2'
+COMPRESSION_LZMA = 'lzma'
+compression_modes = [COMPRESSION_STORED, COMPRESSION_DEFLATE, COMPRESSION_BZIP2, COMPRESSION_LZMA]
+compress_types = {
+    COMPRESSION_STORED: zipfile.ZIP_STORED,
+    COMPRESSION_DEFLATE: zipfile.ZIP_DEFLATED,
+    COMPRESSION_BZIP2: zipfile.ZIP_BZIP2,
+    COMPRESSION_LZMA: zipfile.ZIP_LZMA,
+}
+# valid levels of the compressions (None is the default level), stored ignores the level
+compression_levels = {
+    COMPRESSION_DEFLATE: range(-1, 10),
+    COMPRESSION_BZIP2: range(1, 10),
+    COMPRESSION_LZMA: range(0, 10),
+}
+versions_needed = {
+    zipfile.ZIP_STORED: 20,
+    zipfile.ZIP_DEFLATED: 20,
+    zipfile.ZIP_BZIP2: 46,
+    zipfile.ZIP_LZMA: 63,
+}
+
+# files that are already compressed are stored
+default_store_extensions = ['png', 'jpg', 'jpeg', 'gif', 'webp', 'mp4', 'mkv', 'mov', 'avi', 'webm',
+                            'zip', '7z', 'gz', 'tgz', 'bz2', 'xz', 'zst', 'rar', 'glb', 'ktx2']
+
+# default settings, "archive" of process.json overrides them
+default_archive_settings = {
+    'compression': COMPRESSION_DEFLATE,
+    'level': None,         # default level of the compression
+    'workers': None,       # number of cpus
+    'chunk size': 1024,    # KiB, deflate members larger than this are compressed in parallel chunks
+    'store extensions': default_store_extensions,
+}
+
+DICTIONARY_SIZE = 32 * 1024
+LZMA_ALONE_HEADER_SIZE = 13  # properties (5 bytes with the dictionary size), uncompressed size
+COPY_SIZE = 1024 * 1024
+SPOOL_SIZE = 16 * 1024 * 1024
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+FLAG_LZMA_EOS = 0x02
+
+struct_file_header = '<4sHHHHHLLLHH'
+struct_central_dir = '<4s4B4HL2L5H2L'
+struct_end_archive = '<4sHHHHLLH'
+struct_end_archive64 = '<4sQBBHLLQQQQ'
+struct_end_archive64_locator = '<4sLQL'
+
+
+def get_archive_settings(process_config: dict, compression: str = None, level: int = None) -> dict:
+    settings = dict(default_archive_settings)
+    settings.update(process_config.get('archive', {}))
+    if compression:
+        settings['compression'] = compression
+    if level is not None:
+        settings['level'] = level
+    if settings['compression'] not in compression_modes:
+        logger.error(f"archive compression {settings['compression']} not supported, use one of {compression_modes}")
+        exit(1)
+    levels = compression_levels.get(settings['compression'])
+    if levels is not None and settings['level'] is not None and settings['level'] not in levels:
+        logger.error(f"archive level {settings['level']} not supported for {settings['compression']}, use {levels[0]} to {levels[-1]}")
+        exit(1)
+    return settings
+
+
+# counts the written bytes, the offsets of the local headers are needed for the central directory
+class CountingWriter:
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.offset = 0
+
+    def write(self, data: bytes):
+        self.stream.write(data)
+        self.offset += len(data)
+
+
+class ZipStreamWriter:
+    def __init__(self, stream: BinaryIO):
+        self.writer = CountingWriter(stream)
+        self.entries = []
+
+    # local header without crc and sizes, they follow in the data descriptor
+    def start_member(self, name: str, file_path: Path, compress_type: int, zip64: bool) -> dict:
+        stat = file_path.stat()
+        dos_time, dos_date = get_dos_time(stat.st_mtime)
+        flags = FLAG_DATA_DESCRIPTOR
+        if name.isascii():
+            encoded_name = name.encode('ascii')
+        else:
+            encoded_name = name.encode('utf-8')
+            flags |= FLAG_UTF8
+        if compress_type == zipfile.ZIP_LZMA:
+            flags |= FLAG_LZMA_EOS
+        version = max(versions_needed[compress_type], 45 if zip64 else 0)
+
+        entry = {'name': encoded_name, 'flags': flags, 'compress_type': compress_type, 'time': dos_time, 'date': dos_date,
+                 'version': version, 'offset': self.writer.offset, 'mode': stat.st_mode, 'zip64': zip64}
+        extra = struct.pack('<HHQQ', 1, 16, 0, 0) if zip64 else b''
+        size = ZIP64_LIMIT if zip64 else 0
+        self.writer.write(struct.pack(struct_file_header, zipfile.stringFileHeader, version, flags, compress_type,
+                                      dos_time, dos_date, 0, size, size, len(encoded_name), len(extra)))
+        self.writer.write(encoded_name)
+        self.writer.write(extra)
+        return entry
+
+    def write(self, data: bytes):
+        self.writer.write(data)
+
+    def end_member(self, entry: dict, crc: int, compressed_size: int, file_size: int):
+        entry.update({'crc': crc, 'compressed_size': compressed_size, 'file_size': file_size})
+        if entry['zip64']:
+            self.writer.write(struct.pack('<4sLQQ', b'PK\x07\x08', crc, compressed_size, file_size))
+        else:
+            if compressed_size > ZIP64_LIMIT or file_size > ZIP64_LIMIT:
+                raise zipfile.LargeZipFile(f"member {entry['name']} grew larger than 4 GiB without zip64 header")
+            self.writer.write(struct.pack('<4sLLL', b'PK\x07\x08', crc, compressed_size, file_size))
+        self.entries.append(entry)
+
+    # central directory and end records, zip64 records if needed
+    def close(self):
+        start = self.writer.offset
+        for entry in self.entries:
+            extra_values = []
+            file_size, compressed_size, offset = entry['file_size'], entry['compressed_size'], entry['offset']
+            if file_size >= ZIP64_LIMIT or entry['zip64']:
+                extra_values.append(file_size)
+                file_size = ZIP64_LIMIT
+            if compressed_size >= ZIP64_LIMIT or entry['zip64']:
+                extra_values.append(compressed_size)
+                compressed_size = ZIP64_LIMIT
+            if offset >= ZIP64_LIMIT:
+                extra_values.append(offset)
+                offset = ZIP64_LIMIT
+            extra = struct.pack(f'<HH{len(extra_values)}Q', 1, 8 * len(extra_values), *extra_values) if extra_values else b''
+            version = max(entry['version'], 45 if extra_values else 0)
+            create_system = 0 if os.name == 'nt' else 3
+            self.writer.write(struct.pack(struct_central_dir, zipfile.stringCentralDir, version, create_system, version, 0,
+                                          entry['flags'], entry['compress_type'], entry['time'], entry['date'], entry['crc'],
+                                          compressed_size, file_size, len(entry['name']), len(extra), 0, 0, 0,
+                                          (entry['mode'] & 0xFFFF) << 16, offset))
+            self.writer.write(entry['name'])
+            self.writer.write(extra)
+        end = self.writer.offset
+
+        count = len(self.entries)
+        size = end - start
+        if count > ZIP_MAX_ENTRIES or size > ZIP64_LIMIT or start > ZIP64_LIMIT:
+            self.writer.write(struct.pack(struct_end_archive64, zipfile.stringEndArchive64, 44, 45, 3, 45, 0, 0, count, count, size, start))
+            self.writer.write(struct.pack(struct_end_archive64_locator, zipfile.stringEndArchive64Locator, 0, end, 1))
+            count = min(count, ZIP_MAX_ENTRIES)
+            size = min(size, ZIP64_LIMIT)
+            start = min(start, ZIP64_LIMIT)
+        self.writer.write(struct.pack(struct_end_archive, zipfile.stringEndArchive, 0, 0, count, count, size, start, 0))
+
+
+def get_dos_time(mtime: float):
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        t = time.localtime(time.mktime((1980, 1, 1, 0, 0, 0, 0, 0, -1)))
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+# raw deflate of one chunk, not the last chunk ends with a sync flush at a byte boundary
+def deflate_chunk(data: bytes, level: int, dictionary: bytes, last: bool) -> bytes:
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+# lzma data of a zip member with the level as preset: header (lzma version, size of the properties, properties) and
+# LZMA1 data with end marker. The .lzma (alone) format has the same properties and data after its 13 bytes header
+class LzmaMemberCompressor:
+    def __init__(self, level: int):
+        self.compressor = lzma.LZMACompressor(lzma.FORMAT_ALONE, preset=level if level is not None else lzma.PRESET_DEFAULT)
+        self.header = b''  # alone header until it is complete
+
+    def compress(self, data: bytes) -> bytes:
+        return self.convert(self.compressor.compress(data))
+
+    def flush(self) -> bytes:
+        return self.convert(self.compressor.flush())
+
+    def convert(self, data: bytes) -> bytes:
+        if self.header is None:
+            return data
+        self.header += data
+        if len(self.header) < LZMA_ALONE_HEADER_SIZE:
+            return b''
+        properties = self.header[:5]
+        data = self.header[LZMA_ALONE_HEADER_SIZE:]
+        self.header = None
+        return struct.pack('<BBH', 9, 4, len(properties)) + properties + data
+
+
+# compress a whole file with bzip2 or lzma, large results are spooled to disk
+def compress_file(file_path: Path, compress_type: int, level: int):
+    if compress_type == zipfile.ZIP_BZIP2:
+        compressor = bz2.BZ2Compressor(level if level is not None else 9)
+    else:
+        compressor = LzmaMemberCompressor(level)
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    crc = 0
+    file_size = 0
+    with open(file_path, 'rb') as file:
+        for data in iter(lambda: file.read(COPY_SIZE), b''):
+            crc = zlib.crc32(data, crc)
+            file_size += len(data)
+            spool.write(compressor.compress(data))
+    spool.write(compressor.flush())
+    spool.seek(0)
+    return spool, crc, file_size
+
+
+def get_compress_type(file_path: Path, settings: dict) -> int:
+    extension = file_path.suffix.lstrip('.').lower()
+    if extension in settings['store extensions']:
+        return zipfile.ZIP_STORED
+    return compress_types[settings['compression']]
+
+
+# one member: local header, data (in order of the queued parts), data descriptor
+class MemberJob:
+    def __init__(self, name: str, file_path: Path, compress_type: int):
+        self.name = name
+        self.file_path = file_path
+        self.compress_type = compress_type
+        self.file_size = file_path.stat().st_size
+        self.parts = deque()  # futures or bytes
+        self.crc = 0          # of stored and deflate members, computed while reading
+        self.complete = False
+
+
+# queue the compression of the members, at most max_pending parts are in memory
+def create_archive(files: list, stream: BinaryIO, settings: dict):
+    workers = settings['workers'] or os.cpu_count() or 1
+    level = settings['level'] if settings['level'] is not None else -1
+    chunk_size = max(64, int(settings['chunk size'])) * 1024
+    max_pending = 2 * workers
+    writer = ZipStreamWriter(stream)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        jobs = deque()
+        pending = 0
+
+        def queue_parts(job: MemberJob) -> Iterator[None]:
+            if job.compress_type in (zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA):
+                job.parts.append(executor.submit(compress_file, job.file_path, job.compress_type, settings['level']))
+                yield
+            else:
+                with open(job.file_path, 'rb') as file:
+                    dictionary = b''
+                    data = file.read(chunk_size)
+                    while True:
+                        next_data = file.read(chunk_size)
+                        last = not next_data
+                        job.crc = zlib.crc32(data, job.crc)
+                        if job.compress_type == zipfile.ZIP_STORED:
+                            job.parts.append(data)
+                        else:
+                            job.parts.append(executor.submit(deflate_chunk, data, level, dictionary, last))
+                            dictionary = data[-DICTIONARY_SIZE:]
+                        yield
+                        if last:
+                            break
+                        data = next_data
+            job.complete = True
+
+        # write the parts of the first job as soon as they are finished, queue parts of later jobs meanwhile
+        def write_ready(block: bool):
+            nonlocal pending
+            while jobs:
+                job, _, state = jobs[0]
+                if 'entry' not in state:
+                    state['entry'] = writer.start_member(job.name, job.file_path, job.compress_type, job.file_size * 1.05 > ZIP64_LIMIT)
+                    state['compressed_size'] = 0
+                while job.parts:
+                    part = job.parts[0]
+                    if isinstance(part, Future):
+                        if not block and not part.done():
+                            return
+                        result = part.result()
+                    else:
+                        result = part
+                    job.parts.popleft()
+                    pending -= 1
+                    if isinstance(result, tuple):
+                        spool, job.crc, _ = result
+                        with spool:
+                            for data in iter(lambda: spool.read(COPY_SIZE), b''):
+                                writer.write(data)
+                                state['compressed_size'] += len(data)
+                    else:
+                        writer.write(result)
+                        state['compressed_size'] += len(result)
+                if not job.complete:
+                    return
+                writer.end_member(state['entry'], job.crc, state['compressed_size'], job.file_size)
+                jobs.popleft()
+
+        for name, file_path in files:
+            job = MemberJob(name, file_path, get_compress_type(file_path, settings))
+            jobs.append((job, queue_parts(job), {}))
+            for _ in jobs[-1][1]:
+                pending += 1
+                write_ready(block=False)
+                while pending >= max_pending:
+                    write_ready(block=True)
+            write_ready(block=False)
+
+        while jobs:
+            write_ready(block=True)
+
+    writer.close()
+    stream.flush()
+
+
+# all files of the output folder with their name in the archive
+def get_archive_files(output_dir: Path, exclude: list) -> list:
+    files = []
+    for file_path in output_dir.rglob('*'):
+        if file_path.is_file() and file_path.name not in exclude:
+            files.append((file_path.relative_to(output_dir).as_posix(), file_path))
+    return files
+
+
+# write the archive to a file or, with target '-', to stdout
+def create_zip_archive(output_dir: Path, target: str, settings: dict, exclude: list):
+    files = get_archive_files(output_dir, exclude)
+    start = time.perf_counter()
+    if str(target) == '-':
+        create_archive(files, sys.__stdout__.buffer, settings)
+    else:
+        with open(target, 'wb') as stream:
+            create_archive(files, stream, settings)
+    logger.info(f"archive with {len(files)} files ({settings['compression']}) created in {time.perf_counter() - start:.2f} s")
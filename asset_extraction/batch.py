@@ -0,0 +1,150 @@
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from asset_extraction.main import extract_asset, get_asset_type_extension, asset_types, execution_modes
+
+import json
+import argparse
+import logging
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# extensions of files that are taken as asset when a directory is given
+asset_extensions = ['.xodr', '.xosc', '.zip', '.7z']
+
+
+# assets of a directory (top level files with an asset extension) or a manifest file
+# manifest: json list of filenames or {"filename": ..., "out": ...} entries, or a text file with one filename per line
+# relative filenames of a manifest are relative to the manifest folder
+def get_assets(source: Path, output_dir: Path) -> list:
+    if source.is_dir():
+        asset_files = sorted(file for file in source.iterdir() if file.is_file() and file.suffix.lower() in asset_extensions)
+        return [{'filename': file, 'out': output_dir} for file in asset_files]
+
+    if not source.exists():
+        logger.error(f'asset source {source} not exists')
+        exit(1)
+
+    if source.suffix.lower() == '.json':
+        with open(source, 'r') as file:
+            entries = json.load(file)
+    else:
+        with open(source, 'r') as file:
+            entries = [line.strip() for line in file if line.strip() and not line.strip().startswith('#')]
+
+    assets = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'filename': entry}
+        filename = Path(entry['filename'])
+        if not filename.is_absolute():
+            filename = source.parent / filename
+        out = Path(entry['out']) if 'out' in entry else output_dir
+        if not out.is_absolute() and 'out' in entry:
+            out = source.parent / out
+        assets.append({'filename': filename, 'out': out})
+    return assets
+
+
+# every asset is written to <out>/<asset name>, two assets with the same name would overwrite each other
+def check_assets(assets: list) -> bool:
+    targets = {}
+    success = True
+    for asset in assets:
+        if get_asset_type_extension(asset['filename']) not in asset_types:
+            logger.error(f'asset type of {asset["filename"]} not supported')
+            success = False
+        target = (asset['out'].resolve() / asset['filename'].stem).as_posix()
+        if target in targets:
+            logger.error(f'{asset["filename"]} and {targets[target]} have the same output folder {target}')
+            success = False
+        targets[target] = asset['filename']
+    return success
+
+
+# runs in a worker process, extract_asset stops with exit(1) on errors
+def run_asset(asset_file: Path, config_dir: Path, output_dir: Path, execution: str, workers: int, cache_dir: Path, use_cache: bool) -> dict:
+    result = {'asset': asset_file.as_posix(), 'output': (output_dir.resolve() / asset_file.stem).as_posix()}
+    start = time.perf_counter()
+    try:
+        archive = extract_asset(asset_file, config_dir, output_dir, execution, workers, cache_dir, use_cache)
+        result['status'] = 'success'
+        result['archive'] = archive.as_posix()
+        result['metrics'] = (archive.parent / 'pipeline_metrics.json').as_posix()
+    except SystemExit as e:
+        result['status'] = 'failed'
+        result['error'] = f'exit code {e.code}'
+    except Exception as e:
+        logger.exception(f'asset {asset_file} failed')
+        result['status'] = 'failed'
+        result['error'] = repr(e)
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+# extract all assets on a process pool and return the run summary
+def run_batch(assets: list, config_dir: Path, processes: int, execution: str = None, workers: int = None,
+              cache_dir: Path = None, use_cache: bool = True) -> dict:
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(run_asset, asset['filename'], config_dir, asset['out'], execution, workers, cache_dir, use_cache) for asset in assets]
+        for future in as_completed(futures):
+            result = future.result()
+            logger.info(f"asset {result['asset']} {result['status']} in {result['seconds']} s")
+            results.append(result)
+
+    # keep the order of the input
+    order = {asset['filename'].as_posix(): index for index, asset in enumerate(assets)}
+    results.sort(key=lambda result: order[result['asset']])
+    succeeded = sum(1 for result in results if result['status'] == 'success')
+    return {
+        'assets': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'processes': processes,
+        'seconds': round(time.perf_counter() - start, 3),
+        'results': results,
+    }
+
+
+def main(argv: list = None):
+    # parse arguments
+    parser = argparse.ArgumentParser(prog='batch.py', description='creates the asset archives of all assets of a directory or manifest on a process pool.')
+    parser.add_argument('source', type=str, help='directory with asset files or manifest (json list or text file with one filename per line).')
+    parser.add_argument('-config', type=str, help='config path for sub tools.')
+    parser.add_argument('-out', type=str, help='output path, every asset is written to its own sub folder.')
+    parser.add_argument('-processes', type=int, default=os.cpu_count(), help='number of assets processed at the same time, default number of cpus.')
+    parser.add_argument('-execution', type=str, choices=execution_modes, help='run python tools in the worker interpreter (inprocess) or as own process (subprocess), default from process.json.')
+    parser.add_argument('-workers', type=int, default=1, help='maximal number of tools running at the same time per asset, default 1.')
+    parser.add_argument('-cache', type=str, help='folder of the step cache shared by all assets, default "cache folder" of process.json or <out>/.cache/steps.')
+    parser.add_argument('-nocache', action='store_true', help='execute all steps without using the step cache.')
+    parser.add_argument('-summary', type=str, help='filename of the run summary, default <out>/batch_summary.json.')
+    args = parser.parse_args(argv)
+
+    output_dir = Path(args.out).resolve()
+    config_dir = Path(args.config).resolve()
+    assets = get_assets(Path(args.source).resolve(), output_dir)
+    if not assets:
+        logger.error(f'no assets found in {args.source}')
+        exit(1)
+    if not check_assets(assets):
+        exit(1)
+
+    logger.info(f'extract {len(assets)} assets with {args.processes} processes')
+    cache_dir = Path(args.cache).resolve() if args.cache else None
+    summary = run_batch(assets, config_dir, max(1, args.processes), args.execution, args.workers, cache_dir, not args.nocache)
+
+    summary_file = Path(args.summary) if args.summary else output_dir / 'batch_summary.json'
+    summary_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(summary_file, 'w') as file:
+        json.dump(summary, file, indent=4)
+    logger.info(f"{summary['succeeded']} of {summary['assets']} assets succeeded in {summary['seconds']} s, summary {summary_file}")
+
+    if summary['failed']:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
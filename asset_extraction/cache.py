@@ -0,0 +1,180 @@
+from pathlib import Path
+from typing import Optional
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# increase if the layout of a cache entry or the key changes
+CACHE_FORMAT = 1
+ENTRY_FILE = 'entry.json'
+CHUNK_SIZE = 1024 * 1024
+
+
+# persistent cache of step outputs, the key is a hash of the step config, the tool version and the content of the input files
+# an entry is a folder with the output files (relative to the asset output folder) and entry.json
+class StepCache:
+    def __init__(self, cache_dir: Path, project_root: Path):
+        self.cache_dir = cache_dir
+        self.project_root = project_root
+        self.lock = threading.Lock()
+        self.file_hashes = {}  # (path, size, mtime) -> hash, the asset file is read by several steps
+        self.tool_versions = {}
+
+    # steps without outputs (validators) are always executed, "cache" : false disables the cache for a config
+    @staticmethod
+    def is_cacheable(script_config: dict, outputs: list, output_dir: Path) -> bool:
+        if not script_config.get('cache', True) or not outputs:
+            return False
+        return all(is_relative_to(Path(output), output_dir) for output in outputs)
+
+    def get_key(self, script_config: dict, inputs: list, outputs: list, output_dir: Path) -> str:
+        digest = hashlib.sha256()
+        config = {name: value for name, value in script_config.items() if name != 'execution'}
+        digest.update(json.dumps({'format': CACHE_FORMAT, 'config': config, 'version': self.get_tool_version(script_config)}, sort_keys=True).encode())
+
+        for output in outputs:
+            digest.update(f'output {Path(output).relative_to(output_dir).as_posix()}\n'.encode())
+        for input in inputs:
+            input_path = Path(os.path.normpath(input))
+            if 'https:' in str(input) or 'http:' in str(input):
+                digest.update(f'url {input}\n'.encode())
+                continue
+            # inputs outside of the output folder (asset file, uploads) are identified by name and content
+            name = input_path.relative_to(output_dir).as_posix() if is_relative_to(input_path, output_dir) else input_path.name
+            digest.update(f'input {name}\n'.encode())
+            for file, relative in list_files(input_path):
+                digest.update(f'{relative} {self.get_file_hash(file)}\n'.encode())
+        return digest.hexdigest()
+
+    # "version" of the config or a hash of all files of the tool package (and the shared utils of python tools)
+    def get_tool_version(self, script_config: dict) -> str:
+        if 'version' in script_config:
+            return str(script_config['version'])
+
+        call = str(script_config['params']['call'])
+        with self.lock:
+            if call in self.tool_versions:
+                return self.tool_versions[call]
+
+        if script_config['environment type'] == 'python':
+            tool_paths = [self.project_root / call.split('.')[0], self.project_root / 'utils']
+        else:
+            tool_paths = [self.project_root / call]
+        digest = hashlib.sha256()
+        for tool_path in tool_paths:
+            for file, relative in list_files(tool_path):
+                if '__pycache__' in file.parts:
+                    continue
+                digest.update(f'{tool_path.name}/{relative} {self.get_file_hash(file)}\n'.encode())
+        version = digest.hexdigest()
+
+        with self.lock:
+            self.tool_versions[call] = version
+        return version
+
+    def get_file_hash(self, file: Path) -> str:
+        stat = file.stat()
+        file_id = (str(file), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            if file_id in self.file_hashes:
+                return self.file_hashes[file_id]
+
+        digest = hashlib.sha256()
+        with open(file, 'rb') as stream:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+
+        with self.lock:
+            self.file_hashes[file_id] = digest.hexdigest()
+        return digest.hexdigest()
+
+    def get_entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    # copy the cached outputs to the output folder, returns False if there is no entry
+    def restore(self, key: str, output_dir: Path) -> bool:
+        entry_dir = self.get_entry_dir(key)
+        entry_file = entry_dir / ENTRY_FILE
+        if not entry_file.exists():
+            return False
+        try:
+            with open(entry_file, 'r') as file:
+                entry = json.load(file)
+            for relative in entry['outputs']:
+                source = entry_dir / 'files' / relative
+                target = output_dir / relative
+                target.parent.mkdir(parents=True, exist_ok=True)
+                if source.is_dir():
+                    shutil.copytree(source, target, dirs_exist_ok=True)
+                elif source.exists():
+                    shutil.copy2(source, target)
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f'cache entry {key} could not be restored: {e}')
+            return False
+
+    # copy the outputs of a finished step into a new entry
+    # the entry is written to a temp folder and renamed, so concurrent runs never see half written entries
+    def store(self, key: str, outputs: list, output_dir: Path, name: str):
+        entry_dir = self.get_entry_dir(key)
+        if entry_dir.exists():
+            return
+        temp_dir = self.cache_dir / 'tmp' / f'{key}.{uuid.uuid4().hex}'
+        try:
+            relatives = []
+            for output in outputs:
+                source = Path(output)
+                relative = source.relative_to(output_dir).as_posix()
+                target = temp_dir / 'files' / relative
+                target.parent.mkdir(parents=True, exist_ok=True)
+                if source.is_dir():
+                    shutil.copytree(source, target)
+                elif source.exists():
+                    shutil.copy2(source, target)
+                else:
+                    continue  # optional output not written by the tool
+                relatives.append(relative)
+            with open(temp_dir / ENTRY_FILE, 'w') as file:
+                json.dump({'name': name, 'outputs': relatives}, file, indent=4)
+
+            entry_dir.parent.mkdir(parents=True, exist_ok=True)
+            os.rename(temp_dir, entry_dir)
+        except OSError as e:
+            # another run stored the same entry in the meantime or the cache is not writable
+            if not entry_dir.exists():
+                logger.warning(f'cache entry {key} for {name} could not be stored: {e}')
+        finally:
+            if temp_dir.exists():
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def is_relative_to(path: Path, folder: Path) -> bool:
+    try:
+        Path(os.path.normpath(path)).relative_to(folder)
+        return True
+    except ValueError:
+        return False
+
+
+# all files of a file or folder with their path relative to it, sorted for a stable hash
+def list_files(path: Path) -> list:
+    if path.is_file():
+        return [(path, path.name)]
+    if path.is_dir():
+        return [(file, file.relative_to(path).as_posix()) for file in sorted(path.rglob('*')) if file.is_file()]
+    return []
+
+
+# cache folder: argument, "cache folder" of process.json (relative to the output path) or <out>/.cache/steps
+def get_cache_dir(process_config: dict, output_dir: Path, cache_dir: Optional[Path] = None) -> Path:
+    if cache_dir:
+        return cache_dir.resolve()
+    cache_folder = Path(process_config.get('cache folder', '.cache/steps'))
+    return cache_folder if cache_folder.is_absolute() else (output_dir / cache_folder).resolve()
@@ -1,10 +1,17 @@
 from pathlib import Path
-from zipfile import ZipFile
-from utils.log_config import setup_logging, handle_output
+from utils.log_config import setup_logging
+from asset_extraction.runner import run_subprocess, run_in_process, execution_modes, EXECUTION_SUBPROCESS, EXECUTION_INPROCESS
+from asset_extraction.scheduler import PipelineStep, run_pipeline
+from asset_extraction.cache import StepCache, get_cache_dir
+from asset_extraction.archive import create_zip_archive, get_archive_settings, compression_modes
+from asset_extraction.metrics import PipelineMetrics
+from typing import Tuple
 
 import json
-import subprocess
 import argparse
+import contextlib
+import sys
+import time
 import shutil
 import logging
 
@@ -19,18 +26,32 @@ asset_types = {
     "3dmodel" :"environment-model"
 }
 
-# load config file for asset_type
-def get_configs(config_dir: Path, asset_file: Path) ->list:
-    # get asset extension
-    asset_type_extension = get_asset_type_extension(asset_file)
-
-    # load process.json
+# load process.json
+def get_process_config(config_dir: Path) -> dict:
     process_file = config_dir / "process.json"
     if not process_file.exists():
         logger.error(f'config file {process_file} not exists')
         exit(1)
     with open((config_dir / process_file), 'r') as file:
         config_process = json.load(file)
+    return config_process
+
+
+# load config file for asset_type
+# execution overrides the default execution mode of process.json, a config can set its own "execution"
+def get_configs(config_dir: Path, asset_file: Path, execution: str = None) ->list:
+    # get asset extension
+    asset_type_extension = get_asset_type_extension(asset_file)
+
+    # load process.json
+    config_process = get_process_config(config_dir)
+
+    # default execution mode for python tools
+    if not execution:
+        execution = config_process.get("execution", EXECUTION_SUBPROCESS)
+    if execution not in execution_modes:
+        logger.error(f'execution mode {execution} not supported, use one of {execution_modes}')
+        exit(1)
 
     # filter for asset_type
     config_files = []
@@ -50,7 +71,9 @@ def get_configs(config_dir: Path, asset_file: Path) ->list:
             exit(1)    
 
         with open((config_dir / filename), 'r') as file:
-            configs.append(json.load(file)) 
+            config = json.load(file)
+        config.setdefault('execution', execution)
+        configs.append(config)
 
     return configs
 
@@ -68,7 +91,32 @@ def replace_file_pattern(filepath: str, path: Path, sub_path: Path, name: str, a
         return updated_string
 
 
-def execute_script(script_config: dict, asset_file: Path, output_dir: Path):    
+# files read and written by a script, used to build the dependency graph of the pipeline
+# default: params input (or the asset file if there is none) and params output
+# "inputs" and "outputs" of a config replace the defaults, e.g. for files written beside the output parameter 
+def get_script_files(script_config: dict, asset_file: Path, output_dir: Path) -> Tuple[list, list]:
+    sub_path = Path(script_config['data folder'])
+    asset_name = asset_file.stem
+    asset_type = get_asset_type(get_asset_type_extension(asset_file))
+    params = script_config['params']
+
+    if 'inputs' in script_config:
+        inputs = [replace_file_pattern(value, output_dir, sub_path, asset_name, asset_type) for value in script_config['inputs']]
+    elif 'input' in params:
+        inputs = [replace_file_pattern(value, output_dir, sub_path, asset_name, asset_type) for value in params['input'].values()]
+    else:
+        inputs = [asset_file.as_posix()]
+
+    if 'outputs' in script_config:
+        outputs = [replace_file_pattern(value, output_dir, sub_path, asset_name, asset_type) for value in script_config['outputs']]
+    else:
+        outputs = [replace_file_pattern(value, output_dir, sub_path, asset_name, asset_type) for value in params.get('output', {}).values()]
+
+    return inputs, outputs
+
+
+# run script of the config, returns True on success
+def execute_script(script_config: dict, asset_file: Path, output_dir: Path) -> bool:    
     # prepare script path
     script_path = Path(script_config['params']['call'])
     
@@ -82,16 +130,6 @@ def execute_script(script_config: dict, asset_file: Path, output_dir: Path):
 
     # setup script params
     script_call = []
-    script_call.append(script_config['environment type'])
-
-    # disables frozen standard modules so that Python loads them from the hard disk. 
-    # This can be useful if you are working on the Python interpreter itself or testing changes to the standard modules 
-    # and do not want to use a frozen version.
-    if script_config['environment type'] == "python":
-        script_call.append('-X')
-        script_call.append('frozen_modules=off')
-        script_call.append('-m') # as module
-    script_call.append(script_path)
 
     asset_type = get_asset_type(get_asset_type_extension(asset_file))     
 
@@ -126,27 +164,63 @@ def execute_script(script_config: dict, asset_file: Path, output_dir: Path):
                 script_call.append(updated_string)
 
     # run
-    try:
-        #logger.info(script_call)
-        logger.info(f">>>    start command {script_config['name']}")
-        result = subprocess.run(script_call, check=True, capture_output=True, text=True, cwd=str(project_root))
-        handle_output(result, script_config['name'] )            
-        logger.info(f"   <<< end command {script_config['name']}")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"!!!!!!!!!!!! Command {script_config['name']} failed with return code {e.returncode}")        
-        handle_output(e, script_config['name'] )
-        exit(1)
-
-
-def create_zip(output_dir: Path, zip_filename : Path):
-    with ZipFile(zip_filename, 'w') as zipf:
-        for file_path in output_dir.rglob('*'):            
-            if file_path.is_file():
-                filename = str(file_path.name)
-                if filename == 'asset.zip':
-                    continue
-                file_local = file_path.relative_to(output_dir)
-                zipf.write(file_path, file_local)
+    # python tools run in this interpreter (warm imports) if configured, 
+    # everything else (and python in subprocess mode) is started as own process
+    # a step with "timeout" (seconds) always runs as own process, only a process can be stopped
+    #logger.info(script_call)
+    logger.info(f">>>    start command {script_config['name']}")
+    is_python = script_config['environment type'] == "python"
+    timeout = script_config.get('timeout')
+    if is_python and not timeout and script_config.get('execution', EXECUTION_SUBPROCESS) == EXECUTION_INPROCESS:
+        return_code = run_in_process(str(script_config['params']['call']), script_call, script_config['name'], project_root)
+    else:
+        interpreter_call = [script_config['environment type']]
+        # disables frozen standard modules so that Python loads them from the hard disk. 
+        # This can be useful if you are working on the Python interpreter itself or testing changes to the standard modules 
+        # and do not want to use a frozen version.
+        if is_python:
+            interpreter_call.append('-X')
+            interpreter_call.append('frozen_modules=off')
+            interpreter_call.append('-m') # as module
+        interpreter_call.append(script_path)
+        return_code = run_subprocess(interpreter_call + script_call, script_config['name'], project_root, timeout)
+
+    if return_code != 0:
+        return False
+    logger.info(f"   <<< end command {script_config['name']}")
+    return True
+
+
+# run the script of a step or restore its outputs from the cache, returns True on success
+def run_step(step: PipelineStep, asset_file: Path, output_dir: Path, cache: StepCache = None, metrics: PipelineMetrics = None) -> bool:
+    usage = metrics.start_step() if metrics else None
+    inputs, outputs = get_script_files(step.config, asset_file, output_dir)
+    status = run_cached_script(step, asset_file, output_dir, inputs, outputs, cache)
+    if metrics:
+        metrics.end_step(step, usage, status, inputs, outputs)
+    return status != 'failed'
+
+
+# returns the status of the step: success, cached or failed
+def run_cached_script(step: PipelineStep, asset_file: Path, output_dir: Path, inputs: list, outputs: list, cache: StepCache = None) -> str:
+    key = None
+    if cache and StepCache.is_cacheable(step.config, outputs, output_dir):
+        key = cache.get_key(step.config, inputs, outputs, output_dir)
+        if cache.restore(key, output_dir):
+            logger.info(f">>> <<< restored {step.name} from cache")
+            return 'cached'
+
+    if not execute_script(step.config, asset_file, output_dir):
+        return 'failed'
+
+    if key:
+        cache.store(key, outputs, output_dir, step.name)
+    return 'success'
+
+
+# zip_filename '-' writes the archive to stdout
+def create_zip(output_dir: Path, zip_filename, settings: dict):
+    create_zip_archive(output_dir, zip_filename, settings, exclude=['asset.zip'])
 
 
 def get_asset_type_extension(asset_file: Path):
@@ -163,16 +237,16 @@ def get_asset_type(asset_type: Path) -> str:
     exit(1)
 
 
-def main():
-    # parse arguments
-    parser = argparse.ArgumentParser(prog='main.py', description='extracted from asset and user infos all extractor/creator scripts are called to create an asset archive.')
-    parser.add_argument('filename', type=str,help='filename of asset data.')
-    parser.add_argument('-config', type=str, help='config path for sub tools.')
-    parser.add_argument('-out', type=str, help='output path for asset archive.')
-    args = parser.parse_args()
-
+# run all applicable tools for the asset and create the asset archive in output_dir/<asset name>
+# returns the filename of the archive, stops with exit(1) on errors
+# cache_dir overrides the cache folder of process.json, use_cache=False executes every step
+# archive overrides the archive filename (default <out>/<asset name>/asset.zip), '-' streams it to stdout
+# compression and level override the "archive" settings of process.json
+# the metrics of all steps are written to pipeline_metrics.json beside the archive, metrics_table logs them as table
+def extract_asset(asset_file: Path, config_dir: Path, output_dir: Path, execution: str = None, workers: int = None,
+                  cache_dir: Path = None, use_cache: bool = True, archive: str = None, compression: str = None, level: int = None,
+                  metrics_table: bool = False):
     # determine asset type (e.g., ".xodr")
-    asset_file = Path(args.filename)
     asset_file = asset_file.resolve()
     if not asset_file.exists():
         logger.error(f'asset file {asset_file} not exists')
@@ -180,12 +254,14 @@ def main():
     logger.info(f'asset file {asset_file}')
 
     # load all configs that are applicable to the asset type 
-    config_dir = Path(args.config)
     config_dir = config_dir.resolve()
     if not config_dir.is_dir():
         logger.error(f'config path {config_dir} not exists')
         exit(1)
-    applicable_scripts = get_configs(config_dir, asset_file)
+    applicable_scripts = get_configs(config_dir, asset_file, execution)
+    # check the archive settings before the pipeline runs
+    process_config = get_process_config(config_dir)
+    archive_settings = get_archive_settings(process_config, compression, level)
 
     # create, cleanup output directory for the asset file
     asset_name = asset_file.stem
@@ -193,7 +269,6 @@ def main():
         logger.error(f"File {asset_name} has points in name! Not supported!")
         exit(1)
 
-    output_dir = Path(args.out)
     output_dir = output_dir.resolve()    
     output_sub_dir = output_dir / asset_name
     if output_sub_dir.exists():
@@ -201,18 +276,67 @@ def main():
     output_sub_dir.mkdir(parents=True, exist_ok=True)
     print (f'output path {output_sub_dir}')  
 
-    # execute each script and collect outputs
-    for script_config in applicable_scripts:
-        execute_script(script_config, asset_file, output_sub_dir)
+    # execute the scripts, independent ones in parallel, and collect outputs
+    steps = []
+    for index, script_config in enumerate(applicable_scripts):
+        inputs, outputs = get_script_files(script_config, asset_file, output_sub_dir)
+        steps.append(PipelineStep(index, script_config, inputs, outputs))
+    max_workers = workers if workers else process_config.get('max workers', 1)
+    cache = StepCache(get_cache_dir(process_config, output_dir, cache_dir), Path(__file__).parent.parent) if use_cache else None
+    metrics = PipelineMetrics(asset_file)
+    success = run_pipeline(steps, lambda step: run_step(step, asset_file, output_sub_dir, cache, metrics), max_workers)
+    metrics.set_total('workers', max_workers)
+    metrics.set_total('pipeline_seconds', round(time.perf_counter() - metrics.start, 3))
+    if not success:
+        metrics.write(output_sub_dir / 'pipeline_metrics.json')
+        if metrics_table:
+            metrics.log_table()
+        exit(1)
 
     # remove temp folder before
     temp_path = output_sub_dir / 'temp'
     shutil.rmtree(temp_path)
 
     # create a zip file of the output directory
-    zip_filename = output_sub_dir / f"asset.zip"
-    create_zip(output_sub_dir, zip_filename)
+    zip_filename = archive if archive == '-' else (Path(archive).resolve() if archive else output_sub_dir / f"asset.zip")
+    archive_start = time.perf_counter()
+    create_zip(output_sub_dir, zip_filename, archive_settings)
+    metrics.set_total('archive_seconds', round(time.perf_counter() - archive_start, 3))
+
+    # metrics beside the archive, after zipping so they are not part of it
+    if zip_filename == '-':
+        metrics_file = output_sub_dir / 'pipeline_metrics.json'
+    else:
+        metrics.set_total('archive_bytes', zip_filename.stat().st_size)
+        metrics_file = zip_filename.parent / 'pipeline_metrics.json'
+    metrics.write(metrics_file)
+    if metrics_table:
+        metrics.log_table()
+    return zip_filename
+
+
+def main():
+    # parse arguments
+    parser = argparse.ArgumentParser(prog='main.py', description='extracted from asset and user infos all extractor/creator scripts are called to create an asset archive.')
+    parser.add_argument('filename', type=str,help='filename of asset data.')
+    parser.add_argument('-config', type=str, help='config path for sub tools.')
+    parser.add_argument('-out', type=str, help='output path for asset archive.')
+    parser.add_argument('-execution', type=str, choices=execution_modes, help='run python tools in this interpreter (inprocess) or as own process (subprocess), default from process.json.')
+    parser.add_argument('-workers', type=int, help='maximal number of tools running at the same time, default from process.json.')
+    parser.add_argument('-cache', type=str, help='folder of the step cache, default "cache folder" of process.json or <out>/.cache/steps.')
+    parser.add_argument('-nocache', action='store_true', help='execute all steps without using the step cache.')
+    parser.add_argument('-archive', type=str, help='filename of the asset archive, "-" writes it to stdout, default <out>/<asset name>/asset.zip.')
+    parser.add_argument('-compression', type=str, choices=compression_modes, help='compression of the archive, default "archive" of process.json.')
+    parser.add_argument('-level', type=int, help='compression level of the archive, default "archive" of process.json.')
+    parser.add_argument('-metrics', action='store_true', help='log a table of the time and resources of every step.')
+    args = parser.parse_args()
+
+    # stdout is reserved for the archive, messages of the tools are redirected to stderr
+    redirect = contextlib.redirect_stdout(sys.stderr) if args.archive == '-' else contextlib.nullcontext()
+    with redirect:
+        extract_asset(Path(args.filename), Path(args.config), Path(args.out), args.execution, args.workers,
+                      Path(args.cache) if args.cache else None, not args.nocache, args.archive, args.compression, args.level, args.metrics)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
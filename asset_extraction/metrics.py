@@ -0,0 +1,113 @@
+from pathlib import Path
+
+import json
+import logging
+import sys
+import threading
+import time
+
+try:
+    import resource  # not available on windows
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+# resource usage of the running thread and of all finished child processes
+# - cpu of in-process tools is measured per thread (RUSAGE_THREAD or thread_time)
+# - cpu of subprocesses and external programs (java, checker bundles) is the RUSAGE_CHILDREN delta,
+#   with several workers the children of parallel steps are mixed
+# - max rss values are high-water marks of this process and of the largest child so far, a step reports how much
+#   it raised them (end minus start), the memory of a step below an earlier peak is not visible
+def get_usage() -> dict:
+    usage = {'wall': time.perf_counter(), 'cpu': time.thread_time(), 'children_cpu': None, 'max_rss_kb': None, 'children_max_rss_kb': None}
+    if resource:
+        if hasattr(resource, 'RUSAGE_THREAD'):
+            thread = resource.getrusage(resource.RUSAGE_THREAD)
+            usage['cpu'] = thread.ru_utime + thread.ru_stime
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        usage['children_cpu'] = children.ru_utime + children.ru_stime
+        usage['max_rss_kb'] = get_rss_kb(own.ru_maxrss)
+        usage['children_max_rss_kb'] = get_rss_kb(children.ru_maxrss)
+    return usage
+
+
+# ru_maxrss is in bytes on macOS and in kilobytes on linux
+def get_rss_kb(max_rss: int) -> int:
+    return max_rss // 1024 if sys.platform == 'darwin' else max_rss
+
+
+# sum of the file sizes of files and folders
+def get_size(paths: list) -> int:
+    size = 0
+    for path in paths:
+        path = Path(path)
+        if path.is_file():
+            size += path.stat().st_size
+        elif path.is_dir():
+            size += sum(file.stat().st_size for file in path.rglob('*') if file.is_file())
+    return size
+
+
+# metrics of all steps of one asset, written as pipeline_metrics.json
+class PipelineMetrics:
+    def __init__(self, asset_file: Path):
+        self.asset_file = asset_file
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+        self.steps = []
+        self.totals = {}
+
+    # call in the worker thread of the step before it runs, returns the usage at the start
+    def start_step(self) -> dict:
+        return get_usage()
+
+    def end_step(self, step, usage: dict, status: str, inputs: list, outputs: list):
+        end = get_usage()
+        metrics = {
+            'index': step.index,
+            'name': step.name,
+            'execution': step.config.get('execution'),
+            'status': status,
+            'start_seconds': round(usage['wall'] - self.start, 3),
+            'wall_seconds': round(end['wall'] - usage['wall'], 3),
+            'cpu_seconds': round(end['cpu'] - usage['cpu'], 3),
+            'children_cpu_seconds': round(end['children_cpu'] - usage['children_cpu'], 3) if resource else None,
+            'max_rss_increase_kb': end['max_rss_kb'] - usage['max_rss_kb'] if resource else None,
+            'children_max_rss_increase_kb': end['children_max_rss_kb'] - usage['children_max_rss_kb'] if resource else None,
+            'input_bytes': get_size(inputs),
+            'output_bytes': get_size(outputs),
+        }
+        with self.lock:
+            self.steps.append(metrics)
+
+    def set_total(self, name: str, value):
+        self.totals[name] = value
+
+    def to_dict(self) -> dict:
+        usage = get_usage()
+        return {
+            'asset': self.asset_file.as_posix(),
+            'wall_seconds': round(usage['wall'] - self.start, 3),
+            'max_rss_kb': usage['max_rss_kb'],
+            'children_max_rss_kb': usage['children_max_rss_kb'],
+            **self.totals,
+            'steps': sorted(self.steps, key=lambda metrics: metrics['index']),
+        }
+
+    def write(self, filename: Path):
+        with open(filename, 'w') as file:
+            json.dump(self.to_dict(), file, indent=4)
+
+    def log_table(self):
+        header = f"{'step':<28} {'status':<8} {'start s':>8} {'wall s':>8} {'cpu s':>8} {'child s':>8} {'+rss MB':>8} {'in MB':>9} {'out MB':>9}"
+        lines = [header, '-' * len(header)]
+        for metrics in sorted(self.steps, key=lambda metrics: metrics['index']):
+            children_cpu = metrics['children_cpu_seconds'] if metrics['children_cpu_seconds'] is not None else 0.0
+            rss_increase = max(metrics['max_rss_increase_kb'] or 0, metrics['children_max_rss_increase_kb'] or 0) / 1024
+            lines.append(f"{metrics['name'][:28]:<28} {metrics['status']:<8} {metrics['start_seconds']:>8.2f} {metrics['wall_seconds']:>8.2f} "
+                         f"{metrics['cpu_seconds']:>8.2f} {children_cpu:>8.2f} {rss_increase:>8.1f} "
+                         f"{metrics['input_bytes'] / 1e6:>9.2f} {metrics['output_bytes'] / 1e6:>9.2f}")
+        logger.info('pipeline metrics\n' + '\n'.join(lines))
@@ -0,0 +1,65 @@
+from pathlib import Path
+from utils.process_runner import run_process
+
+import importlib
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# supported execution modes for python tools
+EXECUTION_SUBPROCESS = 'subprocess'
+EXECUTION_INPROCESS = 'inprocess'
+execution_modes = [EXECUTION_SUBPROCESS, EXECUTION_INPROCESS]
+
+# tools with module state set INPROCESS_EXCLUSIVE = True, they never run twice at the same time in one interpreter
+g_module_locks = {}
+g_module_locks_lock = threading.Lock()
+
+
+# run a script as own process, the output is logged while it runs, returns the return code
+# the process is stopped after timeout seconds
+def run_subprocess(script_call: list, name: str, cwd: Path, timeout: float = None) -> int:
+    result = run_process(script_call, name, cwd, timeout)
+    if result.returncode != 0:
+        logger.error(f"!!!!!!!!!!!! Command {name} failed with return code {result.returncode}")
+    return result.returncode or (1 if result.timed_out else 0)
+
+
+# import the tool module once and call its main(argv) inside this interpreter, returns the return code
+# the tools stop with exit(code) on errors, this is mapped to the return code like for a subprocess
+def run_in_process(module_name: str, arguments: list, name: str, cwd: Path) -> int:
+    # the tools resolve relative paths (e.g. shacles folder) against the project root
+    if Path.cwd() != cwd:
+        os.chdir(cwd)
+
+    try:
+        module = importlib.import_module(module_name)
+    except Exception:
+        logger.exception(f'!!!!!!!!!!!! Could not import module {module_name} for command {name}')
+        return 1
+    if not hasattr(module, 'main'):
+        logger.error(f'!!!!!!!!!!!! Module {module_name} has no main function')
+        return 1
+
+    if getattr(module, 'INPROCESS_EXCLUSIVE', False):
+        with g_module_locks_lock:
+            module_lock = g_module_locks.setdefault(module_name, threading.Lock())
+        with module_lock:
+            return call_main(module, arguments, name)
+    return call_main(module, arguments, name)
+
+
+def call_main(module, arguments: list, name: str) -> int:
+    try:
+        module.main([str(arg) for arg in arguments])
+        return 0
+    except SystemExit as e:
+        return_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if return_code != 0:
+            logger.error(f"!!!!!!!!!!!! Command {name} failed with return code {return_code}")
+        return return_code
+    except Exception:
+        logger.exception(f"!!!!!!!!!!!! Command {name} failed with an exception")
+        return 1
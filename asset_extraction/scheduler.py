@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, List
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+# one config of the pipeline with the files it reads and writes
+class PipelineStep:
+    def __init__(self, index: int, config: dict, inputs: list, outputs: list):
+        self.index = index
+        self.config = config
+        self.name = config['name']
+        self.inputs = [normalize_path(path) for path in inputs if not is_url(path)]
+        self.outputs = [normalize_path(path) for path in outputs if not is_url(path)]
+        self.dependencies = set()  # indices of steps that must be finished before
+
+
+def is_url(path) -> bool:
+    return 'https:' in str(path) or 'http:' in str(path)
+
+
+def normalize_path(path) -> str:
+    return os.path.normcase(os.path.normpath(str(path)))
+
+
+# true if both paths are equal or one is a folder that contains the other
+def paths_overlap(path_a: str, path_b: str) -> bool:
+    if path_a == path_b:
+        return True
+    return path_a.startswith(path_b.rstrip(os.sep) + os.sep) or path_b.startswith(path_a.rstrip(os.sep) + os.sep)
+
+
+def any_overlap(paths_a: list, paths_b: list) -> bool:
+    return any(paths_overlap(a, b) for a in paths_a for b in paths_b)
+
+
+# a step depends on every earlier step (order of process.json) it shares files with:
+# - it reads what the earlier step writes (read after write)
+# - it writes what the earlier step writes or reads (write after write / write after read)
+# edges only point to earlier steps, so the graph has no cycles and one worker gives the old sequential order
+def build_dependency_graph(steps: List[PipelineStep]):
+    for later in steps:
+        for earlier in steps[:later.index]:
+            if any_overlap(earlier.outputs, later.inputs) \
+               or any_overlap(earlier.outputs, later.outputs) \
+               or any_overlap(earlier.inputs, later.outputs):
+                later.dependencies.add(earlier.index)
+        logger.debug(f'step {later.index} {later.name} depends on {sorted(later.dependencies)}')
+
+
+# run all steps on a worker pool, a step is started as soon as all its dependencies are finished
+# after a failed step no new steps are started, running ones are finished. returns True if all steps succeeded
+def run_pipeline(steps: List[PipelineStep], run_step: Callable[[PipelineStep], bool], max_workers: int = 1) -> bool:
+    build_dependency_graph(steps)
+
+    pending = list(steps)
+    finished = set()
+    running = {}
+    success = True
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while pending or running:
+            # start every ready step in config order
+            if success:
+                for step in [step for step in pending if step.dependencies <= finished]:
+                    if len(running) >= max(1, max_workers):
+                        break
+                    pending.remove(step)
+                    running[executor.submit(run_step, step)] = step
+
+            if not running:
+                break
+
+            done, _ = wait(running.keys(), return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                try:
+                    step_success = future.result()
+                except (Exception, SystemExit):
+                    logger.exception(f'step {step.name} raised an exception')
+                    step_success = False
+                if step_success:
+                    finished.add(step.index)
+                else:
+                    success = False
+
+    if pending:
+        logger.error(f'not executed steps: {[step.name for step in pending]}')
+    return success and not pending
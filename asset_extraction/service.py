@@ -0,0 +1,266 @@
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from datetime import datetime
+from asset_extraction.main import extract_asset, get_process_config, asset_types
+from asset_extraction.runner import EXECUTION_INPROCESS, EXECUTION_SUBPROCESS
+
+import socketserver
+import importlib
+import argparse
+import logging
+import socket
+import json
+import threading
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# long running asset extraction, tool modules, pyproj and parsed shacls stay loaded between the jobs
+# protocol: one json object per line on a local tcp socket, every request is answered with one json line
+# - {"command": "submit", "filename": ..., "out": ..., "config": ..., "workers": ..., "nocache": ...} -> job
+# - {"command": "status", "id": ...} -> job
+# - {"command": "list"} -> {"jobs": [...]}
+# - {"command": "shutdown"} -> {"status": "ok"}
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCESS = 'success'
+JOB_FAILED = 'failed'
+job_done_states = [JOB_SUCCESS, JOB_FAILED]
+MAX_FINISHED_JOBS = 1000  # the oldest finished jobs are removed, queued and running jobs are kept
+
+
+# load everything the tools need once: tool modules, pyproj database, rdflib plugins and the local shacls
+def warm_up(config_dir: Path, project_root: Path):
+    from utils.utils import parse_shacl_file, g_shacle_folder  # not at top, the client must not load rdflib
+
+    start = time.perf_counter()
+    process_config = get_process_config(config_dir)
+    default_execution = process_config.get('execution', EXECUTION_SUBPROCESS)
+    for entry in process_config.get('config_files', []):
+        with open(config_dir / entry['filename'], 'r') as file:
+            config = json.load(file)
+        # the shacls are shared by all jobs, a step refreshing them per job discards the warm state
+        if '-removeShacl' in config['params'].get('additional', {}):
+            logger.warning(f"{config['name']} downloads the shacls again for every job, remove -removeShacl from {entry['filename']}")
+        if config['environment type'] != 'python' or config.get('execution', default_execution) != EXECUTION_INPROCESS:
+            continue
+        try:
+            importlib.import_module(config['params']['call'])
+        except Exception:
+            logger.warning(f"could not preload {config['params']['call']}", exc_info=True)
+
+    try:
+        import pyproj
+        pyproj.CRS.from_epsg(4326)
+    except ImportError:
+        pass
+
+    shacl_files = sorted((project_root / g_shacle_folder).glob('*_shacl.ttl'))
+    for shacl_file in shacl_files:
+        try:
+            parse_shacl_file(shacl_file)
+        except Exception:
+            logger.warning(f'could not parse {shacl_file}', exc_info=True)
+    logger.info(f'warm up with {len(shacl_files)} shacls in {time.perf_counter() - start:.2f} s')
+
+
+class JobQueue:
+    def __init__(self, config_dir: Path, output_dir: Path, jobs: int):
+        self.config_dir = config_dir
+        self.output_dir = output_dir
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.finished = deque()  # ids of the finished jobs, oldest first
+        self.executor = ThreadPoolExecutor(max_workers=max(1, jobs))
+
+    def submit(self, request: dict) -> dict:
+        from utils.utils import create_uuid
+
+        if 'filename' not in request:
+            return {'error': 'filename missing'}
+        asset_file = Path(request['filename']).resolve()
+        output_dir = Path(request['out']).resolve() if request.get('out') else self.output_dir
+        output = (output_dir / asset_file.stem).as_posix()
+        if asset_file.suffix.lstrip('.') not in list(asset_types) + ['zip', '7z']:
+            return {'error': f'asset type of {asset_file} not supported'}
+
+        with self.lock:
+            # two jobs with the same output folder would delete each others files
+            for job in self.jobs.values():
+                if job['output'] == output and job['status'] not in job_done_states:
+                    return {'error': f"job {job['id']} writes to {output}"}
+            job = {
+                'id': create_uuid(),
+                'filename': asset_file.as_posix(),
+                'output': output,
+                'status': JOB_QUEUED,
+                'submitted': datetime.now().isoformat(timespec='seconds'),
+            }
+            self.jobs[job['id']] = job
+        self.executor.submit(self.run, job, request, output_dir)
+        return dict(job)
+
+    def run(self, job: dict, request: dict, output_dir: Path):
+        config_dir = Path(request['config']).resolve() if request.get('config') else self.config_dir
+        with self.lock:
+            job['status'] = JOB_RUNNING
+            job['started'] = datetime.now().isoformat(timespec='seconds')
+        start = time.perf_counter()
+        result = {}
+        try:
+            archive = extract_asset(Path(job['filename']), config_dir, output_dir, request.get('execution'), request.get('workers'),
+                                    use_cache=not request.get('nocache', False),
+                                    compression=request.get('compression'), level=request.get('level'))
+            result = {'status': JOB_SUCCESS, 'archive': archive.as_posix(), 'metrics': (archive.parent / 'pipeline_metrics.json').as_posix()}
+        except SystemExit as e:
+            result = {'status': JOB_FAILED, 'error': f'exit code {e.code}'}
+        except Exception as e:
+            logger.exception(f"job {job['id']} failed")
+            result = {'status': JOB_FAILED, 'error': repr(e)}
+        with self.lock:
+            job.update(result)
+            job['finished'] = datetime.now().isoformat(timespec='seconds')
+            job['seconds'] = round(time.perf_counter() - start, 3)
+            self.finished.append(job['id'])
+            while len(self.finished) > MAX_FINISHED_JOBS:
+                del self.jobs[self.finished.popleft()]
+        logger.info(f"job {job['id']} {job['filename']} {job['status']} in {job['seconds']} s")
+
+    def status(self, job_id: str) -> dict:
+        with self.lock:
+            if job_id not in self.jobs:
+                return {'error': f'job {job_id} not found'}
+            return dict(self.jobs[job_id])
+
+    def list(self) -> dict:
+        with self.lock:
+            return {'jobs': [dict(job) for job in self.jobs.values()]}
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                response = self.server.handle_request_data(request)
+            except (json.JSONDecodeError, AttributeError) as e:
+                response = {'error': f'invalid request: {e}'}
+            self.wfile.write((json.dumps(response) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+
+class ExtractionServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, job_queue: JobQueue):
+        super().__init__(address, RequestHandler)
+        self.job_queue = job_queue
+
+    def handle_request_data(self, request: dict) -> dict:
+        command = request.get('command')
+        if command == 'submit':
+            return self.job_queue.submit(request)
+        if command == 'status':
+            return self.job_queue.status(request.get('id', ''))
+        if command == 'list':
+            return self.job_queue.list()
+        if command == 'shutdown':
+            # shutdown waits for serve_forever, it must not run in the thread of serve_forever
+            threading.Thread(target=self.shutdown).start()
+            return {'status': 'ok'}
+        return {'error': f'unknown command {command}'}
+
+
+def serve(config_dir: Path, output_dir: Path, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, jobs: int = 1):
+    # the tools resolve relative paths (e.g. shacles folder) against the project root
+    project_root = Path(__file__).parent.parent
+    os.chdir(project_root)
+    warm_up(config_dir, project_root)
+
+    job_queue = JobQueue(config_dir, output_dir, jobs)
+    with ExtractionServer((host, port), job_queue) as server:
+        logger.info(f'asset extraction service listening on {host}:{port} with {jobs} parallel jobs')
+        server.serve_forever()
+    # running jobs are finished before the service stops
+    job_queue.executor.shutdown(wait=True)
+    logger.info('asset extraction service stopped')
+
+
+# client: send one request and return the response
+def send_request(request: dict, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> dict:
+    with socket.create_connection((host, port)) as connection:
+        connection.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        with connection.makefile('rb') as stream:
+            return json.loads(stream.readline())
+
+
+def wait_for_job(job_id: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, interval: float = 1.0) -> dict:
+    while True:
+        job = send_request({'command': 'status', 'id': job_id}, host, port)
+        if 'error' in job or job['status'] in job_done_states:
+            return job
+        time.sleep(interval)
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(prog='service.py', description='asset extraction as long running service and client for it.')
+    parser.add_argument('-host', type=str, default=DEFAULT_HOST, help='host of the service, default 127.0.0.1.')
+    parser.add_argument('-port', type=int, default=DEFAULT_PORT, help=f'port of the service, default {DEFAULT_PORT}.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='start the service.')
+    serve_parser.add_argument('-config', type=str, required=True, help='default config path for sub tools.')
+    serve_parser.add_argument('-out', type=str, required=True, help='default output path for asset archives.')
+    serve_parser.add_argument('-jobs', type=int, default=1, help='number of assets processed at the same time, default 1.')
+
+    submit_parser = commands.add_parser('submit', help='submit an asset.')
+    submit_parser.add_argument('filename', type=str, help='filename of asset data.')
+    submit_parser.add_argument('-config', type=str, help='config path for sub tools, default of the service.')
+    submit_parser.add_argument('-out', type=str, help='output path for asset archive, default of the service.')
+    submit_parser.add_argument('-workers', type=int, help='maximal number of tools running at the same time.')
+    submit_parser.add_argument('-nocache', action='store_true', help='execute all steps without using the step cache.')
+    submit_parser.add_argument('-wait', action='store_true', help='wait until the job is finished.')
+
+    status_parser = commands.add_parser('status', help='status of a job.')
+    status_parser.add_argument('id', type=str, help='job id.')
+    commands.add_parser('list', help='status of all jobs.')
+    commands.add_parser('shutdown', help='stop the service after the running jobs.')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(Path(args.config).resolve(), Path(args.out).resolve(), args.host, args.port, args.jobs)
+        return
+
+    # paths are sent absolute, the service has its own working directory
+    if args.command == 'submit':
+        request = {'command': 'submit', 'filename': str(Path(args.filename).resolve()), 'nocache': args.nocache}
+        if args.config:
+            request['config'] = str(Path(args.config).resolve())
+        if args.out:
+            request['out'] = str(Path(args.out).resolve())
+        if args.workers:
+            request['workers'] = args.workers
+        response = send_request(request, args.host, args.port)
+        if args.wait and 'error' not in response:
+            response = wait_for_job(response['id'], args.host, args.port)
+    elif args.command == 'status':
+        response = send_request({'command': 'status', 'id': args.id}, args.host, args.port)
+    else:
+        response = send_request({'command': args.command}, args.host, args.port)
+
+    print(json.dumps(response, indent=4))
+    if 'error' in response or response.get('status') == JOB_FAILED:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
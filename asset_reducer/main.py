@@ -1,89 +1,119 @@
 from lxml import etree
 from pathlib import Path
+from asset_reducer.reduced_format import ReducedWriter, write_reduced, read_reduced, BLOCK_SIZE
+from asset_reducer.mapping_plan import get_mapping_plan
+from asset_reducer.reduce_functions import RecordBatch, Extent, evaluate_batches, BATCH_SIZE
 
 import argparse
 import logging
 import json
-import pickle
 
 logger = logging.getLogger(__name__)
 
 
-################ reduce functions ########################
-def calcExtrema(element, nodename):
-    if element is None:
-        return None
-    
-    min_value = float('inf')
-    max_value = float('-inf')
-    
-    children = element.findall(nodename)
-    if not children:
-        return {}
-    
-    for child in children:
-        value = float(child.get('a', 0))
-        if value < min_value:
-            min_value = value
-        if value > max_value:
-            max_value = value
-    return {'min': min_value, 'max': max_value}
-
-
-# reduce xml to json functions
-def extract_attributes(element, attributes):
-    #return {attr: element.get(attr) for attr in attributes if element.get(attr) is not None}
-    attres = {}
-    for attr in attributes:
-        element_attr = element.get(attr)
-        if element_attr is not None:
-            attres[attr] = element_attr
-    return attres
-
-
-def process_element(element, mapping):
-    tag = element.tag
-    node_data = {}
-        
-    # extract attributes
-    tag_exist = False
-    if tag in mapping:
-        tag_exist = True
-        tag_mapping = mapping[tag]
-        if "attributes" in tag_mapping:
-            attres = extract_attributes(element, tag_mapping["attributes"])
-            node_data.update(attres)
-        if "function" in tag_mapping:
-            func_name = tag_mapping['function']
-            if func_name[0] == 'calcExtrema':
-                values = calcExtrema(element, func_name[1])
-                if values:
-                    node_data.update(values)
-
-    # traverse children
-    children = list(element)
-    if children:
-        for child in children:
-            child_data = process_element(child, mapping)
-            if child_data:
-                for key, value in child_data.items():
-                    if key not in node_data:
-                        node_data[key] = []
-                    node_data[key].append(value)
-    
-    if tag == "geoReference" and element.getparent().tag == "header":
-        node_data.update({'proj4_str': element.text})  
-    
-    if node_data or tag_exist: #tag_exist aber node_data is empty
-        return {tag: node_data}
-    else:
-        return None     
-    
+# extent of the nearest mapped ancestor on the stack (see Extent)
+def get_extent(stack: list):
+    for i in range(len(stack) - 1, 0, -1):
+        tag, tag_plan, values, _, _ = stack[i]
+        if tag_plan is None:
+            continue
+        parent = stack[i - 1]
+        if parent[4] is None:
+            parent[4] = {}
+        outer = next((frame[2] for frame in reversed(stack[:i]) if frame[1] is not None and 'length' in frame[2]), None)
+        return Extent(tag, values, parent[4], outer)
+    return None
+
+
+# reduced top level elements {tag: node_data} in document order
+# the xml is streamed with an explicit stack, every top level element is removed after it is reduced,
+# so memory is bounded by the largest top level element (e.g. a road)
+# frame of an open element: [tag, plan, values, records, children], unmapped elements only have tag and children
+# function values are evaluated in batches of many elements, top level elements wait until their batch is evaluated
+def reduce_elements(xml_file_path, plan: dict, batch_size: int = BATCH_SIZE):
+    stack = []
+    batches = {}        # (tag, record tag) -> RecordBatch
+    batch_records = 0
+    pending = []        # top level elements with function values not evaluated yet
+    get_plan = plan.get
+    for event, element in etree.iterparse(str(xml_file_path), events=('start', 'end'), huge_tree=True, remove_comments=True, remove_pis=True):
+        tag = element.tag
+        if event == 'start':
+            if stack:
+                parent = stack[-1]
+                if parent[1] is not None and tag in parent[1].record_attributes:
+                    parent[3].setdefault(tag, []).append(tuple(map(element.get, parent[1].record_attributes[tag])))
+            tag_plan = get_plan(tag)
+            if tag_plan is None:
+                stack.append([tag, None, None, None, None])
+            else:
+                get = element.get
+                values = {}
+                for attr in tag_plan.attributes:
+                    value = get(attr)
+                    if value is not None:
+                        values[attr] = value
+                stack.append([tag, tag_plan, values, {}, None])
+            continue
+
+        _, tag_plan, node_data, records, children = stack.pop()
+        if not stack:  # root
+            break
+        if tag_plan is None:
+            if children is None:
+                node_data = None
+            else:
+                node_data = children
+        else:
+            # same order as before: attributes, function values, children, text
+            for record_tag, record_functions in tag_plan.functions.items():
+                function_records = records.get(record_tag, ())
+                if not function_records:
+                    record_functions = tuple(item for item in record_functions if not item[0].needs_records)
+                    if not record_functions:
+                        continue
+                # placeholders, the values are filled in when the batch is evaluated
+                for _, _, keys in record_functions:
+                    for key in keys:
+                        node_data[key] = None
+                batch = batches.get((tag, record_tag))
+                if batch is None:
+                    batch = batches[(tag, record_tag)] = RecordBatch(record_tag, tag_plan.record_attributes[record_tag], tag_plan.functions[record_tag])
+                batch.add(function_records, node_data, get_extent(stack) if batch.needs_context else None)
+                batch_records += len(function_records) + 1
+            if children is not None:
+                node_data.update(children)
+            if tag_plan.text_parent is not None and stack[-1][0] == tag_plan.text_parent:
+                node_data[tag_plan.text_key] = element.text
+
+        if len(stack) > 1:
+            if node_data or (tag_plan is not None and tag_plan.exists): #tag_exist aber node_data is empty
+                parent = stack[-1]
+                if parent[4] is None:
+                    parent[4] = {}
+                parent[4].setdefault(tag, []).append(node_data)
+            continue
+
+        # top level element: its subtree is freed after it is reduced
+        if node_data or (tag_plan is not None and tag_plan.exists):
+            pending.append({tag: node_data})
+        if not batches or batch_records >= batch_size:
+            evaluate_batches(batches)
+            batch_records = 0
+            yield from pending
+            pending.clear()
+        element.clear()
+        root = element.getparent()
+        while element.getprevious() is not None:
+            del root[0]
+
+    evaluate_batches(batches)
+    yield from pending
+
 
 def read_json_file(file_path, binary):
     if binary:
-        with open(file_path, 'rb') as f:
-            json_data = pickle.load(f)
+        json_data = read_reduced(file_path)
     else:
         with open(file_path, 'r') as file:
             json_data_binary = file.read()
@@ -91,16 +121,6 @@ def read_json_file(file_path, binary):
     return json_data       
 
 
-# mapping table
-def load_mapping_table(mapping_file):
-    if not Path(mapping_file).exists():
-        logger.info(f"file '{mapping_file}' not exist.")
-        return None
-    with open(mapping_file, 'r') as f:
-        node_mapping = json.load(f)
-    return node_mapping
-
-
 def json_to_xml_add_attributes_and_children(parent, data):
     for key, value in data.items():
         if isinstance(value, dict):
@@ -137,21 +157,21 @@ def json_to_xml(json_data):
     return root
 
 
-# io functions for JSON 
+# io functions for JSON, binary is the reduced asset format (see reduced_format.py)
 def save_json(data, file_name, binary):
     if binary:
-        with open(file_name, 'wb') as f:
-            pickle.dump(data, f)
+        write_reduced(data, file_name)
     else:
         with open(file_name, 'w') as f:
             json.dump(data, f, indent=4)
   
 
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(prog='main.py', description='reduces the original xml to relevant nodes and attributes (see mapping_tables) and writes a binary json for the extended search.')   
     parser.add_argument('filename', type=str,help='filename of asset in xml format.')
     parser.add_argument('-out', type=str, help='output filname for reduced file.')
-    args = parser.parse_args()
+    parser.add_argument('-block_size', type=int, default=BLOCK_SIZE, help='sections per block of the inverted index.')
+    args = parser.parse_args(argv)
 
     # Path to the XML file
     xml_file_path = Path(args.filename)
@@ -170,23 +190,22 @@ def main():
     mapping_name = f'mapping_tables/mapping_{asset_type}.json'
     script_dir = Path(__file__).parent.resolve()
     mapping_file = script_dir / mapping_name
-    node_mapping = load_mapping_table(mapping_file)
-    if not node_mapping:
+    node_plan = get_mapping_plan(mapping_file)
+    if not node_plan:
+        exit(1)
+    if args.block_size < 1:
+        logger.error(f'block size {args.block_size} must be at least 1')
         exit(1)
 
-    # read xml 
-    tree = etree.parse(xml_file_path)
-    root = tree.getroot()
-    
-    # convert to json dictonary
-    json_data = []
-    for child in root:
-        result = process_element(child, node_mapping)
-        if result:
-            json_data.append(result)
-
-    # write to json file
-    save_json(json_data, output_json_file, True)
+    # reduce while reading, every top level element is written when it is complete
+    try:
+        with ReducedWriter(output_json_file, args.block_size) as writer:
+            for result in reduce_elements(xml_file_path, node_plan):
+                for tag, node_data in result.items():
+                    writer.add(tag, node_data)
+    except etree.XMLSyntaxError:
+        logger.exception(f'Cannot parse XML from file {xml_file_path}')
+        exit(1)
 
     # test to read json, convert to xml and find nodes
     debug = False
@@ -0,0 +1,84 @@
+from pathlib import Path
+from asset_reducer.reduce_functions import functions
+
+import threading
+import logging
+import json
+
+logger = logging.getLogger(__name__)
+
+# text of an element below a parent, tag -> (parent tag, key), e.g. proj4 string of the OpenDRIVE header
+text_rules = {
+    'geoReference': ('header', 'proj4_str'),
+}
+
+g_plans = {}  # compiled plans per mapping table (path, mtime), stay loaded for in-process runs
+g_plans_lock = threading.Lock()
+
+
+# what to do with an element of a tag, compiled once from the mapping table
+class TagPlan:
+    __slots__ = ('exists', 'attributes', 'functions', 'record_attributes', 'text_parent', 'text_key')
+
+    def __init__(self, exists: bool):
+        self.exists = exists            # tag in the mapping table, kept even without values
+        self.attributes = ()
+        self.functions = {}             # record tag -> ((function, args, keys of the values), ...)
+        self.record_attributes = {}     # record tag -> attributes of a record
+        self.text_parent = None
+        self.text_key = None
+
+
+# mapping table
+def load_mapping_table(mapping_file):
+    if not Path(mapping_file).exists():
+        logger.info(f"file '{mapping_file}' not exist.")
+        return None
+    with open(mapping_file, 'r') as f:
+        node_mapping = json.load(f)
+    return node_mapping
+
+
+# tag -> TagPlan
+def compile_mapping(mapping: dict) -> dict:
+    plan = {}
+    for tag, tag_mapping in mapping.items():
+        tag_plan = TagPlan(True)
+        if "attributes" in tag_mapping:
+            tag_plan.attributes = tuple(tag_mapping["attributes"])
+        function_mappings = list(tag_mapping.get("functions", []))
+        if "function" in tag_mapping:
+            function_mappings.insert(0, tag_mapping["function"])
+        tag_functions = {}
+        for name, record_tag, *args in function_mappings:
+            if name not in functions:
+                logger.warning(f'unknown function {name} for {tag}, supported: {", ".join(functions)}')
+                continue
+            function = functions[name]
+            args = tuple(args)
+            tag_functions[record_tag] = tag_functions.get(record_tag, ()) + ((function, args, function.get_keys(args, record_tag)),)
+            # records of a tag have the attributes of all its functions
+            attributes = tag_plan.record_attributes.get(record_tag, ())
+            attributes += tuple(attr for attr in function.get_attributes(args) if attr not in attributes)
+            tag_plan.record_attributes[record_tag] = attributes
+        tag_plan.functions = tag_functions
+        plan[tag] = tag_plan
+    for tag, (parent, key) in text_rules.items():
+        tag_plan = plan.setdefault(tag, TagPlan(False))
+        tag_plan.text_parent = parent
+        tag_plan.text_key = key
+    return plan
+
+
+# compiled plan of a mapping table, None if the table not exists
+def get_mapping_plan(mapping_file: Path):
+    mapping_file = Path(mapping_file).resolve()
+    if not mapping_file.exists():
+        logger.info(f"file '{mapping_file}' not exist.")
+        return None
+    key = (mapping_file, mapping_file.stat().st_mtime_ns)
+    with g_plans_lock:
+        if key not in g_plans:
+            mapping = load_mapping_table(mapping_file)
+            g_plans[key] = compile_mapping(mapping) if mapping else None
+        return g_plans[key]
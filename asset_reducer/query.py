@@ -0,0 +1,395 @@
+from pathlib import Path
+from typing import Optional
+from asset_reducer.reduced_format import ReducedReader, is_reduced_file
+
+import argparse
+import logging
+import json
+import re
+
+logger = logging.getLogger(__name__)
+
+################ queries over reduced assets ########################
+# a small path language over the nodes of a reduced asset (see reduced_format.py), no xml is built
+#
+#   road                                    top level roads
+#   road[@length>1000]/@id                  ids of roads longer than 1 km
+#   road[.//lane/@type='driving']           roads with a driving lane
+#   //speed[@max>100]                       speed records with max above 100
+#   count(junction)                         number of junctions
+#
+# steps are separated by / (child) or // (descendant), * matches every tag. a predicate [path/@key op value] holds if
+# a node of the relative path (the node itself without a path) has the key with a matching value, [path] if it exists.
+# op is one of = != < <= > >=, a quoted value is compared as text, a number as number. predicates of a step are and-ed.
+# the inverted index of the file selects the blocks of sections (top level elements) which can match, only those are decoded
+
+OPERATORS = {
+    '=': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+TOKEN = re.compile(r"\s*(?:(//|/|\.|\[|\]|\(|\)|@|!=|<=|>=|=|<|>|\*)|'([^']*)'|\"([^\"]*)\"|(-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)|([A-Za-z_][\w.\-]*))")
+
+
+class QueryError(ValueError):
+    pass
+
+
+class Step:
+    __slots__ = ('descendant', 'tag', 'predicates')
+
+    def __init__(self, descendant: bool, tag: str):
+        self.descendant = descendant    # // instead of /
+        self.tag = tag                  # '*' for all tags
+        self.predicates = []
+
+
+class Predicate:
+    __slots__ = ('steps', 'key', 'operator', 'value')
+
+    def __init__(self, steps: list, key: Optional[str], operator: Optional[str], value):
+        self.steps = steps              # relative path, empty for the node itself
+        self.key = key                  # None for an existence test of the path
+        self.operator = operator
+        self.value = value              # str (quoted) or float
+
+
+class Query:
+    __slots__ = ('steps', 'key', 'count')
+
+    def __init__(self, steps: list, key: Optional[str], count: bool):
+        self.steps = steps
+        self.key = key                  # /@key at the end, the values are returned instead of the nodes
+        self.count = count
+
+
+# tokens as (kind, text), kind is 'op', 'str', 'num' or 'name'
+def tokenize(text: str) -> list:
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise QueryError(f'unexpected {text[position:]!r} in query {text!r}')
+        op, single, double, number, name = match.groups()
+        if op is not None:
+            tokens.append(('op', op))
+        elif single is not None or double is not None:
+            tokens.append(('str', single if single is not None else double))
+        elif number is not None:
+            tokens.append(('num', number))
+        else:
+            tokens.append(('name', name))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self, offset: int = 0):
+        position = self.position + offset
+        return self.tokens[position] if position < len(self.tokens) else (None, None)
+
+    def take(self, kind: str = None, text: str = None):
+        token = self.peek()
+        if token[0] is None or (kind is not None and token[0] != kind) or (text is not None and token[1] != text):
+            expected = text or kind or 'more'
+            raise QueryError(f'expected {expected} at token {self.position} of query {self.text!r}')
+        self.position += 1
+        return token[1]
+
+    def accept(self, text: str) -> bool:
+        if self.peek() == ('op', text):
+            self.position += 1
+            return True
+        return False
+
+    def parse(self) -> Query:
+        count = False
+        if self.peek() == ('name', 'count') and self.peek(1) == ('op', '('):
+            self.position += 2
+            count = True
+        steps, key = self.parse_path(relative=False)
+        if count:
+            self.take('op', ')')
+            if key is not None:
+                raise QueryError(f'count of attribute values is not supported in query {self.text!r}')
+        if self.peek()[0] is not None:
+            raise QueryError(f'unexpected {self.peek()[1]!r} in query {self.text!r}')
+        if not steps:
+            raise QueryError(f'empty path in query {self.text!r}')
+        return Query(steps, key, count)
+
+    # steps and an optional @key at the end
+    def parse_path(self, relative: bool):
+        steps = []
+        descendant = False
+        if relative and self.accept('.'):
+            if not (self.peek() in (('op', '/'), ('op', '//'))):
+                return steps, self.parse_key()
+            descendant = self.take('op') == '//'
+        elif self.peek() in (('op', '/'), ('op', '//')):
+            descendant = self.take('op') == '//'
+        while True:
+            if self.peek() == ('op', '@'):
+                return steps, self.parse_key()
+            if self.accept('*'):
+                tag = '*'
+            else:
+                tag = self.take('name')
+            step = Step(descendant, tag)
+            while self.accept('['):
+                step.predicates.append(self.parse_predicate())
+                self.take('op', ']')
+            steps.append(step)
+            if self.peek() not in (('op', '/'), ('op', '//')):
+                return steps, None
+            descendant = self.take('op') == '//'
+
+    def parse_key(self) -> str:
+        self.take('op', '@')
+        return self.take('name')
+
+    def parse_predicate(self) -> Predicate:
+        if self.peek() == ('op', '@'):
+            steps, key = [], self.parse_key()
+        else:
+            steps, key = self.parse_path(relative=True)
+        operator = value = None
+        if self.peek()[0] == 'op' and self.peek()[1] in OPERATORS:
+            if key is None:
+                raise QueryError(f'comparison without @key in query {self.text!r}')
+            operator = self.take('op')
+            kind, text = self.peek()
+            if kind == 'str':
+                value = text
+            elif kind == 'num':
+                value = float(text)
+            else:
+                raise QueryError(f'expected value after {operator} in query {self.text!r}')
+            self.position += 1
+        return Predicate(steps, key, operator, value)
+
+
+def parse_query(text: str) -> Query:
+    return Parser(text).parse()
+
+
+################ evaluation on decoded sections ########################
+
+# children of a node with the tag, (tag, node)
+def get_children(node: dict, tag: str):
+    for key, value in node.items():
+        if isinstance(value, list) and (tag == '*' or key == tag):
+            for child in value:
+                if isinstance(child, dict):
+                    yield key, child
+
+
+# descendants of a node with the tag in document order, (tag, node)
+def get_descendants(node: dict, tag: str):
+    stack = list(get_children(node, '*'))[::-1]
+    while stack:
+        key, child = stack.pop()
+        if tag == '*' or key == tag:
+            yield key, child
+        stack.extend(list(get_children(child, '*'))[::-1])
+
+
+def compare(value, operator: str, expected) -> bool:
+    if value is None or isinstance(value, list):
+        return False
+    if isinstance(expected, str):
+        if operator in ('=', '!='):
+            return OPERATORS[operator](str(value), expected)
+        return False
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return False
+    return OPERATORS[operator](number, expected)
+
+
+def matches_predicate(node: dict, predicate: Predicate) -> bool:
+    nodes = select_steps([(None, node)], predicate.steps) if predicate.steps else [(None, node)]
+    for _, candidate in nodes:
+        if predicate.key is None:
+            return True
+        value = candidate.get(predicate.key)
+        if predicate.operator is None:
+            if value is not None and not isinstance(value, list):
+                return True
+        elif compare(value, predicate.operator, predicate.value):
+            return True
+    return False
+
+
+# (tag, node) reached from the nodes by the steps, in document order
+def select_steps(nodes: list, steps: list) -> list:
+    for step in steps:
+        selected = []
+        for _, node in nodes:
+            children = get_descendants(node, step.tag) if step.descendant else get_children(node, step.tag)
+            for child in children:
+                if all(matches_predicate(child[1], predicate) for predicate in step.predicates):
+                    selected.append(child)
+        nodes = selected
+    return nodes
+
+
+################ index ########################
+
+# blocks of sections a predicate on a tag can match, None if the index can not tell
+def get_predicate_blocks(reader: ReducedReader, index: dict, tag: str, predicate: Predicate) -> Optional[set]:
+    if predicate.steps:
+        tag = predicate.steps[-1].tag
+    if predicate.key is None or predicate.operator in (None, '!='):
+        return None
+    tag_id = None
+    if tag != '*':
+        tag_id = reader.get_string_id(tag)
+        if tag_id is None:
+            return set()
+    key_id = reader.get_string_id(predicate.key)
+    if key_id is None:
+        return set()
+
+    blocks = set()
+    expected = predicate.value
+    if isinstance(expected, str):
+        if predicate.operator != '=':
+            return set()
+        value_id = reader.get_string_id(expected)
+        if value_id is not None and tag_id is not None:
+            blocks.update(index['strings'].get((tag_id, key_id, value_id), []))
+        elif value_id is not None:
+            for (posting_tag, posting_key, posting_value), posting_blocks in index['strings'].items():
+                if posting_key == key_id and posting_value == value_id:
+                    blocks.update(posting_blocks)
+        # numeric text is stored as number
+        try:
+            expected = float(expected)
+        except ValueError:
+            return blocks
+    if tag_id is not None:
+        ranges = index['ranges'].get((tag_id, key_id), [])
+    else:
+        ranges = [value_range for (_, posting_key), tag_ranges in index['ranges'].items() if posting_key == key_id
+                  for value_range in tag_ranges]
+    for block, low, high in ranges:
+        if predicate.operator == '=':
+            possible = low <= expected <= high
+        else:
+            possible = OPERATORS[predicate.operator](high if predicate.operator[0] == '>' else low, expected)
+        if possible:
+            blocks.add(block)
+    return blocks
+
+
+# sections (top level elements) which can contain a match of the query
+def get_candidate_sections(reader: ReducedReader, query: Query) -> list:
+    top = query.steps[0]
+    if top.descendant:
+        candidates = set(range(len(reader.index)))
+    else:
+        candidates = {i for i, (tag, _) in enumerate(reader.sections()) if top.tag in ('*', tag)}
+
+    index = reader.get_inverted_index()
+    blocks = None
+    steps = list(query.steps)
+    while steps and blocks != set():
+        step = steps.pop()
+        if step.tag != '*':
+            tag_id = reader.get_string_id(step.tag)
+            step_blocks = set(index['tags'].get(tag_id, ())) if tag_id is not None else set()
+            blocks = step_blocks if blocks is None else blocks & step_blocks
+        for predicate in step.predicates:
+            predicate_blocks = get_predicate_blocks(reader, index, step.tag, predicate)
+            if predicate_blocks is not None:
+                blocks = predicate_blocks if blocks is None else blocks & predicate_blocks
+            steps.extend(predicate.steps)
+    if blocks is None:
+        return sorted(candidates)
+    return sorted(section for section in candidates if section // index['block_size'] in blocks)
+
+
+################ api ########################
+
+# matches of a query: {'section', 'tag', 'id', 'node'} or for /@key {'section', 'tag', 'id', 'value'}
+# for count(...) the number of matches, the query is parsed if it is a string
+def run_query(reader: ReducedReader, query: Query):
+    if isinstance(query, str):
+        query = parse_query(query)
+
+    # number of nodes of a tag from the index, no section is decoded
+    if query.count and len(query.steps) == 1 and not query.steps[0].predicates and query.steps[0].tag != '*':
+        step = query.steps[0]
+        if not step.descendant:
+            return sum(1 for tag, _ in reader.sections() if tag == step.tag)
+        tag_id = reader.get_string_id(step.tag)
+        return sum(reader.get_inverted_index()['tags'].get(tag_id, {}).values()) if tag_id is not None else 0
+
+    matches = []
+    sections = reader.sections()
+    for section in get_candidate_sections(reader, query):
+        # the top level element is a child of the document
+        root = {tag: [node] for tag, node in reader.read_section(section).items()}
+        for tag, node in select_steps([(None, root)], query.steps):
+            if query.key is None:
+                matches.append({'section': section, 'tag': tag, 'id': sections[section][1], 'node': node})
+            elif query.key in node and not isinstance(node[query.key], list):
+                matches.append({'section': section, 'tag': tag, 'id': sections[section][1], 'value': node[query.key]})
+    return len(matches) if query.count else matches
+
+
+def query_file(file_name: Path, query: str):
+    with ReducedReader(file_name) as reader:
+        return run_query(reader, parse_query(query))
+
+
+# node without its children, for printing
+def get_values(node: dict) -> dict:
+    return {key: value for key, value in node.items() if not isinstance(value, list)}
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(prog='query.py', description='queries a reduced asset (bjson) with a simple path language, e.g. "road[.//lane/@type=\'driving\']/@id" or "count(junction)".')
+    parser.add_argument('filename', type=str, help='reduced asset file (bjson).')
+    parser.add_argument('query', type=str, help='path query, see query.py')
+    parser.add_argument('-full', action='store_true', help='print the matched nodes with their children.')
+    parser.add_argument('-limit', type=int, default=0, help='maximal number of printed matches, 0 for all.')
+    args = parser.parse_args(argv)
+
+    file_name = Path(args.filename)
+    if not file_name.exists() or not is_reduced_file(file_name):
+        logger.error(f'reduced asset file {file_name} not exists or has an unknown format')
+        exit(1)
+    try:
+        query = parse_query(args.query)
+    except QueryError as error:
+        logger.error(str(error))
+        exit(1)
+
+    with ReducedReader(file_name) as reader:
+        result = run_query(reader, query)
+    if query.count:
+        print(result)
+        return
+    # one json per line
+    for match in result[:args.limit or None]:
+        if 'node' in match and not args.full:
+            match['node'] = get_values(match['node'])
+        print(json.dumps(match))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+from typing import Optional
+
+import numpy as np
+
+################ reduce functions ########################
+# a function of a mapping table, e.g. "function" : ["calcExtrema", "elevation"], gets the records of the named children
+# a record is the tuple of the attributes the functions of the tag need (None if not set), the result is merged into the node
+#
+# the functions are evaluated with numpy for the records of many elements at once (a batch), every element is a group
+# of consecutive records. The keys of the values are known when the element ends, so they keep their place in the node
+# and the values are filled in when the batch is evaluated
+
+BATCH_SIZE = 4096  # records of the pending elements, evaluated together
+
+
+# extent of the nearest mapped ancestor of the records, their offsets are relative to its start
+# e.g. road for elevations (length), lane section for lane widths (s up to the s of the next lane section or the road length)
+# the length is read when the batch is evaluated, after the top level element is complete
+class Extent:
+    __slots__ = ('tag', 'values', 'siblings', 'outer')
+
+    def __init__(self, tag: str, values: dict, siblings: dict, outer: Optional[dict]):
+        self.tag = tag
+        self.values = values        # node of the ancestor
+        self.siblings = siblings    # children of its parent, tag -> [node, ...]
+        self.outer = outer          # node of the next ancestor with a length, e.g. road
+
+    def get_length(self) -> Optional[float]:
+        if 'length' in self.values:
+            return float(self.values['length'])
+        if 's' not in self.values or self.outer is None:
+            return None
+        end = float(self.outer['length'])
+        siblings = self.siblings.get(self.tag, [])
+        for i, sibling in enumerate(siblings[:-1]):
+            if sibling is self.values and 's' in siblings[i + 1]:
+                end = float(siblings[i + 1]['s'])
+                break
+        return end - float(self.values['s'])
+
+
+# records of a record tag of many elements, e.g. the widths of lanes
+class RecordBatch:
+    def __init__(self, record_tag: str, attributes: tuple, functions: tuple):
+        self.record_tag = record_tag
+        self.attributes = attributes
+        self.functions = functions      # (function, args, keys)
+        self.needs_context = any(function.needs_context for function, _, _ in functions)
+        self.records = []
+        self.sizes = []
+        self.nodes = []                 # node of every group, gets the values
+        self.extents = []               # Extent of every group, e.g. road for elevations
+        self.values = None              # records as object array
+        self.columns = {}
+
+    def add(self, records: list, node: dict, extent: Optional[Extent]):
+        self.records.extend(records)
+        self.sizes.append(len(records))
+        self.nodes.append(node)
+        self.extents.append(extent)
+
+    # float column of an attribute over all records, default for missing attributes
+    def column(self, attribute: str, default: float = 0.0) -> np.ndarray:
+        key = (attribute, default)
+        if key not in self.columns:
+            if self.values is None:
+                self.values = np.array(self.records, dtype=object).reshape(len(self.records), len(self.attributes))
+            values = self.values[:, self.attributes.index(attribute)]
+            self.columns[key] = np.where(np.equal(values, None), default, values).astype(float)
+        return self.columns[key]
+
+    # start of every group in the columns
+    def starts(self) -> np.ndarray:
+        sizes = np.asarray(self.sizes, dtype=np.int64)
+        return np.cumsum(sizes) - sizes
+
+    # group of every record
+    def groups(self) -> np.ndarray:
+        return np.repeat(np.arange(len(self.sizes)), self.sizes)
+
+    # ufunc over the records of every group, nan for groups without records
+    def reduce(self, ufunc, values: np.ndarray) -> np.ndarray:
+        sizes = np.asarray(self.sizes)
+        result = np.full(len(sizes), np.nan)
+        if len(values):
+            result[sizes > 0] = ufunc.reduceat(values, self.starts()[sizes > 0])
+        return result
+
+    # length of the extent of every group, nan if not known
+    def extent_lengths(self) -> np.ndarray:
+        lengths = [extent.get_length() if extent is not None else None for extent in self.extents]
+        return np.array([np.nan if length is None else length for length in lengths], dtype=float)
+
+    # evaluates the functions and fills the values into the nodes
+    def evaluate(self):
+        for function, args, _ in self.functions:
+            for key, values in function.evaluate(self, args).items():
+                for node, value, size in zip(self.nodes, values.tolist(), self.sizes):
+                    if size or not function.needs_records:
+                        node[key] = value
+
+
+# min and max of the constant term of polynomial records (elevation, width, ...)
+def calcExtrema(batch: RecordBatch, args: tuple) -> dict:
+    a = batch.column('a')
+    return {'min': batch.reduce(np.minimum, a), 'max': batch.reduce(np.maximum, a)}
+
+
+def calcExtrema_keys(args: tuple, record_tag: str) -> tuple:
+    return ('min', 'max')
+
+
+# min and max of polynomial records a + b*ds + c*ds² + d*ds³, e.g. ["calcPolyExtrema", "width", "sOffset"]
+# a record ends at the start of the next one, the last at the end of the extent (road for elevations, lane section
+# for widths), or at its start if the extent is not known
+# link: https://releases.asam.net/OpenDRIVE/1.6.0/ASAM_OpenDRIVE_BS_V1-6-0.html#_methods_of_elevation
+def calcPolyExtrema(batch: RecordBatch, args: tuple) -> dict:
+    groups = batch.groups()
+    s = batch.column(args[0])
+    order = np.lexsort((s, groups))
+    s = s[order]
+    a, b, c, d = (batch.column(name)[order] for name in 'abcd')
+
+    last = np.append(groups[1:] != groups[:-1], True)
+    ends = np.append(s[1:], 0.0)
+    group_ends = batch.extent_lengths()[groups[last]]
+    ends[last] = np.where(np.isnan(group_ends), s[last], group_ends)
+    lengths = np.maximum(ends - s, 0.0)
+
+    def evaluate(ds):
+        return a + ds * (b + ds * (c + ds * d))
+
+    # values at the borders and at the roots of the differentiation b + 2*c*ds + 3*d*ds² inside of the record
+    values = [a, evaluate(lengths)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        discriminant = 4 * c * c - 12 * b * d
+        sqrt_discriminant = np.sqrt(np.where(discriminant >= 0, discriminant, 0.0))
+        cubic = (d != 0) & (discriminant >= 0)
+        quadratic = (d == 0) & (c != 0)
+        roots = [np.where(cubic, (-2 * c + sqrt_discriminant) / (6 * d), np.where(quadratic, -b / (2 * c), np.nan)),
+                 np.where(cubic, (-2 * c - sqrt_discriminant) / (6 * d), np.nan)]
+    for root in roots:
+        valid = (root >= 0) & (root <= lengths)
+        values.append(evaluate(np.where(valid, root, 0.0)))
+    values = np.vstack(values)
+
+    # sorted by group first, so the records of a group are still at the same place
+    return {'polyMin': batch.reduce(np.minimum, values.min(axis=0)), 'polyMax': batch.reduce(np.maximum, values.max(axis=0))}
+
+
+def calcPolyExtrema_keys(args: tuple, record_tag: str) -> tuple:
+    return ('polyMin', 'polyMax')
+
+
+# number of records, e.g. ["count", "connection"] -> connectionCount
+def count(batch: RecordBatch, args: tuple) -> dict:
+    return {f'{batch.record_tag}Count': np.asarray(batch.sizes, dtype=np.int64)}
+
+
+def count_keys(args: tuple, record_tag: str) -> tuple:
+    return (f'{record_tag}Count',)
+
+
+# sum of an attribute of the records, e.g. ["sum", "geometry", "length"] -> lengthSum
+def sum_values(batch: RecordBatch, args: tuple) -> dict:
+    values = np.bincount(batch.groups(), weights=batch.column(args[0]), minlength=len(batch.sizes))
+    return {f'{args[0]}Sum': values}
+
+
+def sum_values_keys(args: tuple, record_tag: str) -> tuple:
+    return (f'{args[0]}Sum',)
+
+
+# a function of the mapping table
+class ReduceFunction:
+    __slots__ = ('name', 'evaluate', 'get_attributes', 'get_keys', 'needs_records', 'needs_context')
+
+    def __init__(self, name, evaluate, get_attributes, get_keys, needs_records=True, needs_context=False):
+        self.name = name
+        self.evaluate = evaluate                # (batch, args) -> {key: value per group}
+        self.get_attributes = get_attributes    # args -> attributes of a record
+        self.get_keys = get_keys                # (args, record tag) -> keys of the values
+        self.needs_records = needs_records      # no values for elements without records
+        self.needs_context = needs_context      # uses the extent of the nearest mapped ancestor
+
+
+# name in the mapping table -> function, arguments after the record tag are passed as args
+functions = {
+    'calcExtrema': ReduceFunction('calcExtrema', calcExtrema, lambda args: ('a',), calcExtrema_keys),
+    'calcPolyExtrema': ReduceFunction('calcPolyExtrema', calcPolyExtrema, lambda args: (args[0], 'a', 'b', 'c', 'd'), calcPolyExtrema_keys,
+                                      needs_context=True),
+    'count': ReduceFunction('count', count, lambda args: (), count_keys, needs_records=False),
+    'sum': ReduceFunction('sum', sum_values, lambda args: (args[0],), sum_values_keys, needs_records=False),
+}
+
+
+# evaluates all batches, batches: (tag, record tag) -> RecordBatch
+def evaluate_batches(batches: dict):
+    for batch in batches.values():
+        batch.evaluate()
+    batches.clear()
@@ -0,0 +1,519 @@
+from pathlib import Path
+from typing import Optional
+from collections import Counter
+from itertools import chain, compress
+
+import numpy as np
+
+import struct
+import array
+import mmap
+import sys
+
+# binary file of a reduced asset, the advanced search reads only the sections it needs
+#
+# the reduced asset is a list of top level elements {tag: node}, a node is a dict of values and child lists (tag -> [node, ...])
+# file layout, little endian, every column is padded to 8 bytes:
+# - header: magic, version, offsets of the string table, the layouts, the index and the inverted index,
+#     number of strings, layouts and sections
+# - sections: one per top level element (header, road, junction, ...), every section is a tree of nodes in pre order
+#     node count, text count, float count, bytes of a layout id (2 or 4)
+#     node columns: layout u16 or u32, depth u16 (0 for the root of the section)
+#     text column: string id u32 of the string values in field order (strings and integer text)
+#     float column: f64 of the numeric values in field order (floats, float text and calculated integers)
+# - string table: all tag names, keys and string values once, offsets u32 (count + 1) and utf-8 data
+# - layouts: tag and keys with the kind of their values, shared by all nodes with the same fields
+#     tag u32, end of the fields u32 per layout, key u32, kind u8 per field
+# - index: per section tag u32, key u32 (id attribute, e.g. road id), offset u64, size u64
+# - inverted index: number of entries of the three tables, sections per block, then their columns
+#     tags: tag u32, block u32, node count u32
+#     strings: tag u32, key u32, value u32, block u32 (string values of a key of the tag in a block)
+#     ranges: tag u32, key u32, block u32, min f64, max f64 (numeric values of a key of the tag in a block)
+#   a block are block size (default BLOCK_SIZE) consecutive sections, the index tells which blocks can match a query (like a zone map)
+#
+# float text is stored as f64 and integer text as string, both are returned as the original text, so the data is the
+# same as before writing. A node needs 4 bytes plus 4 bytes per string and 8 bytes per number, the keys are in its layout
+
+MAGIC = b'RDCA'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHHQQQQIII')
+SECTION_HEADER = struct.Struct('<IIII')
+INDEX_ENTRY = struct.Struct('<IIQQ')
+INVERTED_HEADER = struct.Struct('<IIII')
+BLOCK_SIZE = 16  # default sections per block of the inverted index, smaller blocks decode fewer sections per query but need more space
+
+NO_STRING = 0xFFFFFFFF
+MAX_EXACT_INT = 2 ** 53
+MAX_SHORT_LAYOUTS = 0x10000
+
+# kind of a field value
+KIND_NONE = 0
+KIND_STRING = 1
+KIND_FLOAT = 2          # calculated values, e.g. min and max
+KIND_TEXT_FLOAT = 3     # attribute text which is the repr of a float, e.g. "12.5"
+KIND_TEXT_INT = 4       # attribute text of an integer, e.g. "-1"
+KIND_INT = 5            # calculated integers, e.g. counts
+KIND_CHILDREN = 7       # child list, only in the signature of a layout
+
+g_little_endian = sys.byteorder == 'little'
+
+
+def get_kind(value) -> int:
+    return get_kind_and_number(value)[0]
+
+
+# kind and number of a value, the number of string values too if they are numeric (e.g. "0.50") for the inverted index
+def get_kind_and_number(value) -> tuple:
+    if value is None:
+        return KIND_NONE, None
+    if isinstance(value, float):
+        return KIND_FLOAT, value
+    if isinstance(value, int) and not isinstance(value, bool) and abs(value) < MAX_EXACT_INT:
+        return KIND_INT, float(value)
+    if not isinstance(value, str):
+        raise TypeError(f'value {value!r} of type {type(value).__name__} can not be stored in a reduced asset')
+    try:
+        number = float(value)
+    except ValueError:
+        return KIND_STRING, None
+    if repr(number) == value:
+        return KIND_TEXT_FLOAT, number
+    if number.is_integer() and abs(number) < MAX_EXACT_INT and str(int(number)) == value:
+        return KIND_TEXT_INT, number
+    return KIND_STRING, number
+
+
+def get_padding(size: int) -> int:
+    return -size % 8
+
+
+# little endian bytes of a column, padded to 8 bytes
+def get_column_bytes(column: array.array) -> bytes:
+    if not g_little_endian:
+        column = array.array(column.typecode, column)
+        column.byteswap()
+    data = column.tobytes()
+    return data + b'\0' * get_padding(len(data))
+
+
+# writes the sections as they are added, string table, layouts and index at the end
+# the incomplete file is removed if the writer is left by an exception
+class ReducedWriter:
+    def __init__(self, file_name: Path, block_size: int = BLOCK_SIZE):
+        self.file_name = Path(file_name)
+        self.file = open(file_name, 'wb')
+        self.block_size = block_size
+        self.strings = {}
+        self.string_values = {}         # string value -> (kind, is text, text id or number)
+        self.string_numbers = []        # number of the string values by id (nan if not numeric) for the ranges
+        self.layouts = {}               # (tag, keys, kinds) -> layout id
+        self.layout_tags = array.array('I')
+        self.layout_field_ends = array.array('I')
+        self.layout_keys = array.array('I')
+        self.layout_kinds = array.array('B')
+        self.index = []
+
+        # inverted index, the fields are (tag, key) of the values
+        self.fields = {}                # (tag id, key id) -> field
+        self.layout_text_fields = []    # fields of the text values of every layout
+        self.layout_string_flags = []   # text value is a string (not integer text) of every layout
+        self.layout_float_fields = []   # fields of the float values of every layout
+        self.block_layouts = []         # nodes, texts and floats of the current block
+        self.block_texts = []
+        self.block_floats = []
+        self.tag_postings = []          # (tag, block, count)
+        self.string_postings = []       # (tag, key, value, block)
+        self.range_postings = []        # (tag, key, block, min, max)
+        self.file.write(b'\0' * (HEADER.size + get_padding(HEADER.size)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            self.file_name.unlink(missing_ok=True)
+
+    def get_string(self, value: str) -> int:
+        string_id = self.strings.get(value)
+        if string_id is None:
+            string_id = self.strings[value] = len(self.strings)
+            self.string_numbers.append(np.nan)
+        return string_id
+
+    # layout of the nodes with the signature (tag, keys, kinds), child lists are not fields of the layout
+    def add_layout(self, signature: tuple) -> int:
+        layout = self.layouts[signature] = len(self.layout_tags)
+        tag, keys, kinds = signature
+        tag_id = self.get_string(tag)
+        self.layout_tags.append(tag_id)
+        text_fields = []
+        string_flags = []
+        float_fields = []
+        for key, kind in zip(keys, kinds):
+            if kind == KIND_CHILDREN:
+                continue
+            key_id = self.get_string(key)
+            self.layout_keys.append(key_id)
+            self.layout_kinds.append(kind)
+            field = self.fields.setdefault((tag_id, key_id), len(self.fields))
+            if kind == KIND_STRING or kind == KIND_TEXT_INT:
+                text_fields.append(field)
+                string_flags.append(kind == KIND_STRING)
+            elif kind != KIND_NONE:
+                float_fields.append(field)
+        self.layout_field_ends.append(len(self.layout_keys))
+        self.layout_text_fields.append(text_fields)
+        self.layout_string_flags.append(string_flags)
+        self.layout_float_fields.append(float_fields)
+        return layout
+
+    # kind and text id (strings and integer text) or number of a string value, the kind of repeated values is known
+    def add_string_value(self, value: str) -> tuple:
+        kind, number = get_kind_and_number(value)
+        if kind == KIND_STRING or kind == KIND_TEXT_INT:
+            value_id = self.get_string(value)
+            if number is not None:
+                self.string_numbers[value_id] = number
+            result = self.string_values[value] = (kind, True, value_id)
+        else:
+            result = self.string_values[value] = (kind, False, number)
+        return result
+
+    # one top level element
+    def add(self, tag: str, node: dict):
+        node_layouts = []
+        node_depths = []
+        texts = []
+        floats = []
+        add_text = texts.append
+        add_float = floats.append
+        string_values = self.string_values
+        layouts = self.layouts
+
+        stack = [(tag, node, 0)]
+        while stack:
+            node_tag, node_data, depth = stack.pop()
+            kinds = []
+            add_kind = kinds.append
+            children = []
+            for key, value in node_data.items():
+                value_type = type(value)
+                if value_type is float:
+                    add_float(value)
+                    add_kind(KIND_FLOAT)
+                elif value_type is str:
+                    kind, is_text, item = string_values.get(value) or self.add_string_value(value)
+                    if is_text:
+                        add_text(item)
+                    elif kind != KIND_NONE:
+                        add_float(item)
+                    add_kind(kind)
+                elif value_type is list:
+                    children.extend([(key, child, depth + 1) for child in value])
+                    add_kind(KIND_CHILDREN)
+                elif value_type is int and -MAX_EXACT_INT < value < MAX_EXACT_INT:
+                    add_float(float(value))
+                    add_kind(KIND_INT)
+                else:
+                    kind, number = get_kind_and_number(value)
+                    if kind != KIND_NONE:
+                        add_float(number)
+                    add_kind(kind)
+            signature = (node_tag, tuple(node_data), tuple(kinds))
+            layout = layouts.get(signature)
+            if layout is None:
+                layout = self.add_layout(signature)
+            node_layouts.append(layout)
+            node_depths.append(depth)
+            # reversed, so the nodes are in pre order
+            stack.extend(reversed(children))
+
+        self.block_layouts.extend(node_layouts)
+        self.block_texts.extend(texts)
+        self.block_floats.extend(floats)
+
+        width = 2 if len(self.layout_tags) <= MAX_SHORT_LAYOUTS else 4
+        columns = [array.array('H' if width == 2 else 'I', node_layouts), array.array('H', node_depths),
+                   array.array('I', texts), array.array('d', floats)]
+        data = SECTION_HEADER.pack(len(node_layouts), len(texts), len(floats), width) + b''.join(map(get_column_bytes, columns))
+        offset = self.file.tell()
+        self.file.write(data)
+
+        key = node.get('id')
+        self.index.append((self.get_string(tag), self.get_string(key) if isinstance(key, str) else NO_STRING, offset, len(data)))
+        if len(self.index) % self.block_size == 0:
+            self.add_block()
+
+    # postings of the current block
+    def add_block(self):
+        block = (len(self.index) - 1) // self.block_size
+        layouts = self.block_layouts
+        texts = self.block_texts
+
+        tag_counts = Counter()
+        for layout, count in Counter(layouts).items():
+            tag_counts[self.layout_tags[layout]] += count
+        self.tag_postings.extend((tag_id, block, count) for tag_id, count in tag_counts.items())
+
+        # fields of the values of the block from the layouts of the nodes
+        field_list = list(self.fields)
+        text_fields = list(chain.from_iterable(map(self.layout_text_fields.__getitem__, layouts)))
+        string_flags = chain.from_iterable(map(self.layout_string_flags.__getitem__, layouts))
+        for field, value_id in set(compress(zip(text_fields, texts), string_flags)):
+            self.string_postings.append((*field_list[field], value_id, block))
+
+        # min and max per field of the numbers of the block
+        float_fields = chain.from_iterable(map(self.layout_float_fields.__getitem__, layouts))
+        fields = np.fromiter(chain(float_fields, text_fields), dtype=np.int64)
+        values = np.fromiter(chain(self.block_floats, map(self.string_numbers.__getitem__, texts)), dtype=float, count=len(fields))
+        valid = ~np.isnan(values)  # nan is not comparable
+        fields = fields[valid]
+        values = values[valid]
+        if len(fields):
+            order = np.argsort(fields, kind='stable')
+            fields = fields[order]
+            values = values[order]
+            starts = np.flatnonzero(np.append(True, fields[1:] != fields[:-1]))
+            lows = np.minimum.reduceat(values, starts)
+            highs = np.maximum.reduceat(values, starts)
+            for field, low, high in zip(fields[starts].tolist(), lows.tolist(), highs.tolist()):
+                self.range_postings.append((*field_list[field], block, low, high))
+
+        self.block_layouts = []
+        self.block_texts = []
+        self.block_floats = []
+
+    def close(self):
+        strings_offset = self.file.tell()
+        data = [value.encode('utf-8') for value in self.strings]
+        offsets = array.array('I', [0])
+        for value in data:
+            offsets.append(offsets[-1] + len(value))
+        blob = get_column_bytes(offsets) + b''.join(data)
+        self.file.write(blob + b'\0' * get_padding(len(blob)))
+
+        layouts_offset = self.file.tell()
+        for column in [self.layout_tags, self.layout_field_ends, self.layout_keys, self.layout_kinds]:
+            self.file.write(get_column_bytes(column))
+
+        index_offset = self.file.tell()
+        for entry in self.index:
+            self.file.write(INDEX_ENTRY.pack(*entry))
+        self.file.write(b'\0' * get_padding(self.file.tell()))
+
+        inverted_offset = self.file.tell()
+        self.write_inverted_index()
+
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, strings_offset, layouts_offset, index_offset, inverted_offset,
+                                    len(self.strings), len(self.layout_tags), len(self.index)))
+        self.file.close()
+
+    def write_inverted_index(self):
+        if self.block_layouts:
+            self.add_block()
+        self.tag_postings.sort()
+        self.string_postings.sort()
+        self.range_postings.sort()
+        self.file.write(INVERTED_HEADER.pack(len(self.tag_postings), len(self.string_postings), len(self.range_postings), self.block_size))
+        tables = [(self.tag_postings, 'III'), (self.string_postings, 'IIII'), (self.range_postings, 'IIIdd')]
+        for postings, typecodes in tables:
+            for i, typecode in enumerate(typecodes):
+                self.file.write(get_column_bytes(array.array(typecode, [posting[i] for posting in postings])))
+
+
+def write_reduced(data: list, file_name: Path, block_size: int = BLOCK_SIZE):
+    with ReducedWriter(file_name, block_size) as writer:
+        for item in data:
+            for tag, node in item.items():
+                writer.add(tag, node)
+
+
+# column of count values at offset, a copy as list
+def read_column(buffer, offset: int, typecode: str, count: int) -> list:
+    size = array.array(typecode).itemsize * count
+    if g_little_endian:
+        with memoryview(buffer)[offset:offset + size] as view, view.cast(typecode) as column:
+            return column.tolist()
+    column = array.array(typecode, buffer[offset:offset + size])
+    column.byteswap()
+    return column.tolist()
+
+
+# reads sections on demand from a memory mapped file
+class ReducedReader:
+    def __init__(self, file_name: Path):
+        self.file = open(file_name, 'rb')
+        try:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self.file.close()
+            raise ValueError(f'{file_name} is not a reduced asset file')
+        if self.buffer.size() < HEADER.size:
+            self.close()
+            raise ValueError(f'{file_name} is not a reduced asset file')
+        (magic, version, _, strings_offset, layouts_offset, index_offset, self.inverted_offset,
+         string_count, layout_count, section_count) = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{file_name} is not a reduced asset file of version {VERSION}')
+        self.string_offsets = read_column(self.buffer, strings_offset, 'I', string_count + 1)
+        self.string_data = strings_offset + 4 * (string_count + 1)
+        self.string_data += get_padding(self.string_data)
+        self.strings = {}
+        self.string_list = None  # all strings, only decoded for full reads
+        self.section_names = None
+        self.string_ids = None
+        self.inverted_index = None
+        self.layouts_offset = layouts_offset
+        self.layout_count = layout_count
+        self.layouts = None
+        self.index = [INDEX_ENTRY.unpack_from(self.buffer, index_offset + i * INDEX_ENTRY.size) for i in range(section_count)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+    def get_string(self, string_id: int) -> Optional[str]:
+        if string_id == NO_STRING:
+            return None
+        if self.string_list is not None:
+            return self.string_list[string_id]
+        value = self.strings.get(string_id)
+        if value is None:
+            start = self.string_data + self.string_offsets[string_id]
+            end = self.string_data + self.string_offsets[string_id + 1]
+            value = self.strings[string_id] = self.buffer[start:end].decode('utf-8')
+        return value
+
+    # (tag, key) of all sections in file order
+    def sections(self) -> list:
+        if self.section_names is None:
+            self.section_names = [(self.get_string(tag), self.get_string(key)) for tag, key, _, _ in self.index]
+        return self.section_names
+
+    # top level elements with the tag (and the id key), e.g. find('road', '12')
+    def find(self, tag: str, key: str = None) -> list:
+        return [self.read_section(i) for i, (section_tag, section_key) in enumerate(self.sections())
+                if section_tag == tag and (key is None or section_key == key)]
+
+    # id of a string value, None if the file does not contain it
+    def get_string_id(self, value: str) -> Optional[int]:
+        if self.string_ids is None:
+            self.load_strings()
+            self.string_ids = {string: string_id for string_id, string in enumerate(self.string_list)}
+        return self.string_ids.get(value)
+
+    def load_strings(self):
+        if self.string_list is None:
+            data = self.buffer[self.string_data:self.string_data + self.string_offsets[-1]]
+            offsets = self.string_offsets
+            self.string_list = [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+    # (tag, keys, kinds) of all layouts
+    def get_layouts(self) -> list:
+        if self.layouts is None:
+            self.load_strings()
+            offset = self.layouts_offset
+            tags = read_column(self.buffer, offset, 'I', self.layout_count)
+            offset += 4 * self.layout_count
+            offset += get_padding(offset)
+            field_ends = read_column(self.buffer, offset, 'I', self.layout_count)
+            offset += 4 * self.layout_count
+            offset += get_padding(offset)
+            field_count = field_ends[-1] if field_ends else 0
+            keys = read_column(self.buffer, offset, 'I', field_count)
+            offset += 4 * field_count
+            offset += get_padding(offset)
+            kinds = read_column(self.buffer, offset, 'B', field_count)
+
+            strings = self.string_list
+            self.layouts = []
+            start = 0
+            for tag, end in zip(tags, field_ends):
+                self.layouts.append((strings[tag], tuple(strings[key] for key in keys[start:end]), tuple(kinds[start:end])))
+                start = end
+        return self.layouts
+
+    # inverted index of the file
+    #   block_size: sections per block
+    #   tags: tag -> {block: node count}
+    #   strings: (tag, key, value) -> [block, ...]
+    #   ranges: (tag, key) -> [(block, min, max), ...]
+    def get_inverted_index(self) -> dict:
+        if self.inverted_index is None:
+            *counts, block_size = INVERTED_HEADER.unpack_from(self.buffer, self.inverted_offset)
+            offset = self.inverted_offset + INVERTED_HEADER.size
+            tables = []
+            for count, typecodes in zip(counts, ['III', 'IIII', 'IIIdd']):
+                columns = []
+                for typecode in typecodes:
+                    columns.append(read_column(self.buffer, offset, typecode, count))
+                    offset += array.array(typecode).itemsize * count
+                    offset += get_padding(offset)
+                tables.append(zip(*columns))
+            tag_postings, string_postings, range_postings = tables
+
+            index = {'block_size': block_size, 'tags': {}, 'strings': {}, 'ranges': {}}
+            for tag, block, count in tag_postings:
+                index['tags'].setdefault(tag, {})[block] = count
+            for tag, key, value, block in string_postings:
+                index['strings'].setdefault((tag, key, value), []).append(block)
+            for tag, key, block, low, high in range_postings:
+                index['ranges'].setdefault((tag, key), []).append((block, low, high))
+            self.inverted_index = index
+        return self.inverted_index
+
+    def read_all(self) -> list:
+        return [self.read_section(i) for i in range(len(self.index))]
+
+    def read_section(self, section: int) -> dict:
+        offset = self.index[section][2]
+        node_count, text_count, float_count, width = SECTION_HEADER.unpack_from(self.buffer, offset)
+        offset += SECTION_HEADER.size
+        columns = []
+        for typecode, count in [('H' if width == 2 else 'I', node_count), ('H', node_count), ('I', text_count), ('d', float_count)]:
+            columns.append(read_column(self.buffer, offset, typecode, count))
+            offset += array.array(typecode).itemsize * count
+            offset += get_padding(offset)
+        node_layouts, node_depths, text_ids, float_values = columns
+
+        layouts = self.get_layouts()
+        strings = self.string_list
+        texts = iter([strings[value_id] for value_id in text_ids])
+        floats = iter(float_values)
+
+        # parents of the current path by depth
+        path = []
+        for layout, depth in zip(node_layouts, node_depths):
+            tag, keys, kinds = layouts[layout]
+            data = dict(zip(keys, [next(floats) if kind == KIND_FLOAT else
+                                   next(texts) if kind == KIND_STRING or kind == KIND_TEXT_INT else
+                                   repr(next(floats)) if kind == KIND_TEXT_FLOAT else
+                                   int(next(floats)) if kind == KIND_INT else None
+                                   for kind in kinds]))
+            del path[depth:]
+            if depth:
+                path[-1].setdefault(tag, []).append(data)
+            path.append(data)
+        return {layouts[node_layouts[0]][0]: path[0]}
+
+
+def read_reduced(file_name: Path) -> list:
+    with ReducedReader(file_name) as reader:
+        return reader.read_all()
+
+
+def is_reduced_file(file_name: Path) -> bool:
+    with open(file_name, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
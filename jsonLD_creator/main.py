@@ -11,13 +11,12 @@
 
 from datetime import datetime
 from rdflib.namespace import SH
-from rdflib import Graph, URIRef
+from rdflib import URIRef
 from collections import defaultdict
 from pathlib import Path
 from typing import Any, Tuple, Union, Dict, List
-from utils.utils import download_shacle, get_url_for_download, get_prefixes, convert_graph_to_dict
+from utils.utils import download_shacle, get_url_for_download, get_prefixes, convert_graph_to_dict, parse_shacl_file
 #from utils.log_config import setup_logging # debug
-import shutil
 import json
 import logging
 import argparse
@@ -49,6 +48,9 @@ class Config:
 
 config = Config()
 
+# the config singleton is module state, the asset pipeline runs this tool in-process one at a time
+INPROCESS_EXCLUSIVE = True
+
 
 def datetime_handler(x):
     if isinstance(x, datetime):
@@ -518,14 +520,13 @@ def process_graph(schema_namespace, schema_name, meta_data):
 
 
 # create shacl data structure and register
-def register_shacle(url_path : str, shacle_name: str, shacls):
+def register_shacle(url_path : str, shacle_name: str, shacls, refresh: bool = False):
 
-    local_file_path = download_shacle(url_path, shacle_name)
+    local_file_path = download_shacle(url_path, shacle_name, refresh)
 
     try:
         if local_file_path:
-            graph = Graph()
-            graph.parse(local_file_path, format='turtle')
+            graph = parse_shacl_file(local_file_path)
             
             is_gaiax_ontology = True if str(url_path).startswith(g_gaiax_server) else False
 
@@ -545,13 +546,13 @@ def register_shacle(url_path : str, shacle_name: str, shacls):
         exit(1)
 
 
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(prog='main.py', description='creates a jsonLD from an attribute table of the meta data extractors')
     parser.add_argument('filename', type=str,help='filename of json attribute table.')
     parser.add_argument('-ontology', type=str,help='githup path to ontologies')
     parser.add_argument('-out', type=str, help='output filname for json LD file.')
-    parser.add_argument('-removeShacl', action="store_true", help='remove the downloaded folder shacl first')
-    args = parser.parse_args()
+    parser.add_argument('-removeShacl', action="store_true", help='download the used shacls again, the local files are replaced one at a time')
+    args = parser.parse_args(argv)
 
     # read attribute data
     claim_path = Path(args.filename)
@@ -562,11 +563,7 @@ def main():
     with open(claim_path, 'r', encoding='utf-8') as file:
         claim_data = json.load(file)
 
-    # download shacle file    
-    if args.removeShacl:
-        shacl_folder = Path('shacles')
-        if shacl_folder.exists():
-            shutil.rmtree(shacl_folder)
+    # download shacle file, the shacles folder is shared with other processes (batch mode, service) and is not deleted
     shacle_namespace, shacle_name = get_namespace(claim_data['shacl_type'])    
     del claim_data['shacl_type']
 
@@ -574,7 +571,7 @@ def main():
     shacl_definitions = {}
     url_path = f'{ontology_path}{shacle_namespace}/'
     new_url_path = get_url_for_download(url_path)
-    register_shacle(new_url_path, shacle_namespace, shacl_definitions)
+    register_shacle(new_url_path, shacle_namespace, shacl_definitions, args.removeShacl)
 
     # get gaiaX/envited prefixes
     shacl_data = shacl_definitions[shacle_namespace]
@@ -587,7 +584,7 @@ def main():
     for key, value in prefixes.items():
         if key not in shacl_definitions:
             new_url_path = get_url_for_download(value)
-            register_shacle(new_url_path, key, shacl_definitions)
+            register_shacle(new_url_path, key, shacl_definitions, args.removeShacl)
     config.SHACLS = shacl_definitions
     
     # fill data in shacle structure
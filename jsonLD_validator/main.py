@@ -41,11 +41,11 @@ def validate_jsonld_against_shacl(data_graph : Graph, shacl_graph : Graph, json_
                 message or "(no message)"
             )    
 
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(prog='main.py', description='validate jsonLD against shacls')
     parser.add_argument('filename', type=str,help='json LD filename')
     parser.add_argument('-closed', action="store_true", help='set closed = true in all NodeShapes, to also check the naming of properties')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # load json
     json_LD_file = Path(args.filename)
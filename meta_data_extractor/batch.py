@@ -0,0 +1,154 @@
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .extractor import extract_file, write_meta_data, configure_geocoder, extractors
+from .main import add_geocoder_arguments, get_geocoder_settings
+from .xosc.parse_cache import configure_parse_cache
+
+import argparse
+import logging
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 16  # files of one format per task, a worker imports the extractor of a format once
+
+
+# files with a registered extension of a directory (recursive) or a file list
+# file list: json list of filenames or a text file with one filename per line, relative to the folder of the list
+def get_files(source: Path) -> list:
+    if source.is_dir():
+        return sorted(file for file in source.rglob('*') if file.is_file() and file.suffix.lstrip('.').lower() in extractors)
+
+    if not source.exists():
+        logger.error(f'source {source} not exists')
+        exit(1)
+
+    with open(source, 'r') as file:
+        if source.suffix.lower() == '.json':
+            entries = json.load(file)
+        else:
+            entries = [line.strip() for line in file if line.strip() and not line.strip().startswith('#')]
+    files = [Path(entry) if Path(entry).is_absolute() else source.parent / entry for entry in entries]
+    return [file.resolve() for file in files]
+
+
+# every file is written to <out>/<path relative to the source folder>.json, e.g. scenarios/a.xosc.json
+def get_output_file(file: Path, base_dir: Path, output_dir: Path) -> Path:
+    try:
+        relative_file = file.relative_to(base_dir)
+    except ValueError:
+        relative_file = Path(file.name)
+    return output_dir / relative_file.parent / f'{relative_file.name}.json'
+
+
+# files of one format in chunks, formats with large files first
+def get_tasks(files: list, chunk_size: int) -> list:
+    formats = {}
+    for file in files:
+        formats.setdefault(file.suffix.lstrip('.').lower(), []).append(file)
+    tasks = []
+    for extension in sorted(formats, key=lambda extension: -sum(file.stat().st_size for file in formats[extension])):
+        group = formats[extension]
+        tasks.extend(group[start:start + chunk_size] for start in range(0, len(group), chunk_size))
+    return tasks
+
+
+# parsed catalogs and maps are cached per worker, a worker extracts many scenarios of the same library
+def init_worker(geocoder_settings: tuple, parse_cache_file: Path = None):
+    configure_geocoder(*geocoder_settings)
+    configure_parse_cache(parse_cache_file)
+
+
+# runs in a worker process
+def extract_files(files: list, base_dir: Path, output_dir: Path) -> list:
+    results = []
+    for file in files:
+        start = time.perf_counter()
+        output_file = get_output_file(file, base_dir, output_dir)
+        result = {'file': file.as_posix(), 'format': file.suffix.lstrip('.').lower(), 'output': output_file.as_posix()}
+        meta_data = None
+        try:
+            if result['format'] == 'xosc' and not is_scenario(file):
+                result['status'] = 'skipped'
+            else:
+                meta_data = extract_file(file)
+                result['status'] = 'success' if meta_data is not None else 'failed'
+        except Exception as e:
+            logger.exception(f'{file} failed')
+            result['status'] = 'failed'
+            result['error'] = repr(e)
+        if meta_data is not None:
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            write_meta_data(meta_data, output_file)
+            result['metadata'] = meta_data
+        result['seconds'] = round(time.perf_counter() - start, 3)
+        results.append(result)
+    return results
+
+
+# catalogs and other OpenSCENARIO files without storyboard have no scenario meta data
+def is_scenario(file: Path) -> bool:
+    from .xosc.extract_osc import is_scenario_file
+
+    return is_scenario_file(file)
+
+
+# extract all files on a process pool, the index gets one json line per file in the order of completion
+def run_batch(files: list, base_dir: Path, output_dir: Path, index_file: Path, processes: int,
+              chunk_size: int = DEFAULT_CHUNK_SIZE, geocoder_settings: tuple = None, parse_cache_file: Path = None) -> dict:
+    start = time.perf_counter()
+    counts = {'success': 0, 'failed': 0, 'skipped': 0}
+    index_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(index_file, 'w', encoding='utf-8') as index, \
+         ProcessPoolExecutor(max_workers=processes, initializer=init_worker, initargs=(geocoder_settings or (), parse_cache_file)) as executor:
+        futures = [executor.submit(extract_files, task, base_dir, output_dir) for task in get_tasks(files, chunk_size)]
+        for future in as_completed(futures):
+            for result in future.result():
+                counts[result['status']] += 1
+                if result['status'] == 'failed':
+                    logger.error(f"file {result['file']} can not be extracted")
+                index.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+            index.flush()
+    return {
+        'files': len(files),
+        **counts,
+        'processes': processes,
+        'seconds': round(time.perf_counter() - start, 3),
+        'index': index_file.as_posix(),
+    }
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(prog='batch.py', description='extracts meta data of all files of a directory or file list on a process pool.')
+    parser.add_argument('source', type=str, help='directory (searched recursively) or file list (json list or text file with one filename per line).')
+    parser.add_argument('-out', type=str, required=True, help='output folder, one json per file and the index.')
+    parser.add_argument('-index', type=str, help='filename of the json lines index, default <out>/index.jsonl.')
+    parser.add_argument('-processes', type=int, default=os.cpu_count(), help='number of worker processes, default number of cpus.')
+    parser.add_argument('-chunk', type=int, default=DEFAULT_CHUNK_SIZE, help=f'files of one format per task, default {DEFAULT_CHUNK_SIZE}.')
+    parser.add_argument('-parsecache', type=str, help='sqlite file to cache the road network summaries of OpenSCENARIO maps.')
+    add_geocoder_arguments(parser)
+    args = parser.parse_args(argv)
+
+    source = Path(args.source).resolve()
+    output_dir = Path(args.out).resolve()
+    files = get_files(source)
+    if not files:
+        logger.error(f'no files found in {source}')
+        exit(1)
+
+    base_dir = source if source.is_dir() else source.parent
+    index_file = Path(args.index).resolve() if args.index else output_dir / 'index.jsonl'
+    logger.info(f'extract {len(files)} files with {args.processes} processes')
+    summary = run_batch(files, base_dir, output_dir, index_file, max(1, args.processes), max(1, args.chunk), get_geocoder_settings(args),
+                        Path(args.parsecache).resolve() if args.parsecache else None)
+    logger.info(f"{summary['success']} of {summary['files']} files extracted, {summary['failed']} failed, "
+                f"{summary['skipped']} skipped in {summary['seconds']} s, index {index_file}")
+
+    if summary['failed']:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
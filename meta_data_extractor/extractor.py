@@ -1,13 +1,24 @@
 from pathlib import Path
 from datetime import datetime
-from geopy.geocoders import Nominatim
-from pyproj import CRS, Transformer
+from typing import Optional
+from .geocode_cache import GeocodeCache
 
+import importlib
+import threading
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
+# extractor module per file extension (lower case), a module is imported with its dependencies
+# (lxml, numpy, pyproj, geopy) only when the first file of its extension is extracted
+extractors = {
+    'xodr': 'meta_data_extractor.xodr.extract_odr',
+    'xosc': 'meta_data_extractor.xosc.extract_osc',
+    '3dmodel': 'meta_data_extractor.3dModel.extract_3dmodel',
+}
+required_functions = ['extract_meta_data', 'get_description', 'get_schema_name', 'get_namespace']
+
 # manual assignment of local country name (Germany) to alpha-2 -> OSM only receives local name, but for alpha 2 code you need the English name.
 country_name_to_alpha2 = {
     "Deutschland": "DE",
@@ -62,15 +73,79 @@ def replace_german_umlauts(text):
     
     return text
 
-def get_position_from_osm(data_dict, latitude, longitude):
+# reverse geocoding backends for get_position_from_osm
+GEOCODER_NOMINATIM = 'nominatim'
+GEOCODER_OFFLINE = 'offline'
+GEOCODER_NONE = 'none'
+geocoders = [GEOCODER_NOMINATIM, GEOCODER_OFFLINE, GEOCODER_NONE]
+
+g_geocoder_settings = {'backend': GEOCODER_NOMINATIM, 'boundaries': None, 'fallback': False, 'cache': None}
+g_offline_geocoders = {}  # loaded boundaries per file, stay loaded for in-process runs
+g_offline_geocoders_lock = threading.Lock()
+
+
+# select the backend: offline needs a boundaries file, with fallback points outside all boundaries are asked at Nominatim
+# with a cache the Nominatim results are kept in this sqlite file
+def configure_geocoder(backend: str = GEOCODER_NOMINATIM, boundaries: Path = None, fallback: bool = False, cache: GeocodeCache = None):
+    if backend == GEOCODER_OFFLINE and boundaries is None:
+        raise ValueError('offline geocoder needs a boundaries file')
+    g_geocoder_settings['backend'] = backend
+    g_geocoder_settings['boundaries'] = Path(boundaries).resolve() if boundaries else None
+    g_geocoder_settings['fallback'] = fallback
+    g_geocoder_settings['cache'] = cache
+
+
+def get_offline_geocoder(boundaries: Path):
+    from .geocoding import OfflineGeocoder  # numpy only for the offline geocoder
+
+    with g_offline_geocoders_lock:
+        if boundaries not in g_offline_geocoders:
+            g_offline_geocoders[boundaries] = OfflineGeocoder(boundaries)
+        return g_offline_geocoders[boundaries]
+
+
+def reverse_geocode_nominatim(latitude, longitude) -> Optional[dict]:
+    cache = g_geocoder_settings['cache']
+    if cache:
+        address = cache.get(latitude, longitude)
+        if address is not None:
+            return address
+
+    from geopy.geocoders import Nominatim
+
     # custom User-Agent
     custom_user_agent = "GaiaX_ODR_Extractor/1.0"
     # Initialize Nominatim geocoder    
     geolocator = Nominatim(user_agent=custom_user_agent)
     # Reverse geocoding: find address based on coordinates
     location = geolocator.reverse((latitude, longitude), exactly_one=True)
-    # Extract the desired information
+    if location is None:
+        return None
     address = location.raw['address']
+    if cache:
+        cache.put(latitude, longitude, address)
+    return address
+
+
+# address like the address of a Nominatim response, None if the position is unknown
+def reverse_geocode(latitude, longitude) -> Optional[dict]:
+    backend = g_geocoder_settings['backend']
+    if backend == GEOCODER_OFFLINE:
+        address = get_offline_geocoder(g_geocoder_settings['boundaries']).reverse(latitude, longitude)
+        if address is not None or not g_geocoder_settings['fallback']:
+            return address
+        logger.info(f'position {latitude}, {longitude} not in offline boundaries, ask Nominatim')
+    return reverse_geocode_nominatim(latitude, longitude)
+
+
+def get_position_from_osm(data_dict, latitude, longitude):
+    if g_geocoder_settings['backend'] == GEOCODER_NONE:
+        return
+    address = reverse_geocode(latitude, longitude)
+    if address is None:
+        logger.warning(f'no address found for position {latitude}, {longitude}')
+        return
+    # Extract the desired information
     country_name = address.get('country', '')
     data_dict['georeference:country'] = replace_german_umlauts(str(address.get('country_code', country_name_to_alpha2.get(country_name, "DE"))).upper())
     data_dict['georeference:state'] = address.get('ISO3166-2-lvl4', address.get('state', ''))
@@ -80,17 +155,17 @@ def get_position_from_osm(data_dict, latitude, longitude):
 
 
 def proj4_to_epsg(proj4_string):
-    # create a CRS-Object from Proj4-String
-    crs = CRS.from_proj4(proj4_string)
-    # get EPSG-Code
-    epsg_code = crs.to_epsg()
-    return epsg_code
+    from utils.projection import get_epsg
 
+    # EPSG-Code of the cached CRS-Object
+    return get_epsg(proj4_string)
 
+
+# lat and lon (WGS84) of one point or of arrays of points at once
 def convert_to_LatLon(x, y, proj4):
-    transformer = Transformer.from_proj(proj4, 'epsg:4326')  # WGS84
-    lon, lat = transformer.transform(x, y)
-    return lon, lat
+    from utils.projection import to_lat_lon
+
+    return to_lat_lon(x, y, proj4)
 
 def datetime_handler(x):
     if isinstance(x, datetime.datetime):
@@ -98,51 +173,58 @@ def datetime_handler(x):
     raise TypeError("Unknown type")
 
 
-def extract(file: Path, output_file: Path) -> bool:   
-    file = file.expanduser()
-    file = file.resolve()
+# extractor module of the extension, None if there is none or it can not be loaded
+def get_extractor(extension: str):
+    module_name = extractors.get(extension.lower())
+    if module_name is None:
+        logger.error(f'No extractor for file extension {extension}, supported: {", ".join(extractors)}')
+        return None
 
-    # check folder with extension
-    extension = file.suffix.lstrip('.')
-    format_path = Path(__file__).parent / f'{extension}'
-    if not format_path.exists() or not format_path.is_dir():
-        logger.error(f'Provided format path does not exist or is not a file: {format_path.absolute()}')
-        return False
-    
-    # import python script from subfolder
-    files = [extrator_file for extrator_file in format_path.iterdir() if extrator_file.name.endswith('.py') and extrator_file.name != '__init__.py' and extrator_file.name.startswith('extract_')]
-    if len(files) == 0:
-        return False
-    module_name = 'meta_data_extractor.' + Path(files[0]).relative_to(Path(__file__).parent).as_posix().replace('/', '.').replace('.py', '')
-    required_functions = ['extract_meta_data', 'get_description', 'get_schema_name', 'get_namespace']
     logger.debug(f'Loading extractor {{{module_name}}}')
     try:
-        extract_module = __import__(module_name, fromlist=required_functions)
+        extract_module = importlib.import_module(module_name)
     except:
         logger.exception(f'Could not load extract file from module {module_name}')
-        return False
+        return None
     
     # check required functions    
-    missing_function = False
     for function in required_functions:
         if not hasattr(extract_module, function):    
             logger.error(f'{module_name} has no requried function {function}')
-            missing_function = True
-            break
-    if missing_function: 
-        return False      
+            return None
+    return extract_module
+
 
-    # call extract and get filled attributes
+# meta data of the file, None if it can not be extracted
+def extract_file(file: Path) -> Optional[dict]:
+    extract_module = get_extractor(file.suffix.lstrip('.'))
+    if extract_module is None:
+        return None
+
+    # call extract and get filled attributes, extractors return False on errors
     try:
-        valid, meta_data = extract_module.extract_meta_data(file)
-        if valid is False:
-            return valid        
+        result = extract_module.extract_meta_data(file)
+        if result is False or result[0] is False:
+            return None
+        return result[1]
     except:
         logger.exception(f'Could not extract format {extract_module.get_description()}')
-        return False     
+        return None
+
 
+def write_meta_data(meta_data: dict, output_file: Path):
     with open(output_file, 'w') as f:
         json.dump(meta_data, f, indent=4, ensure_ascii=False, default=datetime_handler)
         logger.info(f'write json to {output_file}')
-   
-    return True
\ No newline at end of file
+
+
+def extract(file: Path, output_file: Path) -> bool:   
+    file = file.expanduser()
+    file = file.resolve()
+
+    meta_data = extract_file(file)
+    if meta_data is None:
+        return False
+
+    write_meta_data(meta_data, output_file)
+    return True
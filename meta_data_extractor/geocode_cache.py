@@ -0,0 +1,65 @@
+from pathlib import Path
+from typing import Optional
+from contextlib import closing
+
+import sqlite3
+import logging
+import json
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PRECISION = 3           # decimal places of lat and lon, about 100 m
+DEFAULT_CACHE_TTL = 30 * 24 * 3600    # seconds
+DEFAULT_CACHE_SIZE = 100000           # entries
+
+
+# persistent cache of reverse geocoding results, one sqlite file can be shared by several processes
+# the key is the position rounded to precision decimal places, entries older than ttl seconds are not used
+# above max_entries the least recently used entries are removed
+class GeocodeCache:
+    def __init__(self, filename: Path, precision: int = DEFAULT_CACHE_PRECISION, ttl: float = DEFAULT_CACHE_TTL, max_entries: int = DEFAULT_CACHE_SIZE):
+        self.filename = Path(filename)
+        self.precision = precision
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self.connect()) as connection, connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS geocode (key TEXT PRIMARY KEY, address TEXT NOT NULL, created REAL NOT NULL, used REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS geocode_used ON geocode (used)')
+
+    # own connection per call, connections must not be shared between threads
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.filename, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    def get_key(self, latitude: float, longitude: float) -> str:
+        return f'{latitude:.{self.precision}f} {longitude:.{self.precision}f}'
+
+    def get(self, latitude: float, longitude: float) -> Optional[dict]:
+        key = self.get_key(latitude, longitude)
+        now = time.time()
+        try:
+            with closing(self.connect()) as connection, connection:
+                row = connection.execute('SELECT address FROM geocode WHERE key = ? AND created >= ?', (key, now - self.ttl)).fetchone()
+                if row is None:
+                    return None
+                connection.execute('UPDATE geocode SET used = ? WHERE key = ?', (now, key))
+            return json.loads(row[0])
+        except sqlite3.Error:
+            logger.warning(f'geocode cache {self.filename} not readable', exc_info=True)
+            return None
+
+    def put(self, latitude: float, longitude: float, address: dict):
+        now = time.time()
+        try:
+            with closing(self.connect()) as connection, connection:
+                connection.execute('INSERT OR REPLACE INTO geocode (key, address, created, used) VALUES (?, ?, ?, ?)',
+                                   (self.get_key(latitude, longitude), json.dumps(address, ensure_ascii=False), now, now))
+                connection.execute('DELETE FROM geocode WHERE created < ?', (now - self.ttl,))
+                count = connection.execute('SELECT COUNT(*) FROM geocode').fetchone()[0]
+                if count > self.max_entries:
+                    connection.execute('DELETE FROM geocode WHERE key IN (SELECT key FROM geocode ORDER BY used LIMIT ?)', (count - self.max_entries,))
+        except sqlite3.Error:
+            logger.warning(f'geocode cache {self.filename} not writable', exc_info=True)
@@ -0,0 +1,163 @@
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import logging
+import json
+import math
+
+logger = logging.getLogger(__name__)
+
+# offline reverse geocoding with administrative boundaries of a local geojson file (e.g. an OSM boundary export)
+# every feature is a Polygon or MultiPolygon (lon, lat) with the properties
+# - admin_level: 2 country, 4 state, 6 county, 8 city
+# - name
+# - ISO3166-1:alpha2 or ISO3166-1 for countries and ISO3166-2 for states (optional)
+# the result is an address like the address of a Nominatim response
+
+address_keys = {2: 'country', 4: 'state', 6: 'county', 8: 'city'}
+
+NODE_CAPACITY = 16
+
+
+# polygon with holes, rings are stored as edges (x0, y0, x1, y1) for the crossing test
+class Polygon:
+    def __init__(self, rings: list):
+        self.rings = [get_edges(ring) for ring in rings]
+
+    def contains(self, x: float, y: float) -> bool:
+        # inside the exterior and not inside a hole
+        if not ring_contains(self.rings[0], x, y):
+            return False
+        return not any(ring_contains(hole, x, y) for hole in self.rings[1:])
+
+
+def get_edges(ring: list) -> np.ndarray:
+    points = np.asarray(ring, dtype=float)[:, :2]
+    return np.hstack([points, np.roll(points, -1, axis=0)])
+
+
+# even-odd rule: count crossings of a ray from the point in +x direction
+def ring_contains(edges: np.ndarray, x: float, y: float) -> bool:
+    x0, y0, x1, y1 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+    crossing = (y0 > y) != (y1 > y)
+    if not crossing.any():
+        return False
+    x0, y0, x1, y1 = x0[crossing], y0[crossing], x1[crossing], y1[crossing]
+    x_cross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    return np.count_nonzero(x < x_cross) % 2 == 1
+
+
+class Boundary:
+    def __init__(self, admin_level: int, name: str, properties: dict, polygons: list):
+        self.admin_level = admin_level
+        self.name = name
+        self.properties = properties
+        self.polygons = polygons
+        points = np.vstack([polygon.rings[0][:, :2] for polygon in polygons])
+        self.bounds = (*points.min(axis=0), *points.max(axis=0))
+        self.area = (self.bounds[2] - self.bounds[0]) * (self.bounds[3] - self.bounds[1])
+
+    def contains(self, x: float, y: float) -> bool:
+        return any(polygon.contains(x, y) for polygon in self.polygons)
+
+
+# static r-tree over bounding boxes, packed with sort tile recursive (STR)
+class STRTree:
+    def __init__(self, items: list, node_capacity: int = NODE_CAPACITY):
+        # items: (bounds (x_min, y_min, x_max, y_max), value)
+        self.node_capacity = node_capacity
+        nodes = [(np.array(bounds, dtype=float), value, None) for bounds, value in items]
+        self.root = None
+        while len(nodes) > 1:
+            nodes = self.pack(nodes)
+        if nodes:
+            self.root = nodes[0] if nodes[0][2] is not None else self.create_node(nodes)
+
+    # one level of the tree: sort by x center into slices, sort every slice by y center and group
+    def pack(self, nodes: list) -> list:
+        capacity = self.node_capacity
+        node_count = math.ceil(len(nodes) / capacity)
+        slice_size = math.ceil(math.sqrt(node_count)) * capacity
+        nodes = sorted(nodes, key=lambda node: node[0][0] + node[0][2])
+        parents = []
+        for slice_start in range(0, len(nodes), slice_size):
+            nodes_of_slice = sorted(nodes[slice_start:slice_start + slice_size], key=lambda node: node[0][1] + node[0][3])
+            for start in range(0, len(nodes_of_slice), capacity):
+                parents.append(self.create_node(nodes_of_slice[start:start + capacity]))
+        return parents
+
+    @staticmethod
+    def create_node(children: list) -> tuple:
+        child_bounds = np.vstack([child[0] for child in children])
+        bounds = np.array([*child_bounds[:, :2].min(axis=0), *child_bounds[:, 2:].max(axis=0)])
+        return bounds, None, (child_bounds, children)
+
+    # values of all items whose bounding box contains the point
+    def query(self, x: float, y: float) -> list:
+        if self.root is None:
+            return []
+        values = []
+        stack = [self.root]
+        while stack:
+            _, _, (child_bounds, children) = stack.pop()
+            hits = np.flatnonzero((child_bounds[:, 0] <= x) & (x <= child_bounds[:, 2]) & (child_bounds[:, 1] <= y) & (y <= child_bounds[:, 3]))
+            for index in hits:
+                child = children[index]
+                if child[2] is None:
+                    values.append(child[1])
+                else:
+                    stack.append(child)
+        return values
+
+
+class OfflineGeocoder:
+    def __init__(self, boundaries_file: Path):
+        with open(boundaries_file, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        boundaries = [boundary for boundary in (read_boundary(feature) for feature in data.get('features', [])) if boundary]
+        self.tree = STRTree([(boundary.bounds, boundary) for boundary in boundaries])
+        logger.info(f'loaded {len(boundaries)} boundaries from {boundaries_file}')
+
+    # address of the point, None if it is in no boundary
+    def reverse(self, latitude: float, longitude: float) -> Optional[dict]:
+        found = {}
+        # smallest boundary per level, e.g. enclaves
+        for boundary in sorted(self.tree.query(longitude, latitude), key=lambda boundary: boundary.area):
+            if boundary.admin_level not in found and boundary.contains(longitude, latitude):
+                found[boundary.admin_level] = boundary
+        if not found:
+            return None
+
+        address = {}
+        for admin_level, boundary in sorted(found.items()):
+            address[address_keys[admin_level]] = boundary.name
+        if 2 in found:
+            country_code = found[2].properties.get('ISO3166-1:alpha2', found[2].properties.get('ISO3166-1'))
+            if country_code:
+                address['country_code'] = country_code.lower()
+        if 4 in found and found[4].properties.get('ISO3166-2'):
+            address['ISO3166-2-lvl4'] = found[4].properties['ISO3166-2']
+        return address
+
+
+def read_boundary(feature: dict) -> Optional[Boundary]:
+    properties = feature.get('properties') or {}
+    geometry = feature.get('geometry') or {}
+    try:
+        admin_level = int(properties.get('admin_level'))
+    except (TypeError, ValueError):
+        return None
+    if admin_level not in address_keys or not properties.get('name'):
+        return None
+
+    if geometry.get('type') == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif geometry.get('type') == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        return None
+    polygons = [Polygon(rings) for rings in polygons if rings and len(rings[0]) >= 3]
+    if not polygons:
+        return None
+    return Boundary(admin_level, properties['name'], properties, polygons)
@@ -1,5 +1,7 @@
    
-from .extractor import extract
+from .extractor import extract, configure_geocoder, geocoders, GEOCODER_NOMINATIM, GEOCODER_OFFLINE
+from .geocode_cache import GeocodeCache, DEFAULT_CACHE_PRECISION, DEFAULT_CACHE_TTL, DEFAULT_CACHE_SIZE
+from .xosc.parse_cache import configure_parse_cache
 from pathlib import Path
 
 import argparse
@@ -8,14 +10,38 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def main():
+# geocoder arguments, used by main and batch
+def add_geocoder_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('-geocoder', type=str, choices=geocoders, default=GEOCODER_NOMINATIM, help='reverse geocoding of the map position: nominatim (online), offline (local boundaries) or none, default nominatim.')
+    parser.add_argument('-boundaries', type=str, help='geojson file with administrative boundaries for the offline geocoder.')
+    parser.add_argument('-fallback', action='store_true', help='ask Nominatim for positions outside of the offline boundaries.')
+    parser.add_argument('-geocache', type=str, help='sqlite file to cache Nominatim results, can be shared by several processes.')
+    parser.add_argument('-geocache_precision', type=int, default=DEFAULT_CACHE_PRECISION, help=f'decimal places of lat and lon in the cache key, default {DEFAULT_CACHE_PRECISION}.')
+    parser.add_argument('-geocache_ttl', type=float, default=DEFAULT_CACHE_TTL / 86400, help=f'days a cached result is used, default {DEFAULT_CACHE_TTL // 86400}.')
+    parser.add_argument('-geocache_size', type=int, default=DEFAULT_CACHE_SIZE, help=f'maximal number of cached results, default {DEFAULT_CACHE_SIZE}.')
+
+
+# geocoder settings of the arguments as parameters of configure_geocoder
+def get_geocoder_settings(args: argparse.Namespace) -> tuple:
+    if args.geocoder == GEOCODER_OFFLINE and not args.boundaries:
+        logger.error('offline geocoder needs -boundaries')
+        exit(1)
+    cache = GeocodeCache(Path(args.geocache), args.geocache_precision, args.geocache_ttl * 86400, args.geocache_size) if args.geocache else None
+    return args.geocoder, Path(args.boundaries).resolve() if args.boundaries else None, args.fallback, cache
+
+
+def main(argv: list = None):
     parser = argparse.ArgumentParser(prog='main.py', description='extractor meta data from a given file.')
     parser.add_argument('filename', help='filename to extract metadata')
     parser.add_argument('-out', '--output', type=str, help='filename to exported json dict.')
     parser.add_argument('-u', '--user_input', action='store_true', help='Activates the user query via dialogues for non-extractable attributes.')    
+    parser.add_argument('-parsecache', type=str, help='sqlite file to cache the road network summaries of OpenSCENARIO maps.')
+    add_geocoder_arguments(parser)
 
     # 1. get and check arguments
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    configure_geocoder(*get_geocoder_settings(args))
+    configure_parse_cache(Path(args.parsecache) if args.parsecache else None)
 
     # get output dir
     output_file = Path(args.output)
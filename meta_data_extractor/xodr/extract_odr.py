@@ -1,17 +1,20 @@
-from sympy import symbols, solveset
 from lxml import etree
 from pathlib import Path
 from datetime import datetime
 from typing import Tuple
 from ..extractor import get_position_from_osm, proj4_to_epsg, convert_to_LatLon
-from utils.utils import create_uuid
+from utils.identifiers import create_uuid
 
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
 
 version = 'v4'
 
+# elevations evaluated at once
+ELEVATION_BATCH_SIZE = 65536
+
 
 def container_in_str(data: any) -> str:
     string = ''
@@ -31,80 +34,208 @@ def convert_date_time(date_string, supported_syntax):
 
 
 
+#######################################################################################################################
+# collects the data of get_meta_data in one pass over the elements, every element is dispatched by its tag
+# the first element of a tag decides if one of its attributes is used at all
+class OdrCollector:
+    def __init__(self):
+        self.first_attributes = dict()
+        self.header = None
+        self.geo_reference = None
+        self.elevations = []        # (a, b, c, d, s) not yet in elevation_min and elevation_max
+        self.elevation_roads = 0    # number of roads in elevation_min and elevation_max
+        self.elevation_min = None
+        self.elevation_max = None
+        self.road_lengths = []
+        self.road_types = set()
+        self.lane_types = set()
+        self.speed_limits = set()
+        self.object_types = set()
+        self.object_subtypes = dict()
+        self.number_objects = 0
+        self.number_outlines = 0
+        self.number_junctions = 0
+        self.handlers = {
+            'header': self.add_header,
+            'geoReference': self.add_geo_reference,
+            'road': self.add_road,
+            'type': self.add_road_type,
+            'elevation': self.add_elevation,
+            'lane': self.add_lane,
+            'speed': self.add_speed,
+            'object': self.add_object,
+            'outline': self.add_outline,
+            'junction': self.add_junction,
+        }
+
+    # all elements with a handler below root in document order
+    def collect(self, root):
+        for element in root.iter(*self.handlers):
+            if element is not root:
+                self.add(element)
+        self.add_elevation_range()
+
+    # parse and collect at once, memory is bounded by the largest road:
+    # every top level element is removed after its end, only the root element stays
+    def collect_stream(self, file_path: Path):
+        for _, element in etree.iterparse(str(file_path), events=('end',), tag=list(self.handlers), dtd_validation=False):
+            parent = element.getparent()
+            if parent is None:
+                continue
+            self.add(element)
+            if parent.getparent() is None:
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+        self.add_elevation_range()
+
+    def add(self, element):
+        tag = element.tag
+        if tag == 'type':
+            # only road types --> ./road/type
+            if not self.is_road_type(element):
+                return
+            tag = 'road/type'
+        if tag not in self.first_attributes:
+            self.first_attributes[tag] = set(element.attrib.keys())
+        self.handlers[element.tag](element)
+
+    # type below a road below the root element
+    @staticmethod
+    def is_road_type(element) -> bool:
+        road = element.getparent()
+        return road is not None and road.tag == 'road' and road.getparent() is not None and road.getparent().getparent() is None
+
+    # check if the first element of the tag has all attributes
+    def has(self, tag: str, *attributes) -> bool:
+        return tag in self.first_attributes and all(attribute in self.first_attributes[tag] for attribute in attributes)
+
+    def add_header(self, element):
+        if self.header is None:
+            self.header = dict(element.attrib)
+
+    def add_geo_reference(self, element):
+        if self.geo_reference is None and any(True for _ in element.iterancestors('header')):
+            self.geo_reference = element.text
+
+    def add_road(self, element):
+        if self.has('road', 'length'):
+            self.road_lengths.append(float(element.attrib['length']))
+
+    def add_road_type(self, element):
+        if 'type' in element.attrib:
+            self.road_types.add(element.attrib['type'])
+
+    def add_elevation(self, element):
+        if self.has('elevation', 'a', 'b', 'c', 'd', 's'):
+            attributes = element.attrib
+            self.elevations.append((float(attributes['a']), float(attributes['b']), float(attributes['c']),
+                                    float(attributes['d']), float(attributes['s'])))
+            if len(self.elevations) % ELEVATION_BATCH_SIZE == 0:
+                self.add_elevation_range(complete_roads_only=True)
+
+    # add the pending elevations to min and max
+    # the end of the last elevation of a road is only known when the next road starts, those stay pending with complete_roads_only
+    def add_elevation_range(self, complete_roads_only: bool = False):
+        count = len(self.elevations)
+        if complete_roads_only:
+            count = next((index for index in range(len(self.elevations) - 1, 0, -1) if self.elevations[index][4] == 0), 0)
+            roads = 1 + sum(1 for elevation in self.elevations[1:count] if elevation[4] == 0)
+            if count == 0 or self.elevation_roads + roads > len(self.road_lengths):
+                return
+        if count == 0:
+            return
+        elevations = self.elevations[:count]
+        del self.elevations[:count]
+        elevation_min, elevation_max, roads = get_elevation_extrema(elevations, self.road_lengths[self.elevation_roads:])
+        self.elevation_roads += roads
+        self.elevation_min = elevation_min if self.elevation_min is None else min(self.elevation_min, elevation_min)
+        self.elevation_max = elevation_max if self.elevation_max is None else max(self.elevation_max, elevation_max)
+
+    def get_elevation_range(self) -> float:
+        return self.elevation_max - self.elevation_min if self.elevation_min is not None else 0.0
+
+    def add_lane(self, element):
+        if 'type' in element.attrib:
+            self.lane_types.add(element.attrib['type'])
+
+    def add_speed(self, element):
+        if 'max' in element.attrib:
+            self.speed_limits.add(element.attrib['max'])
+
+    def add_object(self, element):
+        self.number_objects += 1
+        attributes = element.attrib
+        if 'type' in attributes:
+            self.object_types.add(attributes['type'])
+        subtype = attributes.get('subtype')
+        self.object_subtypes[subtype] = self.object_subtypes.get(subtype, 0) + 1
+
+    def add_outline(self, element):
+        self.number_outlines += 1
+
+    def add_junction(self, element):
+        self.number_junctions += 1
+
+
 #######################################################################################################################
 def get_meta_data(file_path: str, default_value: str) -> dict:
 
     root = etree.parse(file_path).getroot()
+    collector = OdrCollector()
+    collector.collect(root)
+    return create_meta_data(file_path, collector, default_value)
+
+
+#######################################################################################################################
+def get_meta_data_stream(file_path: Path, default_value: str) -> dict:
+
+    collector = OdrCollector()
+    collector.collect_stream(file_path)
+    return create_meta_data(file_path, collector, default_value)
+
+
+#######################################################################################################################
+def create_meta_data(file_path: str, collector: OdrCollector, default_value: str) -> dict:
 
     unknown_unit = "unknown unit"
 
     # get data used several times
-    data = dict()
     content_dict = dict()
     format_dict = dict()
     quantity_dict = dict()
+    header = collector.header
 
-    # read xml and extract header data
-    data['header'] = root.find('.//header').attrib if check_data(root, ".//header") else None
-    if check_data(root,".//header//geoReference"):
-        data['header']['geoReference'] = root.find('.//header//geoReference').text
-
-    # read xml and extract all elevation data
-    data['elevation'] = [elevation.attrib for elevation in root.findall('.//elevation')]
-
-    # read xml and extract object data
-    data['object'] = [obj.attrib for obj in root.findall('.//object')] if check_data(root, ".//object") else None
-
-    # readable meta data
-    # read xml and search for CRG and read the element file         # TODO Testing
-    data_links = container_in_str(set([crg.attrib['file'] for crg in root.findall('.//CRG')])) if check_data(root, ".//CRG","file") else ''# default_value
-    #if data_links:
-    #    meta_data_dict['data_link'] = {}
-
-    # read xml and search for speed and the element max --> then sort by max and create a set --> set == unique values
-    speedlimit_range = sorted(set((max.attrib['max'] for max in root.findall('.//speed')))) if check_data(root, ".//speed","max") else {0, 50}
+    # speed limits as unique values sorted as text
+    speedlimit_range = sorted(collector.speed_limits) if collector.has('speed', 'max') else [0, 50]
     speedlimit_range_dict = {}
     speedlimit_range_dict['hdmap:min'] = float(speedlimit_range[0])
     speedlimit_range_dict['hdmap:max'] = float(speedlimit_range[-1])
     quantity_dict['hdmap:speedLimit'] = speedlimit_range_dict
 
-    # read xml and check if lane and its element type exists --> take all information of lane type and make them unique
-    lane_types = set([lane.attrib['type'] for lane in root.findall('.//lane')]) if check_data(root, ".//lane","type") else None
-    if lane_types:
-        content_dict['hdmap:laneTypes'] = list(sorted(lane_types))
+    # unique lane types
+    if collector.has('lane', 'type') and collector.lane_types:
+        content_dict['hdmap:laneTypes'] = list(sorted(collector.lane_types))
 
-    # read xml and check if road and its element type exists --> take all information of road type and make them unique 
-    road_types = set([road_type.attrib['type'] for road_type in root.findall('./road/type')]) if check_data(root,"./road/type","type") else None
-    if road_types:
-        content_dict['hdmap:roadTypes'] = list(sorted(road_types))
+    # unique road types
+    if collector.has('road/type', 'type') and collector.road_types:
+        content_dict['hdmap:roadTypes'] = list(sorted(collector.road_types))
 
-    # create a unique list of object type if it exists
-    objects = set([obj['type'] for obj in data['object']]) if check_data(root, ".//object", "type") else None
-    if objects:
-        content_dict['hdmap:levelOfDetail'] = list(objects)
+    # unique object types
+    if collector.has('object', 'type') and collector.object_types:
+        content_dict['hdmap:levelOfDetail'] = list(collector.object_types)
 
     # search for revMajor and revMinor and create the format_version string
-    format_dict['hdmap:version'] = str(data['header']['revMajor']) + '.' + str(data['header']['revMinor']) if check_data(root, ".//header", "revMajor", "revMinor") else default_value
+    format_dict['hdmap:version'] = str(header['revMajor']) + '.' + str(header['revMinor']) if collector.has('header', 'revMajor', 'revMinor') else default_value
     format_dict['hdmap:formatType'] = 'ASAM OpenDRIVE'
 
-    # read xml and create a list with all lengths
-    list_of_lengths = [float(road.attrib['length']) for road in root.findall('.//road')] if check_data(root,".//road","length") else default_value
+    list_of_lengths = collector.road_lengths
 
-    # search for needed information
-    #meta_data_dict['vendor_name'] = data['header']['vendor'] if check_data(root, ".//header","vendor") else default_value
     # convert to datetime object
     hasDataResource_dict = dict()
-    #general_data_dict = dict()
 
-    
     # parse string of georeference
-    # set all values to default
-    geo_reference = None
-    if 'header' in data and 'geoReference' in data['header']:
-        geo_reference = data['header']['geoReference']
-    
-    #lat = 0.0
-    #lon = 0.0
+    geo_reference = collector.geo_reference if header is not None else None
 
     if geo_reference:
         geodetic_ref_system_dict = dict()
@@ -122,10 +253,6 @@ def get_meta_data(file_path: str, default_value: str) -> dict:
                 local_data_dict['geodetic_datum'] = information.split("+datum=")[1]
             elif information.startswith("+units="):
                 local_data_dict['geodetic_unit'] = information.split("+units=")[1]
-            #elif information.startswith("+lat_0="):
-            #    lat = information.split("+lat_0=")[1]
-            #elif information.startswith("+lon_0="):
-            #    lon = information.split("+lon_0=")[1]
 
         epsg_code = proj4_to_epsg(geo_reference)
         if epsg_code:
@@ -136,28 +263,22 @@ def get_meta_data(file_path: str, default_value: str) -> dict:
     ###################################################################################################################
     # calculated meta data
 
-    # read xml and count the amount of junctions/intersection
-    quantity_dict['hdmap:numberIntersections'] = len(root.findall('.//junction')) if check_data(root,".//junction") else 0
-
-    # read xml and count the amount of outlines
-    quantity_dict['hdmap:numberOutlines'] = len(root.findall('.//outline')) if check_data(root, ".//outline") else 0
+    # amount of junctions/intersection and outlines
+    quantity_dict['hdmap:numberIntersections'] = collector.number_junctions
+    quantity_dict['hdmap:numberOutlines'] = collector.number_outlines
 
     # add all lengths /1000 -->from meters to kilometers
     quantity_dict['hdmap:length'] = float(sum(list_of_lengths) / 1000) if len(list_of_lengths) else 0.0
-    #meta_data_dict['length_unit'] = 'km'
 
     # call function get_elevation_range with elevation data
-    quantity_dict['hdmap:elevationRange'] = float(get_elevation_range(root, data['elevation'], list_of_lengths))
-    #meta_data_dict['elevation_range_unit'] = 'm'
+    quantity_dict['hdmap:elevationRange'] = float(collector.get_elevation_range())
 
     # count the amount of objects
-    quantity_dict['hdmap:numberObjects'] = len(data['object']) if data['object'] is not None else 0
+    quantity_dict['hdmap:numberObjects'] = collector.number_objects
 
-    # check if object has the element subtype and count the amount of subtype == trafficLight
-    quantity_dict['hdmap:numberTrafficLights'] = len([obj for obj in data['object'] if obj['subtype'] == 'trafficLight']) if check_data(root, './/object','subtype') else 0
-
-    # check if object has the element subtype and count the amount of subtype == trafficSign
-    quantity_dict['hdmap:numberTrafficSigns'] = len([obj for obj in data['object'] if obj['subtype'] == 'trafficSign']) if check_data(root, './/object','subtype') else 0
+    # check if object has the element subtype and count the amount of subtype == trafficLight and trafficSign
+    quantity_dict['hdmap:numberTrafficLights'] = collector.object_subtypes.get('trafficLight', 0) if collector.has('object', 'subtype') else 0
+    quantity_dict['hdmap:numberTrafficSigns'] = collector.object_subtypes.get('trafficSign', 0) if collector.has('object', 'subtype') else 0
 
     ###################################################################################################################
     # constant meta data
@@ -172,12 +293,15 @@ def get_meta_data(file_path: str, default_value: str) -> dict:
         projection_location_dict = dict()
         georeference_dict['georeference:hasProjectLocation'] = projection_location_dict
         bounding_dict = dict()
-        bounding_dict['xMin'] = float(root.find('.//header').attrib['west']) if check_data(root, ".//header", "west") else unknown_unit
-        bounding_dict['xMax'] = float(root.find('.//header').attrib['east']) if check_data(root, ".//header", "east") else unknown_unit
-        bounding_dict['yMin'] = float(root.find('.//header').attrib['south']) if check_data(root, ".//header", "south") else unknown_unit
-        bounding_dict['yMax'] = float(root.find('.//header').attrib['north']) if check_data(root, ".//header", "north") else unknown_unit    
-        bounding_dict['yMin'], bounding_dict['xMin'] = convert_to_LatLon(bounding_dict['xMin'], bounding_dict['yMin'], geo_reference)
-        bounding_dict['yMax'], bounding_dict['xMax'] = convert_to_LatLon(bounding_dict['xMax'], bounding_dict['yMax'], geo_reference)
+        bounding_dict['xMin'] = float(header['west']) if collector.has('header', 'west') else unknown_unit
+        bounding_dict['xMax'] = float(header['east']) if collector.has('header', 'east') else unknown_unit
+        bounding_dict['yMin'] = float(header['south']) if collector.has('header', 'south') else unknown_unit
+        bounding_dict['yMax'] = float(header['north']) if collector.has('header', 'north') else unknown_unit
+        # corners and 0,0 point in unit converted to lat lon at once
+        lats, lons = convert_to_LatLon([bounding_dict['xMin'], bounding_dict['xMax'], 0.0], [bounding_dict['yMin'], bounding_dict['yMax'], 0.0], geo_reference)
+        lats, lons = lats.tolist(), lons.tolist()
+        bounding_dict['yMin'], bounding_dict['xMin'] = lats[0], lons[0]
+        bounding_dict['yMax'], bounding_dict['xMax'] = lats[1], lons[1]
         bounding_data_dict = dict()
         bounding_data_dict['georeference:xMin'] = str(bounding_dict['xMin'])
         bounding_data_dict['georeference:yMin'] = str(bounding_dict['yMin'])
@@ -185,8 +309,8 @@ def get_meta_data(file_path: str, default_value: str) -> dict:
         bounding_data_dict['georeference:yMax'] = str(bounding_dict['yMax'])
         projection_location_dict['georeference:hasBoundingBox'] = bounding_data_dict
 
-        # get 0,0 point in unit and convert to lat lon
-        lat, lon = convert_to_LatLon(0.0, 0.0, geo_reference)
+        # 0,0 point in lat lon
+        lat, lon = lats[2], lons[2]
         origin_dict = dict()
         origin_dict['georeference:lat'] = str(lat)
         origin_dict['georeference:lon'] = str(lon)
@@ -220,7 +344,7 @@ def get_meta_data(file_path: str, default_value: str) -> dict:
 
     try:        
         supported_date_syntax = ["%Y-%m-%d", "%d-%m-%Y", "%m-%d-%Y", "%Y/%m/%d", "%d.%m.%Y", "%m/%d/%Y"]
-        meta_data_dict['recordingTime'] = convert_date_time(data['header']['date'], supported_date_syntax) if check_data(root,".//header","date") else default_value
+        meta_data_dict['recordingTime'] = convert_date_time(header['date'], supported_date_syntax) if collector.has('header', 'date') else default_value
     except:
         logger.error('cannot extract date')    
 
@@ -255,165 +379,63 @@ def get_meta_data(file_path: str, default_value: str) -> dict:
 #######################################################################################################################
 
 
-# function to check if the path is in xml file and if the element is in the certain path
-def check_data(root, path: str, *elements) -> bool:
-    try:
-        # finding the first instance of the path. if no instance is found 'None' is returned
-        entries = root.find(path)
-
-        # if the path is not existing
-        if entries is None:
-            return False
-
-        # as elements is a vararg iterate through it
-        if len(elements) != 0:
-            # go through every element and try to reach it
-            for element in elements:
-                entries.attrib[element]  # as we only want to reach it we don't need to store it
-        return True
-
-    # if xpath is not in current xml file there will be a key error
-    except KeyError:
-        return False
-
-    # if one of the elements is not in current xml path at the certain xpath there will be a value error
-    except ValueError:
-        return False
-
-    # if the entry doesn't have the elements there will be a attribute error
-    except AttributeError:
-        return False
+# function to get the min and max value of every elevation segment at once
+# elev(ds) = a + b*ds + c*ds² + d*ds³ with 0 <= ds <= end - s
+# link: https://releases.asam.net/OpenDRIVE/1.6.0/ASAM_OpenDRIVE_BS_V1-6-0.html#_methods_of_elevation
+def get_elevation_min_max(a, b, c, d, lengths) -> Tuple[np.ndarray, np.ndarray]:
+    def evaluate(ds):
+        return a + ds * (b + ds * (c + ds * d))
 
+    # values at the front and back border
+    values = [evaluate(np.zeros_like(lengths)), evaluate(lengths)]
 
-#######################################################################################################################
-
-
-# function to get all functions and differentiation of the elevations
-def get_elevation_functions(a, b, c, d, s):
-    # declare x as a variable
-    x = symbols('x')
+    # roots of the differentiation b + 2*c*ds + 3*d*ds² --> local extrema
+    with np.errstate(divide='ignore', invalid='ignore'):
+        discriminant = 4 * c * c - 12 * b * d
+        sqrt_discriminant = np.sqrt(np.where(discriminant >= 0, discriminant, 0.0))
+        cubic = (d != 0) & (discriminant >= 0)
+        quadratic = (d == 0) & (c != 0)
+        roots = [np.where(cubic, (-2 * c + sqrt_discriminant) / (6 * d), np.where(quadratic, -b / (2 * c), np.nan)),
+                 np.where(cubic, (-2 * c - sqrt_discriminant) / (6 * d), np.nan)]
 
-    # build the function as described in opendrive --> elev(ds) = a + b*ds + c*ds² + d*ds³
-    # link: https://releases.asam.net/OpenDRIVE/1.6.0/ASAM_OpenDRIVE_BS_V1-6-0.html#_methods_of_elevation
-    expression = a + b * x + c * x**2 + d * x**3
+    for root in roots:
+        # only candidates between the front and back border, the others are replaced by the front border
+        valid = (root >= 0) & (root <= lengths)
+        values.append(evaluate(np.where(valid, root, 0.0)))
 
-    # derive the function by hand
-    differentiation = b + 2 * c * x + 3 * d * x**2
-
-    return [s, expression, differentiation]
+    values = np.vstack(values)
+    return values.min(axis=0), values.max(axis=0)
 
 
 #######################################################################################################################
-# function to get the max and min value of the certain section of the function
-def get_elevation_min_max(start, end, expr, diff):
-    # declare x as a variable
-    x = symbols('x')
-    # use start as x to get the value of the front border
-    start_value = expr.subs(x, 0)
-    # use end as x to get the value of the back border
-    end_value = expr.subs(x, end-start)
-    # get the potential min and max value
-    candidates = []
-    # if diff is 0 do not search for results as 0 = 0
-    if diff != 0:
-        solveset(diff)
-    candidate_value = []
-    if len(candidates) != 0:
-        for candidate in candidates:
-
-            # check if the candidate is between the front and back border
-            if 0 <= candidate <= end-start:
-                # if so --> use candidate as x and get the value
-                candidate_value.append(expr.subs({x: candidate}))
-
-        if len(candidate_value) != 0:
-            # get of all candidates the minimum
-            min_candidate = min(candidate_value)
-            # get of all candidates the maximum
-            max_candidate = max(candidate_value)
-
-            # return the min and max value of candidate, front and back border
-            return [min(start_value, end_value, min_candidate), max(start_value, end_value, max_candidate)]
-        else:
-            # if there are any candidates valid --> get the min and max from front and back border
-            return [min(start_value, end_value), max(start_value, end_value)]
-    else:
-        # if there are no candidates then just take the min and max from front and back border
-        return [min(start_value, end_value), max(start_value, end_value)]
+# function to shorten the code in main
+# min and max of elevations as (a, b, c, d, s) in document order and the number of roads they cover
+def get_elevation_extrema(elevations, list_of_lengths) -> Tuple[float, float, int]:
+    a, b, c, d, s = np.array(elevations, dtype=float).T
 
+    # to get the end of the current elevation --> take the start of the following
+    # if current is last elevation or following elevation restarted in 0 --> take the current length of road
+    road_end = np.append(s[1:] == 0, True)
+    road_index = np.cumsum(road_end) - 1
+    ends = np.append(s[1:], 0.0)
+    ends[road_end] = np.asarray(list_of_lengths, dtype=float)[road_index[road_end]]
 
-#######################################################################################################################
-# function to shorten the code in main
-def get_elevation_range(root, elevations, list_of_lengths):
-    result_min = 0.0
-    result_max = 0.0
-
-    # check if xml file has elevation and those elements
-    if check_data(root, ".//elevation", "a", "b", "c", "d", "s"):
-
-        all_functions = []
-        # go through every elevation and get their functions
-        for elevation in elevations:
-            all_functions.append(
-                get_elevation_functions(float(elevation['a']), float(elevation['b']), float(elevation['c']),
-                                        float(elevation['d']), float(elevation['s'])))
-
-        road_counter = 0
-
-        # go through every function and calculate their min and max
-        for ind, function in enumerate(all_functions):
-            start = function[0]
-
-            # get length --> to know the end
-            length = len(all_functions)
-            # get the function
-            expr = function[1]
-            # get the differentiation
-            diff = function[2]
-
-            # to get the end of the current elevation --> take the start of the following
-            # if current is last elevation or following elevation restarted in 0 --> take the current length of road
-            if ind + 1 == length or all_functions[ind + 1][0] == 0:
-                end = list_of_lengths[road_counter]
-                road_counter += 1
-            else:
-                end = all_functions[ind + 1][0]
-
-            # call function to gen min and max
-            min_val, max_val = get_elevation_min_max(start, end, expr, diff)
-
-            if result_min == 0.0 and result_max == 0.0:
-                result_min = min_val
-                result_max = max_val
-            else:
-                # get current min and max and compare them with min and max in result_data
-                result_min = min(result_min, min_val)
-                result_max = max(result_max, max_val)
-
-    return result_max - result_min
+    min_values, max_values = get_elevation_min_max(a, b, c, d, ends - s)
+    return float(min_values.min()), float(max_values.max()), int(road_end.sum())
 
 
 #######################################################################################################################
-def extract_meta_data(file: Path) ->Tuple[bool, dict]:
-    # read file
+def extract_meta_data(file: Path, stream: bool = True) ->Tuple[bool, dict]:
+    # parse and extract at once, as stream the whole tree is never built
     logger.debug(f'Loading input file {file.absolute()}')
-    try: 
-        with open(file, 'r') as f:
-            _ = f.read()
-    except:
+    try:
+        attributes = get_meta_data_stream(file, "Unknown") if stream else get_meta_data(file, "Unknown")
+    except OSError:
         logger.exception(f'Cannot read file {file.absolute()}')
         return False
-    
-    # parse xml
-    try: 
-        root = etree.parse(str(file), etree.XMLParser(dtd_validation=False))
-    except:
+    except etree.XMLSyntaxError:
         logger.exception(f'Cannot parse XML from file {file.absolute()}')
         return False
-    
-    # ask in file dialog for file with given file extension -->close program if interrupted
-    try:
-        attributes = get_meta_data(file, "Unknown")
     except:
         logger.exception(f'Cannot extract from file {file.absolute()}')
         return False
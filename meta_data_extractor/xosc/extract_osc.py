@@ -4,7 +4,8 @@ from datetime import datetime
 from pathlib import Path
 from lxml import etree
 from enum import Enum
-from utils.utils import create_uuid
+from utils.identifiers import create_uuid
+from .parse_cache import parse_catalog, get_map_summary
 
 import xml.etree.ElementTree as ET
 import logging
@@ -96,8 +97,10 @@ class OpenSCENARIO():
         self.scenario_et: ET.Element = None
         self.catalog_locations: typing.Dict[str, typing.List[Path]] = {}
         self.catalogs: typing.Dict[str, typing.List[ET.Element]] = {}
+        # (catalog name, entry name) -> entry, built when the catalogs are loaded
+        self.catalog_entries: typing.Dict[typing.Tuple[str, str], ET.Element] = {}
         self.map_location: Path = None
-        self.map_et: ET.Element = None
+        self.map_summary: typing.Dict[str, list] = None  # rules and country specific signs of the map
         self.variables: typing.Dict[str, str] = {}
 
     def __str__(self) -> str:
@@ -359,26 +362,53 @@ def load_openscenario_file(osc_path: Path) -> OpenSCENARIO:
     if not osc.map_location.exists():
         logger.error(f'map not exist {osc.map_location}')
         exit(1)
-    if './/CatalogLocations' in sc:
-        for catalog in sc.find('.//CatalogLocations'):
-            if 'path' not in catalog.find('.//Directory').attrib or catalog.find('.//Directory').attrib['path'] == '':
+    try:
+        osc.map_summary = get_map_summary(osc.map_location)
+    except etree.XMLSyntaxError:
+        logger.warning(f'Cannot parse map {osc.map_location}')
+    catalog_locations = sc.find('.//CatalogLocations')
+    if catalog_locations is not None:
+        for catalog in catalog_locations:
+            directory = catalog.find('.//Directory')
+            if directory is None or directory.attrib.get('path', '') == '':
                 continue
-            location = (osc_path.parent /
-                        catalog.find('.//Directory').attrib['path']).resolve()
+            location = (osc_path.parent / get_osc_value(directory, 'path', osc)).resolve()
             osc.catalogs[catalog.tag] = []
             osc.catalog_locations[catalog.tag] = []
             if location.is_dir():
-                for file in location.iterdir():
-                    if file.name.endswith('osc') or file.name.endswith('xosc'):
-                        logger.debug(f'Loading catalog {file}')
-                        osc.catalogs[catalog.tag].append(ET.parse(file).getroot())
-                        osc.catalog_locations[catalog.tag].append(file)
+                files = [file for file in sorted(location.iterdir()) if file.name.endswith('osc') or file.name.endswith('xosc')]
             elif location.is_file():
-                logger.debug(f'Loading catalog {location}')
-                osc.catalogs[catalog.tag].append(ET.parse(location).getroot())
+                files = [location]
+            else:
+                logger.warning(f'catalog location not exist {location}')
+                files = []
+            for file in files:
+                logger.debug(f'Loading catalog {file}')
+                try:
+                    catalog_root = parse_catalog(file)
+                except ET.ParseError:
+                    logger.warning(f'Cannot parse catalog {file}')
+                    continue
+                osc.catalogs[catalog.tag].append(catalog_root)
+                osc.catalog_locations[catalog.tag].append(file)
+                add_catalog_entries(osc, catalog_root)
     return osc
 
 
+# entries are the children of a Catalog, the first entry of a name wins (file order)
+def add_catalog_entries(osc: OpenSCENARIO, catalog_root: ET.Element):
+    for catalog in catalog_root.iter('Catalog'):
+        catalog_name = catalog.attrib.get('name')
+        for entry in catalog:
+            if 'name' in entry.attrib:
+                osc.catalog_entries.setdefault((catalog_name, entry.attrib['name']), entry)
+
+
+# catalog entry of a CatalogReference, names can be parameters, None if it is not in the loaded catalogs
+def get_catalog_entry(reference: ET.Element, osc: OpenSCENARIO) -> typing.Optional[ET.Element]:
+    return osc.catalog_entries.get((get_osc_value(reference, 'catalogName', osc), get_osc_value(reference, 'entryName', osc)))
+
+
 def add_coordinate_systems(scenario: OpenSCENARIO, coordinate_systems: typing.Dict) -> None:
     if scenario.scenario_et.find('.//WorldPosition') is not None:
         coordinate_systems['WORLD'] = {
@@ -535,26 +565,15 @@ def add_environment_tags(scenario: OpenSCENARIO, tags: typing.Dict, uuid_openlab
                 analyze_environment(
                     environment_action[0], tags, uuid_openlabel, wind_speeds, rain_values, snow_values, fog_visual_range_values, sun_elevation_values, fractional_cloud_cover_values, time_list)
             elif environment_action[0].tag == 'CatalogReference':
-                cat_name = environment_action[0].attrib['catalogName']
-                entry = environment_action[0].attrib['entryName']
-                if cat_name in scenario.catalogs:
-                    catalogs = scenario.catalogs[cat_name]
-                    env = None
-                    for catalog in catalogs:
-                        env = catalog.find(f'.//Environment[@name="{entry}"]')
-                        if env is not None:
-                            break
-                    if env is not None:
-                        logger.debug(
-                            f'Found environment "{entry}" in catalog {catalog}')
-                        analyze_environment(
-                            env, tags, uuid_openlabel, wind_speeds, rain_values, snow_values, fog_visual_range_values, sun_elevation_values, fractional_cloud_cover_values, time_list)
-                    else:
-                        logger.warning(
-                            f'Could not find environment "{entry}" in given environment catalogs...')
+                env = get_catalog_entry(environment_action[0], scenario)
+                if env is not None and env.tag == 'Environment':
+                    logger.debug(
+                        f'Found environment "{env.attrib["name"]}" in catalog {environment_action[0].attrib["catalogName"]}')
+                    analyze_environment(
+                        env, tags, uuid_openlabel, wind_speeds, rain_values, snow_values, fog_visual_range_values, sun_elevation_values, fractional_cloud_cover_values, time_list)
                 else:
                     logger.warning(
-                        f'Cannot find environment catalog: {cat_name} in catalog definitions: {scenario.catalogs.keys()}')
+                        f'Could not find environment "{environment_action[0].attrib["entryName"]}" in catalog {environment_action[0].attrib["catalogName"]}')
             else:
                 logger.warning(
                     f'Unknown tag for EnvironmentAction children: {environment_action[0].tag}')
@@ -615,27 +634,26 @@ def add_environment_tags(scenario: OpenSCENARIO, tags: typing.Dict, uuid_openlab
     '''
 
 
-def get_nth_parent_of(parent_map: dict, of: ET.Element, n):
-    for _ in range(n):
-        of = parent_map[of]
-    return of
-
-
-def action_belongs_to_entity(action: ET.Element, parent_map: dict, subj_id: str):
-    third_parent = get_nth_parent_of(parent_map, action, 3)
-    if third_parent.tag == 'Private':
-        if third_parent.attrib['entityRef'] == subj_id:
-            return True
-    elif third_parent.tag == 'Action':
-        seventh_parent = get_nth_parent_of(parent_map, action, 7)
-        entity_refs = seventh_parent.findall('.//EntityRef')
-        for entity_ref in entity_refs:
-            if entity_ref.attrib['entityRef'] == subj_id:
-                return True
-    else:
-        logger.warning(
-            f'Unknown parent structure for {action}, 3rd parent is {third_parent.tag}')
-    return False
+# actions of the entity in one top-down pass, the owners are carried down:
+# - init actions: entityRef of the Private
+# - storyboard actions: EntityRefs of the Actors of the ManeuverGroup
+def get_actions_of_entity(root: ET.Element, action_tags: tuple, entity: str) -> list:
+    actions = []
+    stack = [(root, False)]
+    while stack:
+        el, owned = stack.pop()
+        if el.tag == 'Private':
+            owned = el.attrib.get('entityRef') == entity
+        elif el.tag == 'ManeuverGroup':
+            actors = el.find('Actors')
+            owned = actors is not None and any(entity_ref.attrib.get('entityRef') == entity for entity_ref in actors.iter('EntityRef'))
+        elif el.tag in action_tags:
+            if owned:
+                actions.append(el)
+            continue
+        # reversed, so the actions are in document order
+        stack.extend((child, owned) for child in reversed(el))
+    return actions
 
 
 def analyze_road_user(child: ET.Element, road_users: set):
@@ -707,18 +725,12 @@ def analyze_traffic_agent_types(scenario: OpenSCENARIO, tags: typing.Dict, uuid_
     for el in scenario.scenario_et.findall('.//ScenarioObject'):
         child = el[0]
         if child.tag == 'CatalogReference':
-            cat_name = get_osc_value(child, 'catalogName', scenario)
-            entry_name = get_osc_value(child, 'entryName', scenario)
-            for cat in scenario.catalogs[cat_name]:
-                scat = cat.find(
-                    f'.//Catalog[@name="{cat_name}"]')
-                entry = scat.find(f'.//*[@name="{entry_name}"]')
-                if entry is not None:
-                    analyze_road_user(entry, road_users)
-                else:
-                    #pass
-                    logger.warning(
-                        f'Could not find element {entry_name} in catalog {cat_name}')
+            entry = get_catalog_entry(child, scenario)
+            if entry is not None:
+                analyze_road_user(entry, road_users)
+            else:
+                logger.warning(
+                    f'Could not find element {child.attrib["entryName"]} in catalog {child.attrib["catalogName"]}')
         else:
             analyze_road_user(child, road_users)
     add_list_tag(road_users, tags,
@@ -731,12 +743,10 @@ def analyze_subject_vehicle_speed(scenario: OpenSCENARIO, tags: typing.Dict, uui
     subj_veh = get_conf_value(
         metadata_config, 'openlabel/tags/subjectVehicle', None)
     if subj_veh is not None:
-        parent_map = {c: p for p in scenario.scenario_et.iter() for c in p}
         speeds = []
-        speed_actions = scenario.scenario_et.findall('.//SpeedAction')
-        for speed_action in speed_actions:
-            if action_belongs_to_entity(speed_action, parent_map, subj_veh):
-                abs_speed = speed_action.find('.//AbsoluteTargetSpeed')
+        for action in get_actions_of_entity(scenario.scenario_et, ('SpeedAction', 'SpeedProfileAction'), subj_veh):
+            if action.tag == 'SpeedAction':
+                abs_speed = action.find('.//AbsoluteTargetSpeed')
                 if abs_speed is not None:
                     if abs_speed.attrib['value'].startswith('$'):
                         formula = abs_speed.attrib['value']
@@ -753,18 +763,14 @@ def analyze_subject_vehicle_speed(scenario: OpenSCENARIO, tags: typing.Dict, uui
                     # Meta data km/h, OpenSCENARIO m/s
                     speeds.append(speed * 3.6)
                 # ToDo implement RelativeTargetSpeed
-        speed_profile_actions = scenario.scenario_et.findall(
-            './/SpeedProfileAction')
-        for speed_profile_action in speed_profile_actions:
-            if action_belongs_to_entity(speed_profile_action, parent_map, subj_veh):
-                if 'entityRef' in speed_profile_action:
-                    # ToDo implement RelativeTargetSpeed
-                    pass
-                else:
-                    abs_speed = speed_action.find('.//SpeedProfileEntry')
-                    if abs_speed is not None:
-                        # Meta data km/h, OpenSCENARIO m/s
-                        speeds.append(float(abs_speed.attrib['speed']) * 3.6)
+            elif 'entityRef' in action.attrib:
+                # ToDo implement RelativeTargetSpeed
+                pass
+            else:
+                abs_speed = action.find('.//SpeedProfileEntry')
+                if abs_speed is not None:
+                    # Meta data km/h, OpenSCENARIO m/s
+                    speeds.append(float(abs_speed.attrib['speed']) * 3.6)
         add_list_tag(speeds, tags,
                      uuid_openlabel, 'subjectVehicleSpeedValue')
 
@@ -1103,6 +1109,14 @@ def find_files_with_ending(parent: Path, ending: str, files: typing.List[Path])
             files.append(parent)
 
 
+# a scenario has a Storyboard, catalogs have a Catalog element before
+# the file is only read up to the first of them
+def is_scenario_file(osc_file: Path) -> bool:
+    for _, element in etree.iterparse(str(osc_file), events=('start',), tag=('Storyboard', 'Catalog')):
+        return element.tag == 'Storyboard'
+    return False
+
+
 def get_scenario_files(scenario_dir: Path):
     logger.debug(f'Finding OSC files in {scenario_dir}')
     osc_files = []
@@ -1110,8 +1124,7 @@ def get_scenario_files(scenario_dir: Path):
     scenario_files = []
     for osc_file in osc_files:
         try: 
-            root = ET.parse(osc_file).getroot()
-            if root.find('.//Storyboard') is not None:
+            if is_scenario_file(osc_file):
                 scenario_files.append(osc_file)
             else:
                 logger.debug(f'Not analyzing {osc_file} since it is not a Scenario (probably a catalog)')
@@ -1241,51 +1254,68 @@ def get_general_meta_data(meta_data_dict: dict, osc: OpenSCENARIO, file_path: Pa
             # links_dic['general:media'] = link_data
 
 
+# optional elements and attributes (e.g. cloudState before 1.2) are written as -
 def convert_env_to_string(env: etree._Element) -> str:
     val = ''
     tod = env.find('TimeOfDay')
-    val += f'time of day: {tod.attrib["dateTime"]}'
+    val += f'time of day: {get_simple_attrib_or(tod, "dateTime")}'
     weather = env.find('Weather')
-    val += f', 	CloudState: {weather.attrib["cloudState"]}'
-    sun =  weather.find('Sun')
-    val += f', 	sun intensity: {sun.attrib["intensity"]}'
-    val += f', 	sun azimuth: {sun.attrib["azimuth"]}'
-    val += f', 	sun elevation: {sun.attrib["elevation"]}'
-    fog =  weather.find('Fog')
-    val += f', 	visuale range: {fog.attrib["visualRange"]}'
-    precipitation =  weather.find('Precipitation')
-    val += f', 	precipitation type: {precipitation.attrib["precipitationType"]}'
-    val += f', 	precipitation intensity: {precipitation.attrib["intensity"]}'
+    val += f', 	CloudState: {get_simple_attrib_or(weather, "cloudState")}'
+    sun = weather.find('Sun') if weather is not None else None
+    val += f', 	sun intensity: {get_simple_attrib_or(sun, "intensity")}'
+    val += f', 	sun azimuth: {get_simple_attrib_or(sun, "azimuth")}'
+    val += f', 	sun elevation: {get_simple_attrib_or(sun, "elevation")}'
+    fog = weather.find('Fog') if weather is not None else None
+    val += f', 	visuale range: {get_simple_attrib_or(fog, "visualRange")}'
+    precipitation = weather.find('Precipitation') if weather is not None else None
+    val += f', 	precipitation type: {get_simple_attrib_or(precipitation, "precipitationType")}'
+    val += f', 	precipitation intensity: {get_simple_attrib_or(precipitation, "intensity")}'
     return val
 
 
+# elements of the meta data in one pass over the scenario and one over every referenced catalog entry
+class OscCollector:
+    def __init__(self, osc: OpenSCENARIO):
+        self.osc = osc
+        self.elements = {tag: [] for tag in ['Vehicle', 'Pedestrian', 'MiscObject', 'ExternalObjectReference', 'EnvironmentAction',
+                                             'Controller', 'TimeOfDay', 'UserDefinedAction']}
+        self.scenario_misc_objects = []
+        self.references = []
+        self.tags = set()  # tags of the scenario below the root
+
+    def collect(self):
+        root = self.osc.scenario_et
+        for el in root.iter():
+            if el is root:
+                continue
+            self.tags.add(el.tag)
+            if el.tag in self.elements:
+                self.elements[el.tag].append(el)
+            elif el.tag == 'CatalogReference':
+                self.references.append(el)
+        self.scenario_misc_objects = list(self.elements['MiscObject'])
+        # referenced catalog entries count like inline definitions, user defined actions only of the scenario
+        for reference in self.references:
+            entry = get_catalog_entry(reference, self.osc)
+            if entry is None:
+                continue
+            for el in entry.iter():
+                if el.tag in self.elements and el.tag != 'UserDefinedAction':
+                    self.elements[el.tag].append(el)
+
+
 def get_osc_meta_data(meta_data_dict: dict, osc: OpenSCENARIO, file_path: Path, default_value: str = "Unknown", unknown_unit: str = "Unknown Unit") -> dict:
-    vehicles = []
-    pedestrians = []
-    misc_objects = []
-    external_object_references = []
-    environ_actions = []
-    controllers = []
-    user_defined_actions = []
-    time_of_days = []
-    time_of_days.extend(osc.scenario_et.findall('.//TimeOfDay'))
-    controllers.extend(osc.scenario_et.findall('.//Controller'))
-    vehicles.extend(osc.scenario_et.findall('.//Vehicle'))
-    pedestrians.extend(osc.scenario_et.findall('.//Pedestrian'))
-    misc_objects.extend(osc.scenario_et.findall('.//MiscObject'))
-    external_object_references.extend(osc.scenario_et.findall('.//ExternalObjectReference'))
-    environ_actions.extend(osc.scenario_et.findall('.//EnvironmentAction'))
-    user_defined_actions.extend(osc.scenario_et.findall('.//UserDefinedAction'))
-    for catalogs in osc.catalogs.values():
-        for catalog in catalogs:
-            vehicles.extend(catalog.findall('.//Vehicle'))
-            pedestrians.extend(catalog.findall('.//Pedestrian'))
-            misc_objects.extend(catalog.findall('.//MiscObject'))
-            external_object_references.extend(catalog.findall('.//ExternalObjectReference'))    
-            environ_actions.extend(catalog.findall('.//EnvironmentAction'))
-            controllers.extend(catalog.findall('.//Controller'))    
-            time_of_days.extend(catalog.findall('.//TimeOfDay'))
-    
+    collector = OscCollector(osc)
+    collector.collect()
+    vehicles = collector.elements['Vehicle']
+    pedestrians = collector.elements['Pedestrian']
+    misc_objects = collector.elements['MiscObject']
+    external_object_references = collector.elements['ExternalObjectReference']
+    environ_actions = collector.elements['EnvironmentAction']
+    controllers = collector.elements['Controller']
+    user_defined_actions = collector.elements['UserDefinedAction']
+    time_of_days = collector.elements['TimeOfDay']
+
     ### quantity 
     # participants    
     quantity_dict = dict()
@@ -1331,9 +1361,9 @@ def get_osc_meta_data(meta_data_dict: dict, osc: OpenSCENARIO, file_path: Path,
     ### common data
     if not file_path.name.endswith('.xosc'): # OpenSCENARIO DSL
         content_dict['scenario:abstractionLevel'] = 'Functional'
-    if osc.scenario_et.find('.//ParameterValueDistributionDefinition') is not None:
+    if 'ParameterValueDistributionDefinition' in collector.tags:
         content_dict['scenario:abstractionLevel'] = 'Logical'
-    elif osc.scenario_et.find('.//ScenarioDefinition') is not None:
+    elif 'ScenarioDefinition' in collector.tags:
         content_dict['scenario:abstractionLevel'] = 'Concrete'
     #else: 
     #    common_dict['scenario:abstractionLevel'] = default_value
@@ -1347,10 +1377,7 @@ def get_osc_meta_data(meta_data_dict: dict, osc: OpenSCENARIO, file_path: Path,
         if time_date.endswith(separator):
             time_date = time_date[:-len(separator)]
         content_dict['scenario:timeDate'] = time_date
-    osc_tags = set()
-    for el in osc.scenario_et.findall('.//'):
-        osc_tags.add(el.tag)
-    content_dict['scenario:usedStandardFunctions'] = ', '.join(map(str, osc_tags))
+    content_dict['scenario:usedStandardFunctions'] = ', '.join(map(str, collector.tags))
     #content_dict['scenario:aim'] = default_value      
 
     # environmental
@@ -1363,7 +1390,7 @@ def get_osc_meta_data(meta_data_dict: dict, osc: OpenSCENARIO, file_path: Path,
         for environ_action in environ_actions:
             env = environ_action.find('.//Environment')
             if env is not None:
-                environment_conditions += convert_env_to_string + separator
+                environment_conditions.add(convert_env_to_string(env))
                 sun = env.find('.//Sun')
                 if sun is not None:
                     sun_elevation.add(sun.attrib['elevation'])
@@ -1378,21 +1405,13 @@ def get_osc_meta_data(meta_data_dict: dict, osc: OpenSCENARIO, file_path: Path,
 
     # traffic
     country_specific_sign = set()
-    if osc.map_et is not None:
-        roads = osc.map_et.findall('.//road')
-        if len(roads) > 0:
-            rules = set()
-            for road in roads:
-                if 'rule' in road.attrib:
-                    rules.add(road.attrib['rule'])
-            #meta_data_dict['rule_of_the_road'] = ', '.join(map(str, rules))
-        for signal in osc.map_et.findall('.//signal'):
-            if signal.attrib['country'] != 'OpenDRIVE':
-                country_specific_sign.add(f'{signal.attrib["country"]}:{signal.attrib["type"]}')
-
-    misc_objects = osc.scenario_et.findall('.//MiscObject')
+    if osc.map_summary is not None:
+        rules = set(osc.map_summary['rules'])
+        #meta_data_dict['rule_of_the_road'] = ', '.join(map(str, rules))
+        country_specific_sign.update(osc.map_summary['signs'])
+
     country_specific_tp = set()
-    for misc_object in misc_objects:
+    for misc_object in collector.scenario_misc_objects:
         country_specific_tp.add(misc_object.attrib['name'])
     if len(country_specific_tp):
         content_dict['scenario:countrySpecificTrafficParticipants'] = ', '.join(map(str, country_specific_tp))
@@ -0,0 +1,124 @@
+from pathlib import Path
+from typing import Optional
+from collections import OrderedDict
+from contextlib import closing
+
+import xml.etree.ElementTree as ET
+import threading
+import sqlite3
+import logging
+import json
+
+logger = logging.getLogger(__name__)
+
+# scenarios of a library share a few catalog files and road networks
+# parsed catalogs and map summaries are kept per process, keyed by path, size and mtime, so a changed file is parsed again
+# map summaries can also be kept in a sqlite file, shared by several processes and runs
+# cached catalog elements are shared between scenarios and must not be modified
+
+MEMORY_CACHE_SIZE = 256  # files per kind, least recently used are removed
+
+g_catalogs = OrderedDict()
+g_map_summaries = OrderedDict()
+g_cache_lock = threading.Lock()
+g_disk_cache = None
+
+
+def configure_parse_cache(filename: Optional[Path] = None):
+    global g_disk_cache
+    g_disk_cache = MapSummaryCache(filename) if filename else None
+
+
+def get_file_key(file: Path) -> tuple:
+    file = Path(file).resolve()
+    stat = file.stat()
+    return file.as_posix(), stat.st_size, stat.st_mtime_ns
+
+
+def get_cached(cache: OrderedDict, key: tuple, create):
+    with g_cache_lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+    # parsed outside of the lock, two threads may parse the same file once each
+    value = create()
+    with g_cache_lock:
+        cache[key] = value
+        while len(cache) > MEMORY_CACHE_SIZE:
+            cache.popitem(last=False)
+    return value
+
+
+# root element of a catalog file
+def parse_catalog(file: Path) -> ET.Element:
+    return get_cached(g_catalogs, get_file_key(file), lambda: ET.parse(file).getroot())
+
+
+# what the scenario meta data needs of a road network:
+# - rules: traffic rules of the roads (RHT, LHT)
+# - signs: country specific signals as country:type
+def get_map_summary(file: Path) -> dict:
+    key = get_file_key(file)
+
+    def create():
+        summary = g_disk_cache.get(key) if g_disk_cache else None
+        if summary is None:
+            summary = read_map_summary(file)
+            if g_disk_cache:
+                g_disk_cache.put(key, summary)
+        return summary
+
+    return get_cached(g_map_summaries, key, create)
+
+
+# streamed, a road network can have several hundred MB
+def read_map_summary(file: Path) -> dict:
+    from lxml import etree
+
+    logger.debug(f'Reading road network {file}')
+    rules = set()
+    signs = set()
+    for _, element in etree.iterparse(str(file), events=('end',), tag=('road', 'signal')):
+        if element.tag == 'signal':
+            country = element.attrib.get('country')
+            if country and country != 'OpenDRIVE':
+                signs.add(f'{country}:{element.attrib.get("type")}')
+            continue
+        if 'rule' in element.attrib:
+            rules.add(element.attrib['rule'])
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+    return {'rules': sorted(rules), 'signs': sorted(signs)}
+
+
+# map summaries in a sqlite file, one row per road network file
+class MapSummaryCache:
+    def __init__(self, filename: Path):
+        self.filename = Path(filename)
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self.connect()) as connection, connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS map_summary (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime INTEGER NOT NULL, summary TEXT NOT NULL)')
+
+    # own connection per call, connections must not be shared between threads
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.filename, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    def get(self, key: tuple) -> Optional[dict]:
+        path, size, mtime = key
+        try:
+            with closing(self.connect()) as connection:
+                row = connection.execute('SELECT summary FROM map_summary WHERE path = ? AND size = ? AND mtime = ?', (path, size, mtime)).fetchone()
+            return json.loads(row[0]) if row else None
+        except sqlite3.Error:
+            logger.warning(f'parse cache {self.filename} not readable', exc_info=True)
+            return None
+
+    def put(self, key: tuple, summary: dict):
+        try:
+            with closing(self.connect()) as connection, connection:
+                connection.execute('INSERT OR REPLACE INTO map_summary (path, size, mtime, summary) VALUES (?, ?, ?, ?)', (*key, json.dumps(summary)))
+        except sqlite3.Error:
+            logger.warning(f'parse cache {self.filename} not writable', exc_info=True)
@@ -429,13 +429,13 @@ def fix_shacle(cat, output_path):
         file.writelines(lines)
 
 
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(prog='main.py', description='ontology and shacle files are generated from an excel table')
     parser.add_argument('-table', type=str,default='Metadata.xlsx', help='Path to Excel Table.')
     parser.add_argument('-out', '--out', type=str, default='ontologies/', help='Path to exported ontology and shacle files.')    
     parser.add_argument('-url', '--url', type=str, default='https://github.com/GAIA-X4PLC-AAD/map-and-scenario-data/tools/ontologie_creator/ontologies/', help='URL for the ontologies.')
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     table_file = args.table
     if not os.path.isfile(table_file):
@@ -1,8 +1,10 @@
 from pathlib import Path
 from lxml import etree
+from utils.process_runner import run_process
 
-import subprocess
 import argparse
+import tempfile
+import shutil
 import stat
 import logging
 import os
@@ -30,7 +32,8 @@ def update_config_file(template_file: Path, input_file: Path, result_file: Path,
 
     return config_file
 
-def create_config_file(config_file_name: Path, input_file: Path, result_file : Path) -> Path:
+# the config file is written to work_dir, so several checkers can run at the same time
+def create_config_file(config_file_name: Path, input_file: Path, result_file : Path, work_dir: Path) -> Path:
     #file_type = input_file.suffix.lstrip('.') # Get file extension without the dot
 
     script_folder = Path(__file__).parent
@@ -41,16 +44,17 @@ def create_config_file(config_file_name: Path, input_file: Path, result_file : P
         logger.error(f'template file not exist {template_file}')
         exit(1)
 
-    return update_config_file(template_file, input_file, result_file, Path("qc_config.xml"))
+    return update_config_file(template_file, input_file, result_file, work_dir / "qc_config.xml")
 
-def main():
+def main(argv: list = None):
     # parse arguments
     parser = argparse.ArgumentParser(prog='main.py', description='setup and run quality checker')
     parser.add_argument('filename', type=str,help='ASAM OpenX file, e.g. xodr, xosc')
     parser.add_argument('-out', type=str, help='output result file')
     parser.add_argument('-config', type=str, help='name of config file in subfolder templates')    
     parser.add_argument('-checkerbundle', type=str, help='name of checkerbundle')
-    args = parser.parse_args()
+    parser.add_argument('-timeout', type=float, help='stop the checker bundle after this number of seconds.')
+    args = parser.parse_args(argv)
 
     input_file = Path(args.filename)
     if not input_file.exists():
@@ -58,7 +62,9 @@ def main():
         exit(1)
 
     # create config file from templates with input_file replacement
-    output_file = Path(args.out)
+    # absolute paths, the checker runs in its own working directory
+    input_file = input_file.resolve()
+    output_file = Path(args.out).resolve()
     if not output_file.parent.exists():
         output_file.parent.mkdir()   
 
@@ -67,33 +73,34 @@ def main():
         logger.error(f'missing config file {config_file_name}')
         exit(1)    
 
-    config_file = create_config_file(config_file_name, input_file, output_file)
-
     app_name = args.checkerbundle
     if not app_name:
         logger.error(f'app name not valid {app_name}')
         exit(1)
-    
+
+    # private working directory for config and report files of this call
+    with tempfile.TemporaryDirectory(prefix='qc_') as work_dir:
+        run_quality_checker(app_name, config_file_name, input_file, output_file, Path(work_dir), args.timeout)
+
+
+# the output of checker bundle and TextReport is logged while they run
+def run_quality_checker(app_name: str, config_file_name: Path, input_file: Path, output_file: Path, work_dir: Path, timeout: float = None):
+    config_file = create_config_file(config_file_name, input_file, output_file, work_dir)
+
     # call
     script_call = []
     script_call.append(app_name)
     script_call.append('-c')
     script_call.append(config_file.as_posix())
 
-    try:
-        logger.info(f"start command {app_name}")
-        result = subprocess.run(script_call, check=True, capture_output=True, text=True)
-        logger.info(f"end command {app_name} succeeded with output:")
-        logger.info(result.stdout)  # print default output from sub process
-        logger.info(result.stderr)  # print logging output from sub process
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Command {app_name} failed with return code {e.returncode}")
-        logger.error(f"Error output: {e.stderr}")
-        logger.error(f"Error output: {e.stdout}")
+    logger.info(f"start command {app_name}")
+    result = run_process(script_call, app_name, work_dir, timeout)
+    if result.returncode != 0 or result.timed_out:
+        logger.error(f"Command {app_name} failed with return code {result.returncode}")
         exit(1)
+    logger.info(f"end command {app_name} succeeded")
 
-    # write als txt
-    os.chdir(output_file.parent) # change system path
+    # write als txt (TextReport writes Report.txt into its working directory)
     script_call = []
     script_path = Path(__file__).resolve()
     if sys.platform.startswith("win"):
@@ -107,29 +114,23 @@ def main():
     script_call.append(f'{output_file}')
 
     logger.info(f'{script_call}')
-    try:
-        logger.info(f"Start Converting xqar to human readable form :")
-        if sys.platform.startswith("linux") :
-            os.chmod(text_report_executable_path, stat.S_IXUSR) #chmode +x TextReport (in docker i.e. the Docker )
-            # Confirm permissions (optional)
-            permissions = oct(os.stat(text_report_executable_path).st_mode)[-3:]
-            logger.info(f"Permissions: {permissions}")
-        result = subprocess.run(script_call, check=True, capture_output=True, text=True)
-        
-        xqar_path_without_extension = output_file.with_suffix('')  # Get full path without extension
-        new_path = f"{xqar_path_without_extension}_QCReport.txt"
-        result_text_path = output_file.parent / 'Report.txt'
-        result_text_path.rename(new_path)
-
-        logger.info(f"Succeeded with output:")
-        logger.info(result.stdout)  # print default output from sub process
-        logger.info(result.stderr)  # print logging output from sub process
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Failed with return code {e.returncode}")
-        logger.error(f"Error output: {e.stderr}")
-        logger.error(f"Error output: {e.stdout}")
+    logger.info(f"Start Converting xqar to human readable form :")
+    if sys.platform.startswith("linux") :
+        os.chmod(text_report_executable_path, stat.S_IXUSR) #chmode +x TextReport (in docker i.e. the Docker )
+        # Confirm permissions (optional)
+        permissions = oct(os.stat(text_report_executable_path).st_mode)[-3:]
+        logger.info(f"Permissions: {permissions}")
+    result = run_process(script_call, 'TextReport', work_dir, timeout)
+    if result.returncode != 0 or result.timed_out:
+        logger.error(f"Failed with return code {result.returncode}")
         exit(1)
 
+    xqar_path_without_extension = output_file.with_suffix('')  # Get full path without extension
+    new_path = f"{xqar_path_without_extension}_QCReport.txt"
+    result_text_path = work_dir / 'Report.txt'
+    shutil.move(str(result_text_path), new_path)
+    logger.info(f"Succeeded")
+
 
 if __name__ == "__main__":
     main()
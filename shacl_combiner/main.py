@@ -8,11 +8,11 @@ logger = logging.getLogger(__name__)
 
 gaiax_url_part = 'GAIA-X4PLC-AAD/ontology-management-base'
    
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(prog='main.py', description='combine shalce file for jsonLD to one file')
     parser.add_argument('filename', type=str,help='json LD filename')
     parser.add_argument('-out', type=str, help='output path for combined shacle file')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     # load json
     json_LD_file = Path(args.filename)
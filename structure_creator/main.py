@@ -454,14 +454,14 @@ def get_asset_info(asset_json : Path, asset_extractor : Path) -> dict:
     return asset_info
 
 
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(prog='main.py', description='the folder structure is completed from the user info and a metadata table is created for the manifest')   
     parser.add_argument('filename', help='filename of json file from frontend.')
     parser.add_argument('-out', help='json file for manifest.')
     parser.add_argument('-path', help='path to copy/parse data.')
     parser.add_argument('-asset_json', help='filename to final asset json.')
     parser.add_argument('-asset_extractor', help='filename to temp asset json.')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     user_input_file = Path(args.filename)
     data_path = Path(args.path)
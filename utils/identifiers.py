@@ -0,0 +1,9 @@
+import uuid
+
+# without rdflib and requests, for tools that only need ids (e.g. meta_data_extractor)
+
+
+# create unique id
+def create_uuid() -> str:
+    random_uuid = uuid.uuid4()   # e.g. 'f47ac10b-58cc-4372-a567-0e02b2c3d479'
+    return str(random_uuid)
@@ -0,0 +1,115 @@
+from pathlib import Path
+from collections import deque
+from typing import Optional
+from utils.log_config import log_output_line
+
+import asyncio
+import logging
+import os
+import signal
+import subprocess
+import sys
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+MAX_LINE_LENGTH = 16 * 1024  # longer lines are cut
+TAIL_LINES = 200             # last lines of stdout and stderr kept for the result
+KILL_GRACE_SECONDS = 5
+
+
+# result of a process, only the last lines of the output are kept
+class ProcessResult:
+    def __init__(self, returncode: int, stdout: str, stderr: str, timed_out: bool):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timed_out = timed_out
+
+
+# run a process and log stdout and stderr line by line while it runs
+# classification of log_output_line: stdout info, stderr with 'warning' warning, other stderr error
+# the process (with its children) is killed after timeout seconds, the result has timed_out set and returncode -9 (or the kill code)
+def run_process(args: list, name: str, cwd: Optional[Path] = None, timeout: Optional[float] = None) -> ProcessResult:
+    result = asyncio.run(run_process_async([str(arg) for arg in args], name, cwd, timeout))
+    if result.timed_out:
+        logger.error(f"Command {name} stopped after timeout of {timeout} s")
+    elif result.returncode != 0:
+        logger.error(f"Command {name} exited with return code {result.returncode}")
+    return result
+
+
+async def run_process_async(args: list, name: str, cwd: Optional[Path] = None, timeout: Optional[float] = None) -> ProcessResult:
+    # own process group on posix, so children of the process (e.g. java) are stopped on timeout too
+    new_session = not sys.platform.startswith('win')
+    process = await asyncio.create_subprocess_exec(*args, cwd=str(cwd) if cwd else None, stdin=subprocess.DEVNULL,
+                                                   stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                                                   start_new_session=new_session)
+    stdout_tail = deque(maxlen=TAIL_LINES)
+    stderr_tail = deque(maxlen=TAIL_LINES)
+
+    async def communicate():
+        await asyncio.gather(read_lines(process.stdout, name, False, stdout_tail),
+                             read_lines(process.stderr, name, True, stderr_tail))
+        await process.wait()
+
+    task = asyncio.ensure_future(communicate())
+    timed_out = False
+    try:
+        await asyncio.wait_for(asyncio.shield(task), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        stop_process(process, new_session, signal.SIGTERM if new_session else None)
+        try:
+            await asyncio.wait_for(asyncio.shield(task), KILL_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            stop_process(process, new_session, signal.SIGKILL if new_session else None)
+            await task
+
+    return ProcessResult(process.returncode, '\n'.join(stdout_tail), '\n'.join(stderr_tail), timed_out)
+
+
+def stop_process(process, process_group: bool, signal_number):
+    try:
+        if process_group:
+            os.killpg(process.pid, signal_number)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+# split the stream into lines without holding more than one (cut) line in memory
+async def read_lines(stream: asyncio.StreamReader, name: str, is_stderr: bool, tail: deque):
+    def emit(data: bytes, cut: bool):
+        line = data.decode('utf-8', errors='replace').rstrip('\r')
+        if cut:
+            line += ' ...'
+        tail.append(line)
+        log_output_line(name, line, is_stderr)
+
+    line = bytearray()
+    skip = False  # rest of a cut line
+    while True:
+        data = await stream.read(CHUNK_SIZE)
+        if not data:
+            break
+        start = 0
+        while True:
+            end = data.find(b'\n', start)
+            if end < 0:
+                if not skip:
+                    line += data[start:]
+                    if len(line) > MAX_LINE_LENGTH:
+                        emit(bytes(line[:MAX_LINE_LENGTH]), True)
+                        line.clear()
+                        skip = True
+                break
+            if not skip:
+                line += data[start:end]
+                emit(bytes(line[:MAX_LINE_LENGTH]), len(line) > MAX_LINE_LENGTH)
+            line.clear()
+            skip = False
+            start = end + 1
+    if line and not skip:
+        emit(bytes(line), False)
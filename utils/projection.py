@@ -0,0 +1,60 @@
+from pyproj import CRS, Transformer
+from typing import Optional, Tuple
+
+import numpy as np
+import threading
+
+WGS84 = 'epsg:4326'
+
+# creating CRS and Transformer objects parses the definition and reads the proj database,
+# they are created once per definition (e.g. proj4 string of a geoReference) and thread
+# pyproj objects must not be shared between threads, every thread (in-process tools) has its own
+g_local = threading.local()
+g_epsg_codes = {}
+g_epsg_codes_lock = threading.Lock()
+
+
+def get_cached(kind: str, key, create):
+    cache = getattr(g_local, kind, None)
+    if cache is None:
+        cache = {}
+        setattr(g_local, kind, cache)
+    if key not in cache:
+        cache[key] = create()
+    return cache[key]
+
+
+def get_crs(definition: str) -> CRS:
+    return get_cached('crs', definition, lambda: CRS.from_user_input(definition))
+
+
+# always_xy: x/lon first, otherwise the axis order of the crs (lat first for epsg:4326)
+def get_transformer(source: str, target: str = WGS84, always_xy: bool = True) -> Transformer:
+    return get_cached('transformers', (source, target, always_xy),
+                      lambda: Transformer.from_crs(get_crs(source), get_crs(target), always_xy=always_xy))
+
+
+# epsg code of the definition, None if there is none
+def get_epsg(definition: str) -> Optional[int]:
+    with g_epsg_codes_lock:
+        if definition in g_epsg_codes:
+            return g_epsg_codes[definition]
+    epsg_code = get_crs(definition).to_epsg()
+    with g_epsg_codes_lock:
+        g_epsg_codes[definition] = epsg_code
+    return epsg_code
+
+
+# transform all points in one call, x and y are numbers, lists or numpy arrays
+def transform(x, y, source: str, target: str = WGS84, always_xy: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    return get_transformer(source, target, always_xy).transform(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+
+
+# projected points to lat and lon (wgs84)
+def to_lat_lon(x, y, source: str) -> Tuple[np.ndarray, np.ndarray]:
+    return transform(x, y, source, WGS84, always_xy=False)
+
+
+# projected points to lon and lat (wgs84), order of geojson and kml
+def to_lon_lat(x, y, source: str) -> Tuple[np.ndarray, np.ndarray]:
+    return transform(x, y, source, WGS84, always_xy=True)
@@ -5,11 +5,12 @@ from rdflib.namespace import SH, RDF
 from rdflib import Graph, URIRef, BNode
 from rdflib.collection import Collection
 from typing import Optional
+from utils.identifiers import create_uuid
 
 import json
-import requests
 import logging
-import uuid
+import os
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -17,12 +18,14 @@ g_envited_url = 'https://ontologies.envited-x.net'
 g_gaiax_server = "https://raw.githubusercontent.com/GAIA-X4PLC-AAD/ontology-management-base"
 g_shacle_folder = 'shacles' 
 
-# download shacl from url if not in local shacles folder
-def download_shacle(url_path : str, shacle_name: str) -> Path:
+# download shacl from url if not in local shacles folder (or always with refresh)
+def download_shacle(url_path : str, shacle_name: str, refresh: bool = False) -> Path:
     filename = f'{shacle_name}_shacl.ttl'   
     local_filepath = Path(f'{g_shacle_folder}/{filename}')
 
-    if not local_filepath.exists():
+    if refresh or not local_filepath.exists():
+        import requests  # not at top, most tools only need the local functions
+
         # get file from github
         url = f'{url_path}{filename}' if str(url_path).startswith(g_envited_url) else url_path
         response = requests.get(url)
@@ -30,10 +33,12 @@ def download_shacle(url_path : str, shacle_name: str) -> Path:
             logger.error(f'No shacl files found in url: {url}')
             exit(1)
 
-        if not Path(g_shacle_folder).exists():
-            Path(g_shacle_folder).mkdir()
-        with open(local_filepath, 'wb') as file:
+        # write to a temp file and rename, other processes (batch mode) may read or download the same shacl
+        Path(g_shacle_folder).mkdir(exist_ok=True)
+        temp_filepath = local_filepath.with_name(f'{filename}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(temp_filepath, 'wb') as file:
             file.write(response.content) 
+        os.replace(temp_filepath, local_filepath)
 
     return local_filepath
 
@@ -68,11 +73,38 @@ def get_prefixes(shacl_graph: Graph) -> dict[str, str]:
     return prefixes 
 
 
+# parsed shacl files of this process, key (filename, size, mtime), a changed or downloaded file is parsed again
+g_shacl_graphs = {}
+g_shacl_graphs_lock = threading.Lock()
+
+# parse a shacl file once per process (tools running in-process, service mode)
+# the graph is shared, callers must not modify it
+def parse_shacl_file(shacl_file) -> Graph:
+    shacl_file = Path(shacl_file).resolve()
+    stat = shacl_file.stat()
+    key = (str(shacl_file), stat.st_size, stat.st_mtime_ns)
+    with g_shacl_graphs_lock:
+        if key in g_shacl_graphs:
+            return g_shacl_graphs[key]
+
+    graph = Graph()
+    graph.parse(shacl_file, format='turtle')
+    with g_shacl_graphs_lock:
+        # drop older versions of the file
+        for old_key in [old_key for old_key in g_shacl_graphs if old_key[0] == key[0]]:
+            del g_shacl_graphs[old_key]
+        g_shacl_graphs[key] = graph
+    return graph
+
+
 # load shacl as rdf graph
 def load_shacl_files(shacl_files) ->Graph:
     shacl_graph = Graph()
     for shacl_file in shacl_files:
-        shacl_graph.parse(shacl_file, format='turtle')
+        parsed_graph = parse_shacl_file(shacl_file)
+        for prefix, namespace in parsed_graph.namespaces():
+            shacl_graph.bind(prefix, namespace, override=False)
+        shacl_graph += parsed_graph
     return shacl_graph
 
 # load json ld and add to rdf graph
@@ -102,11 +134,6 @@ def get_shacle_from_json_graph(data_graph : Graph, prefixes_to_add : Optional[di
     shacl_graph = load_shacl_files(shacl_files)    
     return shacl_graph
 
-# create unique id
-def create_uuid() -> str:
-    random_uuid = uuid.uuid4()   # e.g. 'f47ac10b-58cc-4372-a567-0e02b2c3d479'
-    return str(random_uuid)
-
 #    Recursive function to “resolve” a value.
 #    If it is a blank node, it is checked whether it is an RDF list.
 #    Otherwise, an attempt is made to convert the blank node into a dict.
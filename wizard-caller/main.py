@@ -48,12 +48,12 @@ def check_combined_json(endpoint_url):
             print(f"Tools got receiving error: {response.status_code}")
             break  # Exit the loop if there is an error
         
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(prog='main.py', description='calls the sd creation wizard with json and merged shacl file to fill the non-extractable attributes from the user')
     parser.add_argument('filename', type=str,help='filename of json LD file')
     parser.add_argument('-shacl', type=str,help='merged shacl file')
     parser.add_argument('-out', type=str, help='output filename for enhanced json LD file')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     jsonLD_file = Path(args.filename)
     if not jsonLD_file.exists():
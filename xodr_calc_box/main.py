@@ -76,10 +76,10 @@ def calcBox(lines, offset):
     return bounding_box
 
 
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(prog='main.py', description='calculates the bounding box of the road data in the OpenDRIVE and outputs the lat/lon box as a print.')   
     parser.add_argument('filename', help='OpenDRIVE filename')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     xodr_file = args.filename
     if not xodr_file.exists():        
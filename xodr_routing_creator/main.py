@@ -1,5 +1,5 @@
-from pyproj import CRS, Transformer
 from pathlib import Path
+from utils.projection import to_lon_lat
 
 import xml.etree.ElementTree as ET
 import simplekml
@@ -58,22 +58,31 @@ def calculate_end_position(start_pos : Vec2, heading, length):
     return Vec2(end_x, end_y)
 
 
-# function to reproject the coordinates
-def reproject(lines, offset, transformer):
-    transformed_lines = []
+# function to reproject the coordinates, all points of all lines are transformed in one call
+def reproject(lines, offset, proj4):
+    x_coords = []
+    y_coords = []
+    line_sizes = []
     for line in lines:
-        transformed_coords = []
         count = len(line) - 1
         for x, y, hdg, length in line:
             pos_abs = Vec2(x + offset.x, y + offset.y)
-            lon, lat = transformer.transform(pos_abs.x, pos_abs.y)
-            transformed_coords.append((lon, lat))
+            x_coords.append(pos_abs.x)
+            y_coords.append(pos_abs.y)
             if count == 0:
                 end_pos = calculate_end_position(pos_abs, hdg, length)
-                lon, lat = transformer.transform(end_pos.x, end_pos.y)
-                transformed_coords.append((lon, lat))
+                x_coords.append(end_pos.x)
+                y_coords.append(end_pos.y)
             count = count - 1
-        transformed_lines.append(transformed_coords)
+        line_sizes.append(len(line) + 1 if line else 0)
+
+    lons, lats = to_lon_lat(x_coords, y_coords, proj4)
+    coordinates = list(zip(lons.tolist(), lats.tolist()))
+    transformed_lines = []
+    start = 0
+    for size in line_sizes:
+        transformed_lines.append(coordinates[start:start + size])
+        start += size
     return transformed_lines
 
 
@@ -143,12 +152,12 @@ def create_bounding_box(elements: list) -> BoundingBox :
     return box
 
 
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(prog='main.py', description='creates routing files (as geojson or kml) on OpenDRIVE files.')   
     parser.add_argument('filename', help='filename of OpenDRIVE file.')
     parser.add_argument('-out', type=str,help='filename of exported geo file.')
     parser.add_argument('-box', type=str,help='filename for boundingbox geo file.')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     xodr_file = Path(args.filename)
     if not xodr_file.exists():
@@ -167,14 +176,8 @@ def main():
         logger.error(f"no projection found!")    
         exit(1)
 
-    # PROJ.4 projections
-    #web_mecator = CRS.from_epsg(3857)
-    web_mecator = CRS.from_proj4(in_proj)
-    wgs84 = CRS.from_epsg(4326)
-    transformer_proj_to_wgs84 = Transformer.from_crs(web_mecator, wgs84, always_xy=True)
-
-    # Reproject the coordinates
-    transformed_lines= reproject(lines, offset, transformer_proj_to_wgs84)
+    # Reproject the coordinates from the PROJ.4 projection to WGS84
+    transformed_lines= reproject(lines, offset, in_proj)
 
     output_file_box = args.box
     if output_file_box:
@@ -1,21 +1,21 @@
 from pathlib import Path
 from lxml import etree
-from utils.log_config import handle_output
+from utils.process_runner import run_process
 
 import argparse
-import subprocess
 import logging
 
 DEBUG = False
 
 logger = logging.getLogger(__name__)
 
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(prog='main.py', description='Calls the java tool from VCS https://github.com/virtualcitySYSTEMS/opendriveconverter to convert an OpenDRIVE file into a geojson.')   
     parser.add_argument('filename', help='filename of OpenDRIVE file')
     parser.add_argument('-out', help='geojson file')
     parser.add_argument('-path', help='path to the temp folder for a temporary opendrive with customized header.')
-    args = parser.parse_args()
+    parser.add_argument('-timeout', type=float, help='stop the converter after this number of seconds.')
+    args = parser.parse_args(argv)
 
     xodr_file = Path(args.filename)
     if not xodr_file.is_absolute():
@@ -51,13 +51,10 @@ def main():
     script_call.append(new_temp_file.as_posix())
     script_call.append(filename_out.parent.as_posix())
     
-    # run
-    try:    
-        result = subprocess.run(script_call, check=True, capture_output=True, text=True)
-        handle_output(result, 'vcs-odr-converter')
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Command failed with return code {e.returncode}")
-        handle_output(e, 'vcs-odr-converter')
+    # run, the output is logged while the converter runs
+    result = run_process(script_call, 'vcs-odr-converter', timeout=args.timeout)
+    if result.returncode != 0 or result.timed_out:
+        logger.error(f"Command failed with return code {result.returncode}")
         exit(1)
 
 if __name__ == '__main__':
@@ -158,13 +158,13 @@ def reduceXODR(box, file_in, file_out):
     tree.write(file_out)
 
 
-def main():
+def main(argv: list = None):
     parser = argparse.ArgumentParser(prog='main.py', description='removes the streets and intersections that are not in the specified bounding box and writes them out with *_reduce.xodr.')   
     parser.add_argument('filename', help='OpenDRIVE filename')
     parser.add_argument("--bbox", type=float, nargs=4, required=True,
                         metavar=("x_min", "y_min", "x_max", "y_max"),
                         help="bounding box as 4 values: x_min, y_min, x_max, y_max")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # get box
     x_min, y_min, x_max, y_max = args.bbox